@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import migrations, models
+
+# trigram indexes of the citizen listing search (see super_admin.utils.search_citizens), the name is matched
+# case insensitively by Django as `UPPER("fullname"::text) LIKE UPPER(...)`
+CITIZEN_SEARCH_INDEXES = (
+    ('authentication_citizen_mobile_number_trgm', 'USING gin ("mobile_number" gin_trgm_ops)'),
+    ('authentication_citizen_fullname_upper_trgm', 'USING gin (UPPER("fullname"::text) gin_trgm_ops)'),
+)
+
+
+def create_citizen_search_indexes(apps, schema_editor):
+    """
+    Creates the trigram indexes of the citizen search, without locking the citizen table against writes
+
+    Searches fall back to scanning the citizens if the pg_trgm extension is not available on the database server.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            settings.LOGGER_ERROR.error("pg_trgm extension is not available, citizen search indexes are not created")
+            return
+
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, definition in CITIZEN_SEARCH_INDEXES:
+            cursor.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS "{}" ON "authentication_citizen" {}'.format(
+                name, definition))
+
+
+def drop_citizen_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for name, _ in CITIZEN_SEARCH_INDEXES:
+            cursor.execute('DROP INDEX CONCURRENTLY IF EXISTS "{}"'.format(name))
+
+
+class Migration(migrations.Migration):
+    # indexes are created concurrently, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0006_auto_20200611_1217'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.RunPython(create_citizen_search_indexes, drop_citizen_search_indexes),
+    ]
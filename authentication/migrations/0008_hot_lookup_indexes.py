@@ -0,0 +1,31 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # indexes are created concurrently, which cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0007_citizen_listing_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(condition=models.Q(_negated=True, email=''), fields=['email'], name='user_email_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='citizen',
+            index=models.Index(fields=['mobile_number'], name='citizen_mobile_number_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='fcmpushnotificationregistrationtoken',
+            index=models.Index(fields=['user', 'device_id'], name='fcm_token_user_device_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='citizen',
+            constraint=models.UniqueConstraint(condition=models.Q(_negated=True, iam_user_id=''),
+                                               fields=('iam_user_id',), name='citizen_iam_user_id_unique'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import authentication.utils
+import core.custom_fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # columns are converted to UUIDs by core 0018, along with the foreign keys to them of every app
+
+    dependencies = [
+        ('authentication', '0008_hot_lookup_indexes'),
+        ('core', '0018_native_uuid_primary_keys'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='citizen',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='dataentryadmin',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='dataentryadminregion',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='region',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+            ],
+        ),
+    ]
@@ -5,10 +5,12 @@ from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import PermissionsMixin
 from django.db import models
 from django.utils import timezone
-from push_notifications.models import Device, CLOUD_MESSAGE_TYPES, GCMDeviceManager
+from push_notifications.models import Device, CLOUD_MESSAGE_TYPES, GCMDeviceManager, GCMDeviceQuerySet
 from push_notifications.settings import PUSH_NOTIFICATIONS_SETTINGS as SETTINGS
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from core.custom_fields import HexUUIDField
+from core.instrumentation import timed
 from .utils import random_number_generator, hex_uuid
 
 
@@ -44,7 +46,7 @@ class UserManager(BaseUserManager):
 
 
 class User(AbstractBaseUser, PermissionsMixin):
-    id = models.CharField(primary_key=True, default=hex_uuid, editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
 
     # Each `User` needs a human-readable unique identifier that we can use to
     # represent the `User` in the UI. We want to index this column in the
@@ -71,7 +73,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
 
     # A timestamp representing when this object was created.
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     # A timestamp reprensenting when this object was last updated.
     updated_at = models.DateTimeField(auto_now=True)
@@ -88,6 +90,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     # objects of this type.
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            # login and registration look up users by email, users registered by mobile number have no email
+            models.Index(fields=['email'], name='user_email_idx', condition=~models.Q(email='')),
+        ]
+
     def __str__(self):
         """
         Returns a string representation of this `User`.
@@ -161,7 +169,7 @@ class Region(models.Model):
     """
     Region defines the area administered by a data entry admin
     """
-    id = models.CharField(primary_key=True, default=hex_uuid, editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     name = models.CharField(max_length=100)
     lat = models.FloatField(default=0.0)
     long = models.FloatField(default=0.0)
@@ -188,7 +196,7 @@ class DataEntryAdmin(models.Model):
     Region radius is by default 1000 meters
 
     """
-    id = models.CharField(primary_key=True, default=hex_uuid, editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     mobile_number = models.CharField(max_length=15, blank=True, null=True, default="")
     fullname = models.CharField(max_length=50)
@@ -204,7 +212,7 @@ class DataEntryAdminRegion(models.Model):
     """
     For storing regions assigned to data entry admin
     """
-    id = models.CharField(primary_key=True, default=hex_uuid, editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     region = models.ForeignKey(Region, on_delete=models.CASCADE)
     data_entry_admin = models.ForeignKey(DataEntryAdmin, on_delete=models.CASCADE)
 
@@ -216,7 +224,7 @@ class Citizen(models.Model):
     """
     For storing citizen profile information
     """
-    id = models.CharField(primary_key=True, default=hex_uuid, editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     iam_user_id = models.CharField(max_length=60, default="")
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     mobile_number = models.CharField(max_length=15)
@@ -227,10 +235,37 @@ class Citizen(models.Model):
 
     is_location_sync_enabled = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # citizens are looked up by mobile number for sending push notifications
+            models.Index(fields=['mobile_number'], name='citizen_mobile_number_idx'),
+        ]
+        constraints = [
+            # every request authenticated with a Keycloak token looks up the citizen of the token subject,
+            # citizens registered by mobile number have no IAM user
+            models.UniqueConstraint(fields=['iam_user_id'], condition=~models.Q(iam_user_id=''),
+                                    name='citizen_iam_user_id_unique'),
+        ]
+
     def __str__(self):
         return self.mobile_number
 
 
+class FCMPushNotificationRegistrationTokenQuerySet(GCMDeviceQuerySet):
+    """
+    Timing the bulk push notification sends of instrumented requests
+    """
+
+    @timed('push')
+    def send_message(self, message, **kwargs):
+        return super().send_message(message, **kwargs)
+
+
+class FCMPushNotificationRegistrationTokenManager(GCMDeviceManager):
+    def get_queryset(self):
+        return FCMPushNotificationRegistrationTokenQuerySet(self.model)
+
+
 class FCMPushNotificationRegistrationToken(Device):
     """
     FCMPushNotificationRegistrationToken
@@ -251,11 +286,16 @@ class FCMPushNotificationRegistrationToken(Device):
         choices=CLOUD_MESSAGE_TYPES, default="GCM",
         help_text="You should choose FCM or GCM"
     )
-    objects = GCMDeviceManager()
+    objects = FCMPushNotificationRegistrationTokenManager()
 
     class Meta:
         verbose_name = "FCM Device"
+        indexes = [
+            # devices of a user are replaced by device id on registration and logout
+            models.Index(fields=['user', 'device_id'], name='fcm_token_user_device_idx'),
+        ]
 
+    @timed('push')
     def send_message(self, message, **kwargs):
         from push_notifications.gcm import send_message as gcm_send_message
 
@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 
 from authentication.models import DataEntryAdmin, Citizen
@@ -48,3 +51,21 @@ class IsSuperUser(BasePermission):
         if request.user.is_staff and request.user.is_superuser:
             return True
         return False
+
+
+class HasMonitoringToken(BasePermission):
+    """
+    Permission defined for checking the request carries the monitoring token (`Authorization: Bearer <token>`),
+    for the monitoring endpoints which are not used by any user. Denied when no token is configured.
+    """
+    message = "You don't have enough privileges to access this API."
+
+    def has_permission(self, request, view):
+        if not settings.MONITORING_TOKEN:
+            return False
+
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        if not authorization.startswith('Bearer '):
+            return False
+
+        return hmac.compare_digest(authorization[len('Bearer '):].encode(), settings.MONITORING_TOKEN.encode())
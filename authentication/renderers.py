@@ -1,15 +1,13 @@
-import json
+from core.renderers import ORJSONRenderer
 
-from rest_framework.renderers import JSONRenderer
 
-
-class UserJSONRenderer(JSONRenderer):
+class UserJSONRenderer(ORJSONRenderer):
     """
     Customizing the user  response JSON rendering
     """
     charset = 'utf-8'
 
-    def render(self, data, media_type=None, renderer_context=None):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
         token = data.get('token', None)
 
         if token is not None and isinstance(token, dict):
@@ -18,4 +16,4 @@ class UserJSONRenderer(JSONRenderer):
                 "refresh": token["refresh"]
             }
 
-        return json.dumps(data)
+        return super().render(data, accepted_media_type, renderer_context)
@@ -1,19 +1,21 @@
 import datetime
 import json
 
-import phonenumbers
-import twilio.rest
 from django.conf import settings
 from django.contrib.auth import authenticate
-from phonenumbers import NumberParseException
 from rest_framework import serializers
-from twilio.base.exceptions import TwilioRestException
 
+from core.instrumentation import timed
 from core.models import CitizenDiseaseRelation, Disease, MobileNumberWhitelist
+from core.utils import lazy_import
 from super_admin.serializers import RegionSerializer
 from .models import User, DataEntryAdmin, Citizen, DataEntryAdminRegion
 from .utils import iam_register_user, iam_get_user_token, iam_search_user_by_email
 
+phonenumbers = lazy_import('phonenumbers')
+twilio_rest = lazy_import('twilio.rest')
+twilio_exceptions = lazy_import('twilio.base.exceptions')
+
 
 class TokenSerializer(serializers.Serializer):
     """
@@ -313,7 +315,7 @@ class CitizenSendOTPSerializer(serializers.Serializer):
         # Checking whether the phone number is valid format or not
         try:
             parsed_mobile_number = phonenumbers.parse(mobile_number, None)
-        except NumberParseException:
+        except phonenumbers.NumberParseException:
             raise serializers.ValidationError(
                 "{} is not valid, please provide a valid mobile number !".format(mobile_number))
 
@@ -347,13 +349,15 @@ class CitizenSendOTPSerializer(serializers.Serializer):
 
         account = settings.TWILIO_ACCOUNT_ID
         token = settings.TWILIO_TOKEN
-        client = twilio.rest.Client(account, token)
+        client = twilio_rest.Client(account, token)
 
         try:
             # Sends the SMS with one time password to the given mobile number
-            client.messages.create(to=mobile_number, from_=settings.TWILIO_MOBILE_NUMBER,
-                                   body=settings.OTP_MESSAGE.format(otp_code=user.raw_otp, random_hash=random_hash))
-        except TwilioRestException as e:
+            with timed('sms'):
+                client.messages.create(to=mobile_number, from_=settings.TWILIO_MOBILE_NUMBER,
+                                       body=settings.OTP_MESSAGE.format(otp_code=user.raw_otp,
+                                                                        random_hash=random_hash))
+        except twilio_exceptions.TwilioRestException as e:
             raise serializers.ValidationError("Failed to send SMS to {}".format(mobile_number))
 
         return {"msg": "SMS send to {}".format(mobile_number)}
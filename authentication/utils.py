@@ -1,11 +1,19 @@
 import json
+import os
 import random
 import string
+import threading
+import time
 import uuid
 
-import requests
 from django.conf import settings
-from jose import jwt
+
+from core.instrumentation import timed
+from core.utils import lazy_import
+
+requests = lazy_import('requests')
+jwk = lazy_import('jose.jwk')
+jwt = lazy_import('jose.jwt')
 
 
 def random_number_generator(size=120, chars=string.ascii_letters + string.digits):
@@ -28,6 +36,70 @@ def hex_uuid():
     return uuid.uuid4().hex
 
 
+# last uuid7 generated by the process, without its version and variant bits, and its lock
+_last_uuid7 = {'value': 0}
+_uuid7_lock = threading.Lock()
+
+
+def hex_uuid7(timestamp=None, random_bits=None):
+    """
+    Returns hex representation of a time ordered uuid7 (RFC 9562), the unix time in milliseconds and its fraction
+    followed by random bits. Ids of a process increase with the time, rows inserted at about the same time get nearby
+    ids, so inserts into the primary key index of an append heavy table fill its last pages instead of splitting
+    random ones.
+
+    Ids generated now are strictly increasing within the process, an id which would not be greater than the last
+    one, e.g. within the same fraction of a millisecond or after the clock went back, is the last one plus one.
+
+    :param timestamp: unix time in seconds, now by default
+    :param random_bits: 62 random bits, from os.urandom by default
+    :return:
+    """
+    nanoseconds = time.time_ns() if timestamp is None else int(timestamp * 1000000000)
+    milliseconds, fraction = divmod(nanoseconds, 1000000)
+    if random_bits is None:
+        random_bits = int.from_bytes(os.urandom(8), 'big') >> 2
+
+    # 48 bits of milliseconds, 12 bits of the fraction of the millisecond, 62 random bits
+    value = ((milliseconds & 0xffffffffffff) << 12 | fraction * 4096 // 1000000) << 62 | \
+        random_bits & 0x3fffffffffffffff
+    if timestamp is None:
+        with _uuid7_lock:
+            if value <= _last_uuid7['value']:
+                value = (_last_uuid7['value'] + 1) & (1 << 122) - 1
+            _last_uuid7['value'] = value
+
+    # version 7 after the milliseconds, RFC 4122 variant before the random bits
+    value = value >> 74 << 80 | 0x7 << 76 | (value >> 62 & 0xfff) << 64 | 0x2 << 62 | value & 0x3fffffffffffffff
+    return '{:032x}'.format(value)
+
+
+# IAM RSA public keys parsed once per process
+_rsa_public_keys = {}
+
+
+def get_rsa_public_keys():
+    """
+    Returns the IAM RSA public keys (JWK or JWK set in `RSA_KEYS`) parsed for verifying access tokens
+
+    jose parses the JWK on every decode otherwise. Keys are returned as a list, which is accepted as is by
+    `jwt.decode`.
+
+    :return:
+    """
+    rsa_public_keys = _rsa_public_keys.get('keys')
+    if rsa_public_keys is None:
+        keys = settings.RSA_KEYS.get('keys', [settings.RSA_KEYS])
+        rsa_public_keys = []
+        for key in keys:
+            key = jwk.construct(key, "RS256")
+            # parsed key of the cryptography backend, or of the pure python rsa backend
+            rsa_public_keys.append(getattr(key, 'prepared_key', None) or getattr(key, '_prepared_key'))
+        _rsa_public_keys['keys'] = rsa_public_keys
+
+    return rsa_public_keys
+
+
 def decode_jwt_token(token):
     """
     Decodes a jwt token
@@ -36,9 +108,8 @@ def decode_jwt_token(token):
     :return:
     """
 
-    rsa_key = settings.RSA_KEYS
-
     try:
+        rsa_key = get_rsa_public_keys()
         decoded_token_body = jwt.decode(token, rsa_key, "RS256", audience="account")
         return decoded_token_body
     except:
@@ -46,6 +117,7 @@ def decode_jwt_token(token):
         return None
 
 
+@timed('iam')
 def iam_get_user_token(username, password, client_id, realm):
     """
     For getting an access token for a provided user credentials
@@ -68,6 +140,7 @@ def iam_get_user_token(username, password, client_id, realm):
     return response.status_code, response.text
 
 
+@timed('iam')
 def iam_register_user(fullname, username, email, password, admin_access_token):
     """
     For registering a user to IAM
@@ -115,6 +188,7 @@ def iam_register_user(fullname, username, email, password, admin_access_token):
     return response.status_code, response.text
 
 
+@timed('iam')
 def iam_unregister_user(iam_user_id, admin_access_token):
     """
     Deletes a user from iam
@@ -133,6 +207,7 @@ def iam_unregister_user(iam_user_id, admin_access_token):
     return response.status_code, response.text
 
 
+@timed('iam')
 def iam_update_user_info(fullname, iam_user_id, admin_access_token):
     """
     Updates user info in iam
@@ -157,6 +232,7 @@ def iam_update_user_info(fullname, iam_user_id, admin_access_token):
     return response.status_code, response.text
 
 
+@timed('iam')
 def iam_search_user_by_email(email, admin_access_token):
     """
     Searches user by email in iam
@@ -212,6 +288,7 @@ def iam_search_user_by_email(email, admin_access_token):
     return response.status_code, None
 
 
+@timed('iam')
 def iam_logout_user(iam_refresh_token, iam_client_id):
     """
     Logs out user from IAM
@@ -232,6 +309,7 @@ def iam_logout_user(iam_refresh_token, iam_client_id):
     return response.status_code, response.text
 
 
+@timed('iam')
 def iam_refresh_user_token(iam_refresh_token, iam_client_id):
     """
     Refresh user's access token
@@ -253,6 +331,7 @@ def iam_refresh_user_token(iam_refresh_token, iam_client_id):
     return response.status_code, response.text
 
 
+@timed('iam')
 def iam_reset_password_for_user(new_password, iam_user_id, admin_access_token):
     """
     Reset's user password in iam
@@ -278,6 +357,7 @@ def iam_reset_password_for_user(new_password, iam_user_id, admin_access_token):
     return response.status_code, response.text
 
 
+@timed('iam')
 def iam_forgot_password_for_user(iam_user_id, admin_access_token):
     """
     Triggers forgot password email to users email
@@ -4,6 +4,8 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 
+from core.throttling import IPThrottle, MobileNumberThrottle, EmailThrottle
+
 from .renderers import UserJSONRenderer
 from .serializers import *
 from .utils import iam_refresh_user_token
@@ -14,6 +16,8 @@ class SuperAdminLoginAPIView(generics.GenericAPIView):
     API to login as super admin
     """
     permission_classes = (AllowAny,)
+    throttle_classes = (IPThrottle, EmailThrottle)
+    throttle_scope = 'login'
     renderer_classes = (UserJSONRenderer,)
     serializer_class = SuperAdminLoginSerializer
 
@@ -29,6 +33,8 @@ class DataEntryAdminLoginAPIView(generics.GenericAPIView):
     API to login as data entry admin
     """
     permission_classes = (AllowAny,)
+    throttle_classes = (IPThrottle, EmailThrottle)
+    throttle_scope = 'login'
     renderer_classes = (UserJSONRenderer,)
     serializer_class = DataEntryAdminLoginSerializer
 
@@ -44,6 +50,8 @@ class CitizenLoginUsingEmailAPIView(generics.GenericAPIView):
     API to login as citizen via email
     """
     permission_classes = (AllowAny,)
+    throttle_classes = (IPThrottle, EmailThrottle)
+    throttle_scope = 'login'
     serializer_class = CitizenLoginUsingEmailSerializer
 
     def post(self, request):
@@ -58,6 +66,8 @@ class CitizenRegistrationAPIView(generics.GenericAPIView):
     Registering a citizen account
     """
     permission_classes = (AllowAny,)
+    throttle_classes = (IPThrottle,)
+    throttle_scope = 'registration'
     serializer_class = CitizenRegistrationSerializer
 
     def post(self, request):
@@ -73,6 +83,8 @@ class CitizenSendOTPAPIView(generics.GenericAPIView):
     API to login via one time password send to mobile number
     """
     permission_classes = (AllowAny,)
+    throttle_classes = (IPThrottle, MobileNumberThrottle)
+    throttle_scope = 'otp_send'
     serializer_class = CitizenSendOTPSerializer
 
     def post(self, request):
@@ -87,6 +99,8 @@ class CitizenVerifyOTPAPIView(generics.GenericAPIView):
     API to verify the one time password and authenticate as citizen
     """
     permission_classes = (AllowAny,)
+    throttle_classes = (IPThrottle, MobileNumberThrottle)
+    throttle_scope = 'otp_verify'
     serializer_class = CitizenVerifyOTPSerializer
 
     def post(self, request):
@@ -0,0 +1,119 @@
+import gzip
+import json
+import random
+import threading
+import time
+import warnings
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from authentication.models import User, Citizen
+from authentication.utils import hex_uuid
+from citizen.views import CitizenHistoricLocationDiseaseRelationViewSet
+from core.benchmarks import Benchmark
+from core.models import Disease
+
+
+class CitizenLocationUploadBenchmark(Benchmark):
+    """
+    Benchmarks uploading citizen historic locations one request per location against the batch upload endpoint
+
+    A temporary citizen is created for the benchmark and deleted afterwards along with its locations.
+    Time includes the proximity check threads started by the requests.
+
+    e.g. python manage.py benchmark citizen_location_upload --points 500
+    """
+    help = "Benchmarks single location and batch citizen historic location uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _run(self, label, make_requests):
+        threads_before = set(threading.enumerate())
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            responses = make_requests()
+
+            # waiting for the proximity check threads, started by core.utils.run_in_background (the log writer
+            # threads started meanwhile run until the exit)
+            for thread in set(threading.enumerate()) - threads_before:
+                if thread.name.startswith('background-'):
+                    thread.join()
+            elapsed = time.perf_counter() - started
+
+        errors = [response for response in responses if not 200 <= response.status_code < 300]
+        self.stdout.write("{:<28} requests: {:>5}  errors: {:>5}  time: {:>8.3f} s  queries: {:>6}".format(
+            label, len(responses), len(errors), elapsed, len(queries)))
+        if errors:
+            self.stderr.write("  {} {}".format(errors[0].status_code, errors[0].content[:200].decode('utf-8')))
+
+        return responses
+
+    def handle(self, *args, **options):
+        if not Disease.objects.filter(name="COVID-19").exists():
+            raise CommandError("Disease COVID-19 is not found, initialize the database with initdb.py")
+
+        # timestamps are parsed into naive datetimes by TimeStampField
+        warnings.filterwarnings('ignore', message='DateTimeField .* received a naive datetime')
+
+        rng = random.Random(options['seed'])
+        now = int(time.time())
+
+        def random_points(count, offset):
+            return [{
+                "lat": 9.9 + rng.random() / 2,
+                "long": 76.2 + rng.random() / 2,
+                "location_name": "",
+                "timestamp": str(now - offset - i * 60)
+            } for i in range(count)]
+
+        user = User.objects.create(username="benchmark-{}".format(hex_uuid()))
+        Citizen.objects.create(user=user, mobile_number="+0000000000")
+
+        factory = APIRequestFactory()
+        create_view = CitizenHistoricLocationDiseaseRelationViewSet.as_view({'post': 'create'})
+        batch_view = CitizenHistoricLocationDiseaseRelationViewSet.as_view(
+            {'post': 'batch'}, **CitizenHistoricLocationDiseaseRelationViewSet.batch.kwargs)
+
+        def post(view, path, data, **kwargs):
+            request = factory.post(path, data, **kwargs)
+            force_authenticate(request, user=user)
+            response = view(request)
+            response.render()
+            return response
+
+        # every request is of the same user, which the rate limit of the uploads would throttle
+        try:
+            with override_settings(RATE_LIMIT_ENABLED=False):
+                points = options['points']
+                self.stdout.write("Points: {}".format(points))
+
+                single_points = random_points(points, 0)
+                self._run("single location requests", lambda: [
+                    post(create_view, '/v1/citizen/historic-location/', point, format='json')
+                    for point in single_points])
+
+                batch_points = random_points(points, points * 60)
+                responses = self._run("batch (JSON)", lambda: [
+                    post(batch_view, '/v1/citizen/historic-location/batch/', batch_points, format='json')])
+                self.stdout.write("  {}".format(responses[0].content[:120].decode('utf-8')))
+
+                ndjson_points = random_points(points, points * 120)
+                body = gzip.compress("\n".join(json.dumps(point) for point in ndjson_points).encode('utf-8'))
+                responses = self._run("batch (gzip JSON lines)", lambda: [
+                    post(batch_view, '/v1/citizen/historic-location/batch/', body,
+                         content_type='application/x-ndjson', HTTP_CONTENT_ENCODING='gzip')])
+                self.stdout.write("  {}".format(responses[0].content[:120].decode('utf-8')))
+
+                # uploading the same batch again, every location is rejected as already recorded
+                responses = self._run("batch (replayed)", lambda: [
+                    post(batch_view, '/v1/citizen/historic-location/batch/', batch_points, format='json')])
+                self.stdout.write("  {}".format(responses[0].content[:120].decode('utf-8')))
+        finally:
+            user.delete()
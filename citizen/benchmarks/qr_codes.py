@@ -0,0 +1,75 @@
+import base64
+import io
+import json
+import tempfile
+import time
+
+from django.test import override_settings
+
+from authentication.utils import hex_uuid
+from citizen.qr import render_citizen_qr_code, get_citizen_qr_code, qr_code_cache
+from citizen.utils import generate_qr_code
+from core.benchmarks import Benchmark
+
+
+class QRCodesBenchmark(Benchmark):
+    """
+    Benchmarks the citizen QR code renders per second, of the previous rendering (Pillow image, base64 encoded and
+    decoded back) against the PNG and SVG written from the module matrix, and of the QR codes served from the disk
+    and memory caches (citizen/qr.py)
+
+    Disk cache is written to a temporary directory, which is removed afterwards.
+
+    e.g. python manage.py benchmark qr_codes --codes 2000
+    """
+    help = "Benchmarks rendering and caching of the citizen QR codes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--codes', type=int, default=1000, help="QR codes of distinct citizens")
+
+    def _render_with_pillow(self, citizen_id):
+        image = generate_qr_code(data=json.dumps({"id": citizen_id}), size=4, border=1)
+        buffer = io.BytesIO()
+        image.save(buffer)
+        return base64.b64decode(base64.b64encode(buffer.getvalue()).decode("utf-8").encode())
+
+    def _run(self, label, render, citizen_ids):
+        started = time.perf_counter()
+        size = sum(len(render(citizen_id)) for citizen_id in citizen_ids)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write("{:<24} {:>12.0f} {:>12.3f} {:>10.0f}".format(
+            label, len(citizen_ids) / elapsed, elapsed / len(citizen_ids) * 1000, size / len(citizen_ids)))
+
+    def _get_uncached(self, image_format):
+        def get(citizen_id):
+            # served from the disk cache, as by another worker process
+            qr_code_cache.clear()
+            return get_citizen_qr_code(citizen_id, image_format)[0]
+
+        return get
+
+    def handle(self, *args, **options):
+        citizen_ids = [hex_uuid() for _ in range(options['codes'])]
+
+        # the first code imports qrcode and Pillow
+        self._render_with_pillow(citizen_ids[0])
+        render_citizen_qr_code(citizen_ids[0])
+
+        self.stdout.write("{:<24} {:>12} {:>12} {:>10}".format("", "codes/s", "ms/code", "bytes"))
+        self._run("pillow + base64", self._render_with_pillow, citizen_ids)
+        self._run("png", render_citizen_qr_code, citizen_ids)
+        self._run("svg", lambda citizen_id: render_citizen_qr_code(citizen_id, 'svg'), citizen_ids)
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(QR_CODE_CACHE_LOCATION=directory):
+            qr_code_cache.clear()
+            try:
+                self._run("png, rendered and cached", lambda citizen_id: get_citizen_qr_code(citizen_id)[0],
+                          citizen_ids)
+                self._run("png, disk cache", self._get_uncached('png'), citizen_ids)
+
+                for citizen_id in citizen_ids:
+                    get_citizen_qr_code(citizen_id)
+                self._run("png, memory cache", lambda citizen_id: get_citizen_qr_code(citizen_id)[0], citizen_ids)
+            finally:
+                qr_code_cache.clear()
@@ -0,0 +1,130 @@
+import math
+import random
+import time
+
+from django.conf import settings
+
+from core.benchmarks import Benchmark
+from core.spatial import METRES_PER_DEGREE_LATITUDE
+from core.trajectory import TrajectoryPoint, compress_trajectory
+from patient.utils import find_contact_traced_citizens
+
+
+class TrajectoryCompressionBenchmark(Benchmark):
+    """
+    Benchmarks citizen trajectory compression on synthetic trails, without touching the database.
+
+    Every citizen stays at home, commutes to work along a few straight legs, stays at work and commutes back,
+    every day, recording a location every `--interval` seconds with GPS noise. Trails are compressed into
+    stay-points and simplified moving segments, and the contact tracing join is run on the raw and the
+    compressed trails against patient points placed along the trails.
+
+    e.g. python manage.py benchmark trajectory_compression --citizens 2000 --days 14
+    """
+    help = "Benchmarks citizen trajectory compression storage reduction and query speed up"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citizens', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=14)
+        parser.add_argument('--interval', type=int, default=300, help="Seconds between locations")
+        parser.add_argument('--noise', type=float, default=10.0, help="GPS noise in metres")
+        parser.add_argument('--patient-points', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _generate_trail(self, rng, start_timestamp, days, interval, noise):
+        # somewhere around Kochi
+        home = (9.9 + rng.random() / 2, 76.2 + rng.random() / 2)
+        work = (9.9 + rng.random() / 2, 76.2 + rng.random() / 2)
+        turns = [(home[0] + (work[0] - home[0]) * fraction + rng.uniform(-0.01, 0.01),
+                  home[1] + (work[1] - home[1]) * fraction + rng.uniform(-0.01, 0.01)) for fraction in (0.3, 0.7)]
+        commute = [home] + turns + [work]
+        commute_seconds = rng.randint(1800, 3600)
+
+        def on_commute(fraction):
+            # position along the commute legs, legs are travelled in equal time
+            leg = min(int(fraction * (len(commute) - 1)), len(commute) - 2)
+            leg_fraction = fraction * (len(commute) - 1) - leg
+            (start_lat, start_long), (end_lat, end_long) = commute[leg], commute[leg + 1]
+            return start_lat + (end_lat - start_lat) * leg_fraction, start_long + (end_long - start_long) * leg_fraction
+
+        leave_home = rng.randint(7 * 3600, 9 * 3600)
+        leave_work = leave_home + commute_seconds + rng.randint(8 * 3600, 9 * 3600)
+
+        noise_in_degrees = noise / METRES_PER_DEGREE_LATITUDE
+        trail = []
+        for offset in range(0, days * 24 * 3600, interval):
+            seconds_of_day = offset % (24 * 3600)
+            if seconds_of_day < leave_home or seconds_of_day >= leave_work + commute_seconds:
+                lat, long = home
+            elif seconds_of_day < leave_home + commute_seconds:
+                lat, long = on_commute((seconds_of_day - leave_home) / commute_seconds)
+            elif seconds_of_day < leave_work:
+                lat, long = work
+            else:
+                lat, long = on_commute(1.0 - (seconds_of_day - leave_work) / commute_seconds)
+
+            trail.append((lat + rng.gauss(0, noise_in_degrees),
+                          long + rng.gauss(0, noise_in_degrees / math.cos(math.radians(lat))),
+                          start_timestamp + offset))
+
+        return trail
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        end_timestamp = time.time()
+        start_timestamp = end_timestamp - options['days'] * 24 * 3600
+
+        trails = [self._generate_trail(rng, start_timestamp, options['days'], options['interval'], options['noise'])
+                  for _ in range(options['citizens'])]
+
+        started = time.perf_counter()
+        compressed_trails = [compress_trajectory(
+            [TrajectoryPoint(lat, long, timestamp) for lat, long, timestamp in trail],
+            settings.TRAJECTORY_STAY_RADIUS_IN_METRES, settings.TRAJECTORY_MAX_GAP_IN_SECONDS,
+            settings.TRAJECTORY_MAX_STAY_IN_SECONDS, settings.TRAJECTORY_SIMPLIFICATION_TOLERANCE_IN_METRES,
+            settings.TRAJECTORY_SIMPLIFICATION_MAX_SEGMENT_LENGTH_IN_METRES)
+            for trail in trails]
+        compression_seconds = time.perf_counter() - started
+
+        raw_rows = sum(len(trail) for trail in trails)
+        compressed_rows = sum(len(trail) for trail in compressed_trails)
+        stay_points = sum(point.is_stay for trail in compressed_trails for point in trail)
+
+        self.stdout.write("Citizens: {}, days: {}, interval: {} s".format(
+            options['citizens'], options['days'], options['interval']))
+        self.stdout.write("Raw rows: {}, compressed rows: {} ({} stay-points), reduction: {:.1f}x".format(
+            raw_rows, compressed_rows, stay_points, raw_rows / compressed_rows))
+        self.stdout.write("Compression: {:.2f} s, {:.0f} points/s".format(
+            compression_seconds, raw_rows / compression_seconds))
+
+        # patient points along the trails, so that the join has matches to find
+        patient_points = []
+        for _ in range(options['patient_points']):
+            lat, long, timestamp = rng.choice(rng.choice(trails))
+            patient_points.append((lat, long, timestamp + rng.uniform(-3600, 3600)))
+
+        radius = settings.HOTSPOT_PROXIMITY_IN_METRES
+        time_window = settings.RISK_ASSESSMENT_TIME_WINDOW_IN_SECONDS
+
+        raw_locations = [(citizen_id, lat, long, timestamp, timestamp)
+                         for citizen_id, trail in enumerate(trails) for lat, long, timestamp in trail]
+        compressed_locations = [(citizen_id, point.lat, point.long, point.enter_timestamp, point.exit_timestamp)
+                                for citizen_id, trail in enumerate(compressed_trails) for point in trail]
+
+        started = time.perf_counter()
+        raw_matched_citizen_ids = find_contact_traced_citizens(patient_points, raw_locations, radius, time_window)
+        raw_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        compressed_matched_citizen_ids = find_contact_traced_citizens(patient_points, compressed_locations, radius,
+                                                                      time_window)
+        compressed_seconds = time.perf_counter() - started
+
+        self.stdout.write("Contact tracing join on raw trails: {:.2f} s, matched citizens: {}".format(
+            raw_seconds, len(raw_matched_citizen_ids)))
+        self.stdout.write("Contact tracing join on compressed trails: {:.2f} s, matched citizens: {}, "
+                          "speed up: {:.1f}x".format(compressed_seconds, len(compressed_matched_citizen_ids),
+                                                     raw_seconds / compressed_seconds))
+        self.stdout.write("Citizens matched only on raw trails: {}, only on compressed trails: {}".format(
+            len(raw_matched_citizen_ids - compressed_matched_citizen_ids),
+            len(compressed_matched_citizen_ids - raw_matched_citizen_ids)))
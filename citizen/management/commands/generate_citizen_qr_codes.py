@@ -0,0 +1,132 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from authentication.models import Citizen
+from citizen.qr_export import QR_CODE_ARCHIVE_CONTENT_TYPES, get_citizens_for_qr_codes, render_missing_qr_codes, \
+    stream_citizen_qr_codes
+
+# seconds between the progress reports
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    """
+    Generates the QR codes of every citizen for print campaigns, as a ZIP of PNGs or a PDF of codes tiled on A4 pages
+
+    1. Codes missing from the QR code cache (citizen/qr.py) are rendered by a pool of `--processes` processes,
+       in chunks of `--chunk-size` citizen ids read with a server side cursor. Rendered codes are kept in the cache,
+       so an interrupted run resumes with the codes not rendered yet.
+    2. Archive is written from the cache to `--output` (replaced once complete), without holding the codes in
+       memory.
+
+    e.g. python manage.py generate_citizen_qr_codes --output citizen-qr-codes.pdf --processes 8
+    """
+    help = "Generates the QR codes of every citizen into a ZIP or PDF archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help="Path of the archive, .zip or .pdf")
+        parser.add_argument('--format', choices=tuple(QR_CODE_ARCHIVE_CONTENT_TYPES), default=None,
+                            help="Format of the archive, by the extension of the output by default")
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+        parser.add_argument('--chunk-size', type=int, default=500, help="Citizens rendered per task")
+        parser.add_argument('--render-only', action='store_true', help="Only renders the codes to the cache")
+
+    def _report(self, label, done, total, started, extra=""):
+        elapsed = time.perf_counter() - started
+        self.stdout.write("{}: {} / {} citizens, {:.0f} citizens/s{}".format(
+            label, done, total, done / elapsed if elapsed else 0, extra))
+
+    def _get_citizen_id_chunks(self, chunk_size):
+        chunk = []
+        for citizen_id, _ in get_citizens_for_qr_codes():
+            chunk.append(citizen_id)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _render(self, processes, chunk_size, total):
+        # worker processes are forked before the cursor is opened, they never use the database connections
+        connections.close_all()
+        pool = multiprocessing.Pool(processes)
+
+        done = rendered = 0
+        started = reported = time.perf_counter()
+        pending = deque()
+
+        def collect():
+            nonlocal done, rendered, reported
+            size, result = pending.popleft()
+            rendered += result.get()
+            done += size
+            if time.perf_counter() - reported >= PROGRESS_INTERVAL:
+                self._report("Rendering", done, total, started, ", {} rendered".format(rendered))
+                reported = time.perf_counter()
+
+        try:
+            for chunk in self._get_citizen_id_chunks(chunk_size):
+                # a few chunks are queued per process, so that the citizen ids are not all read into memory
+                if len(pending) >= processes * 2:
+                    collect()
+                pending.append((len(chunk), pool.apply_async(render_missing_qr_codes, (chunk,))))
+
+            while pending:
+                collect()
+        finally:
+            pool.terminate()
+            pool.join()
+
+        self._report("Rendered", done, total, started, ", {} rendered, {} cached before".format(
+            rendered, done - rendered))
+
+    def _write_archive(self, output, archive_format, total):
+        started = reported = time.perf_counter()
+        done = 0
+
+        def citizens():
+            nonlocal done, reported
+            for citizen in get_citizens_for_qr_codes():
+                yield citizen
+                done += 1
+                if time.perf_counter() - reported >= PROGRESS_INTERVAL:
+                    self._report("Writing", done, total, started)
+                    reported = time.perf_counter()
+
+        tmp_path = "{}.tmp".format(output)
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in stream_citizen_qr_codes(citizens(), archive_format):
+                    f.write(chunk)
+            os.replace(tmp_path, output)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._report("Written {}".format(output), done, total, started)
+
+    def handle(self, *args, **options):
+        archive_format = None
+        if not options['render_only']:
+            if options['output'] is None:
+                raise CommandError("--output is required, unless only rendering the codes with --render-only")
+
+            archive_format = options['format'] or os.path.splitext(options['output'])[1].lstrip('.').lower()
+            if archive_format not in QR_CODE_ARCHIVE_CONTENT_TYPES:
+                raise CommandError("Archive format must be one of {}, pass --format or an output with its extension"
+                                   .format(", ".join(QR_CODE_ARCHIVE_CONTENT_TYPES)))
+
+        if options['processes'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--processes and --chunk-size must be positive")
+
+        total = Citizen.objects.count()
+        self._render(options['processes'], options['chunk_size'], total)
+
+        if not options['render_only']:
+            self._write_archive(options['output'], archive_format, total)
@@ -0,0 +1,240 @@
+"""
+Rendering and caching of the citizen QR codes
+
+QR code of a citizen embeds `{"id": <citizen id>}`, which never changes. Codes are rendered once, then served from
+the memory of the worker process (least recently used, up to `QR_CODE_CACHE_MAX_SIZE` bytes) or from the disk
+cache under `QR_CODE_CACHE_LOCATION`, which survives restarts and is shared between the worker processes.
+
+Images are written from the module matrix of the code, PNG as a 1 bit grayscale image and SVG as a single path,
+without drawing every module on a Pillow image.
+"""
+import hashlib
+import itertools
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.instrumentation import timed
+from core.utils import lazy_import
+
+qrcode = lazy_import('qrcode')
+
+QR_CODE_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+# pixels per module and modules of quiet zone around the code
+QR_CODE_BOX_SIZE = 4
+QR_CODE_BORDER = 1
+
+# changing the rendering (e.g. box size) needs a new version, codes cached on disk are looked up by version
+QR_CODE_RENDERING_VERSION = 1
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def get_qr_code_matrix(payload, border=QR_CODE_BORDER):
+    """
+    Returns the modules of the QR code embedding the payload as rows of booleans (True for dark modules),
+    including the quiet zone
+
+    :param payload:
+    :param border:
+    :return:
+    """
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, border=border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def render_png(matrix, box_size=QR_CODE_BOX_SIZE):
+    """
+    Renders the matrix as a black and white PNG of `box_size` pixels per module
+
+    :param matrix:
+    :param box_size:
+    :return: PNG bytes
+    """
+    size = len(matrix) * box_size
+    # rows are padded to full bytes, every row starts with the filter type byte (0, none)
+    padding = '1' * (-size % 8)
+    rows = []
+    for modules in matrix:
+        bits = ''.join('0' * box_size if dark else '1' * box_size for dark in modules) + padding
+        row = b'\x00' + int(bits, 2).to_bytes(len(bits) // 8, 'big')
+        rows.extend([row] * box_size)
+
+    return PNG_SIGNATURE + \
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 1, 0, 0, 0, 0)) + \
+        _png_chunk(b'IDAT', zlib.compress(b''.join(rows), 9)) + \
+        _png_chunk(b'IEND', b'')
+
+
+def render_svg(matrix, box_size=QR_CODE_BOX_SIZE):
+    """
+    Renders the matrix as an SVG of one unit per module, sized `box_size` pixels per module
+
+    :param matrix:
+    :param box_size:
+    :return: SVG bytes
+    """
+    modules = len(matrix)
+    # a rectangle per run of dark modules in a row
+    path = []
+    for row, dark_modules in enumerate(matrix):
+        column = 0
+        for dark, run in itertools.groupby(dark_modules):
+            length = len(list(run))
+            if dark:
+                path.append('M{} {}h{}v1h-{}z'.format(column, row, length, length))
+            column += length
+    path = ''.join(path)
+
+    return ('<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {modules} {modules}" '
+            'shape-rendering="crispEdges"><rect width="100%" height="100%" fill="#fff"/>'
+            '<path d="{path}" fill="#000"/></svg>').format(size=modules * box_size, modules=modules,
+                                                           path=path).encode('utf-8')
+
+
+@timed('qr_code')
+def render_citizen_qr_code(citizen_id, image_format='png'):
+    """
+    Renders the QR code of the citizen
+
+    :param citizen_id:
+    :param image_format: 'png' or 'svg'
+    :return: image bytes
+    """
+    matrix = get_qr_code_matrix(json.dumps({"id": str(citizen_id)}))
+    if image_format == 'svg':
+        return render_svg(matrix)
+    return render_png(matrix)
+
+
+class QRCodeCache(object):
+    """
+    QRCodeCache
+
+    Least recently used cache of rendered QR codes keyed by the citizen id and the image format, limited to
+    `max_size` bytes of images.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, citizen_id, image_format):
+        with self._lock:
+            entry = self._entries.get((citizen_id, image_format))
+            if entry is not None:
+                self._entries.move_to_end((citizen_id, image_format))
+            return entry
+
+    def set(self, citizen_id, image_format, content, etag):
+        if len(content) > self.max_size:
+            return
+
+        with self._lock:
+            previous = self._entries.pop((citizen_id, image_format), None)
+            if previous is not None:
+                self.size -= len(previous[0])
+
+            self._entries[(citizen_id, image_format)] = (content, etag)
+            self.size += len(content)
+
+            while self.size > self.max_size:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+qr_code_cache = QRCodeCache(settings.QR_CODE_CACHE_MAX_SIZE)
+
+
+def get_qr_code_path(citizen_id, image_format):
+    # codes are spread over directories by the first characters of the id, to keep the directories small
+    return os.path.join(settings.QR_CODE_CACHE_LOCATION, 'v{}'.format(QR_CODE_RENDERING_VERSION), citizen_id[:2],
+                        '{}.{}'.format(citizen_id, image_format))
+
+
+def _read_qr_code(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_qr_code(path, content):
+    """
+    Atomically writes the QR code to the disk cache, so that other worker processes never read a partially
+    written image
+
+    :param path:
+    :param content:
+    :return:
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_qr_code_etag(content):
+    return '"{}"'.format(hashlib.sha1(content).hexdigest())
+
+
+def get_citizen_qr_code(citizen_id, image_format='png', cache_in_memory=True):
+    """
+    Returns the QR code of the citizen and its ETag, from the memory or disk cache if it is rendered before
+
+    :param citizen_id:
+    :param image_format: 'png' or 'svg'
+    :param cache_in_memory: False for reading the codes of every citizen once (e.g. exports), which would evict
+        the codes requested by the citizens from the memory cache
+    :return: (image bytes, ETag)
+    """
+    citizen_id = str(citizen_id)
+    entry = qr_code_cache.get(citizen_id, image_format)
+    if entry is not None:
+        return entry
+
+    path = get_qr_code_path(citizen_id, image_format)
+    content = _read_qr_code(path)
+    if content is None:
+        content = render_citizen_qr_code(citizen_id, image_format)
+        try:
+            write_qr_code(path, content)
+        except OSError as e:
+            settings.LOGGER_ERROR.error("Failed to cache QR code of citizen:{}, error:{}".format(citizen_id, str(e)))
+
+    etag = get_qr_code_etag(content)
+    if cache_in_memory:
+        qr_code_cache.set(citizen_id, image_format, content, etag)
+    return content, etag
@@ -0,0 +1,252 @@
+"""
+Export of the citizen QR codes for print campaigns, as a ZIP of PNGs or as a PDF of QR codes tiled on A4 pages
+
+Archives are written as a stream of chunks while the citizens are read with a server side cursor, only a page of
+QR codes is held in memory. Codes are taken from the QR code cache (citizen/qr.py), those missing are rendered;
+the generate_citizen_qr_codes command renders them across a process pool beforehand.
+"""
+import os
+import struct
+import zipfile
+import zlib
+
+from authentication.models import Citizen
+from citizen.qr import get_citizen_qr_code, get_qr_code_path, render_citizen_qr_code, write_qr_code
+
+QR_CODE_ARCHIVE_CONTENT_TYPES = {
+    'zip': 'application/zip',
+    'pdf': 'application/pdf'
+}
+
+# chunks of the archive are yielded once they reach below bytes
+QR_CODE_ARCHIVE_CHUNK_SIZE = 256 * 1024
+
+
+def get_citizens_for_qr_codes(chunk_size=2000):
+    """
+    Returns an iterator of (citizen id, mobile number) of the citizens ordered by id, fetched with a server side
+    cursor (unless disabled for pgbouncer, see DATABASE_PGBOUNCER_TRANSACTION_POOLING)
+
+    :param chunk_size: rows fetched at once
+    :return:
+    """
+    return Citizen.objects.order_by('id').values_list('id', 'mobile_number').iterator(chunk_size=chunk_size)
+
+
+def render_missing_qr_codes(citizen_ids):
+    """
+    Renders the PNG QR codes of the citizens to the disk cache, skipping the ones rendered before
+
+    Run by the processes of a pool, so that images are not sent between the processes.
+
+    :param citizen_ids:
+    :return: number of rendered codes
+    """
+    rendered = 0
+    for citizen_id in citizen_ids:
+        path = get_qr_code_path(citizen_id, 'png')
+        if not os.path.exists(path):
+            write_qr_code(path, render_citizen_qr_code(citizen_id, 'png'))
+            rendered += 1
+    return rendered
+
+
+class _StreamBuffer(object):
+    """
+    Write only file object, whose content is taken out as the archive is written
+
+    Not being seekable, ZIP entries are written with data descriptors.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        content = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return content
+
+
+def _read_png(png):
+    """
+    Returns the width, height and zlib compressed (PNG filtered) rows of a 1 bit grayscale, non interlaced PNG
+
+    :param png:
+    :return:
+    """
+    position = 8
+    width = height = None
+    data = []
+    while position < len(png):
+        length, chunk_type = struct.unpack('>I4s', png[position:position + 8])
+        chunk = png[position + 8:position + 8 + length]
+        if chunk_type == b'IHDR':
+            width, height, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', chunk)
+            if (bit_depth, color_type, interlace) != (1, 0, 0):
+                raise ValueError("Only 1 bit grayscale, non interlaced PNGs can be embedded")
+        elif chunk_type == b'IDAT':
+            data.append(chunk)
+        position += 12 + length
+
+    return width, height, b''.join(data)
+
+
+class QRCodePDFWriter(object):
+    """
+    QRCodePDFWriter
+
+    Writes QR codes with a label below them, tiled `columns` x `rows` on A4 pages. Pages are written as soon as
+    they are filled and the page tree at the end, so the file object need not be seekable.
+
+    PNG data of the codes is embedded as is, PDF decodes the PNG filtered rows with the PNG predictor.
+    """
+    PAGE_WIDTH = 595
+    PAGE_HEIGHT = 842
+    MARGIN = 36
+    LABEL_FONT_SIZE = 8
+
+    # object ids of the catalog, the page tree (written last) and the label font
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    FONT_ID = 3
+
+    def __init__(self, fileobj, columns=4, rows=5):
+        self.fileobj = fileobj
+        self.columns = columns
+        self.rows = rows
+        self.position = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.tiles = []
+        self.next_id = self.FONT_ID + 1
+
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._write_object(self.CATALOG_ID, '<< /Type /Catalog /Pages {} 0 R >>'.format(self.PAGES_ID).encode())
+        self._write_object(self.FONT_ID, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+    def _reserve_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _write_object(self, object_id, content, stream=None):
+        self.offsets[object_id] = self.position
+        self._write('{} 0 obj\n'.format(object_id).encode() + content)
+        if stream is not None:
+            self._write(b'\nstream\n' + stream + b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def add(self, png, label):
+        self.tiles.append((png, label))
+        if len(self.tiles) == self.columns * self.rows:
+            self._write_page()
+
+    def _write_page(self):
+        cell_width = (self.PAGE_WIDTH - 2 * self.MARGIN) / self.columns
+        cell_height = (self.PAGE_HEIGHT - 2 * self.MARGIN) / self.rows
+        size = min(cell_width, cell_height - 2 * self.LABEL_FONT_SIZE) * 0.9
+
+        images, content = [], []
+        for index, (png, label) in enumerate(self.tiles):
+            width, height, data = _read_png(png)
+            image_id = self._reserve_id()
+            self._write_object(image_id, (
+                '<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray '
+                '/BitsPerComponent 1 /Filter /FlateDecode /DecodeParms << /Predictor 15 /Colors 1 '
+                '/BitsPerComponent 1 /Columns {width} >> /Length {length} >>').format(
+                width=width, height=height, length=len(data)).encode(), data)
+            images.append('/Im{} {} 0 R'.format(index, image_id))
+
+            # cells are filled from the top left corner, PDF coordinates start at the bottom left corner
+            left = self.MARGIN + (index % self.columns) * cell_width
+            top = self.PAGE_HEIGHT - self.MARGIN - (index // self.columns) * cell_height
+            x = left + (cell_width - size) / 2
+            y = top - size
+            # average width of a Helvetica character is about half of the font size
+            label_x = left + (cell_width - len(label) * self.LABEL_FONT_SIZE * 0.5) / 2
+            label = label.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            content.append('q {size:.2f} 0 0 {size:.2f} {x:.2f} {y:.2f} cm /Im{index} Do Q\n'
+                           'BT /F1 {font_size} Tf {label_x:.2f} {label_y:.2f} Td ({label}) Tj ET\n'.format(
+                               size=size, x=x, y=y, index=index, font_size=self.LABEL_FONT_SIZE, label_x=label_x,
+                               label_y=y - 1.5 * self.LABEL_FONT_SIZE, label=label))
+
+        stream = zlib.compress(''.join(content).encode('latin-1', 'replace'))
+        content_id = self._reserve_id()
+        self._write_object(content_id, '<< /Filter /FlateDecode /Length {} >>'.format(len(stream)).encode(), stream)
+
+        page_id = self._reserve_id()
+        self._write_object(page_id, (
+            '<< /Type /Page /Parent {} 0 R /MediaBox [0 0 {} {}] /Contents {} 0 R '
+            '/Resources << /Font << /F1 {} 0 R >> /XObject << {} >> >> >>').format(
+            self.PAGES_ID, self.PAGE_WIDTH, self.PAGE_HEIGHT, content_id, self.FONT_ID, ' '.join(images)).encode())
+        self.page_ids.append(page_id)
+        self.tiles = []
+
+    def close(self):
+        if self.tiles or not self.page_ids:
+            self._write_page()
+
+        self._write_object(self.PAGES_ID, '<< /Type /Pages /Kids [{}] /Count {} >>'.format(
+            ' '.join('{} 0 R'.format(page_id) for page_id in self.page_ids), len(self.page_ids)).encode())
+
+        xref_position = self.position
+        xref = ['xref\n0 {}\n'.format(self.next_id), '0000000000 65535 f \n']
+        xref.extend('{:010d} 00000 n \n'.format(self.offsets[object_id]) for object_id in range(1, self.next_id))
+        self._write(''.join(xref).encode())
+        self._write('trailer\n<< /Size {} /Root {} 0 R >>\nstartxref\n{}\n%%EOF\n'.format(
+            self.next_id, self.CATALOG_ID, xref_position).encode())
+
+
+class _QRCodeZipWriter(object):
+    def __init__(self, fileobj):
+        # PNGs are compressed already
+        self.zip_file = zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED)
+
+    def add(self, png, label):
+        self.zip_file.writestr(label, png)
+
+    def close(self):
+        self.zip_file.close()
+
+
+def stream_citizen_qr_codes(citizens, archive_format='zip'):
+    """
+    Yields the chunks of the archive of the PNG QR codes of the citizens
+
+    ZIP entries are named `<mobile number>_<citizen id>.png`, PDF tiles are labelled with the mobile number.
+
+    :param citizens: iterable of (citizen id, mobile number), e.g. get_citizens_for_qr_codes()
+    :param archive_format: 'zip' or 'pdf'
+    :return:
+    """
+    buffer = _StreamBuffer()
+    if archive_format == 'pdf':
+        writer = QRCodePDFWriter(buffer)
+    else:
+        writer = _QRCodeZipWriter(buffer)
+
+    for citizen_id, mobile_number in citizens:
+        png, _ = get_citizen_qr_code(citizen_id, 'png', cache_in_memory=False)
+        if archive_format == 'pdf':
+            writer.add(png, mobile_number)
+        else:
+            writer.add(png, '{}_{}.png'.format(mobile_number, citizen_id))
+
+        if buffer.size >= QR_CODE_ARCHIVE_CHUNK_SIZE:
+            yield buffer.pop()
+
+    writer.close()
+    yield buffer.pop()
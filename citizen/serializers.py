@@ -1,13 +1,15 @@
 import datetime
-import threading
 
+from django.conf import settings
 from rest_framework import serializers
 
 from authentication.models import FCMPushNotificationRegistrationToken
-from citizen.utils import update_citizen_user_info_to_iam, send_hotspot_proximity_notifications
+from citizen.utils import update_citizen_user_info_to_iam, send_batch_hotspot_proximity_notifications, \
+    invalidate_risk_assessment, record_citizen_historic_locations
 from core.custom_fields import TimeStampField
 from core.models import CitizenDiseaseRelation, WellnessStatusOutcome, CitizenPushNotifications, \
     CitizenHistoricLocationDiseaseRelation, Disease
+from core.utils import run_in_background
 from patient.serializers import HistoricLocationDataSerializer
 
 
@@ -90,7 +92,7 @@ class CitizenSerializer(serializers.ModelSerializer):
                 'fullname', instance.citizen.fullname)
 
             # updating the fullname of citizen in keycloak IAM
-            threading.Thread(target=update_citizen_user_info_to_iam, args=(instance,)).start()
+            run_in_background(update_citizen_user_info_to_iam, instance)
 
             instance.citizen.dob = citizen_data.get(
                 'dob', instance.citizen.dob)
@@ -108,14 +110,6 @@ class CitizenSerializer(serializers.ModelSerializer):
         return instance
 
 
-class QRSerializer(serializers.Serializer):
-    """
-    This serializer is the output of create qr code
-    """
-    file_type = serializers.CharField(max_length=5)
-    image_base64 = serializers.CharField(max_length=300)
-
-
 class PushNotificationDeviceRegistrationTokenSerializer(serializers.Serializer):
     """
     Serializes push notification device registration token data for firebase
@@ -182,18 +176,25 @@ class PushNotificationListingSerializer(serializers.ModelSerializer):
 class CitizenHistoricLocationDiseaseRelationSerializer(serializers.ModelSerializer):
     """
     Serializes the citizen historic location data
+
+    `exit_timestamp` is the last time a stay-point is observed, null for a location observed once
     """
     id = serializers.CharField(read_only=True)
     timestamp = TimeStampField()
+    exit_timestamp = serializers.CharField(read_only=True)
 
     class Meta:
         model = CitizenHistoricLocationDiseaseRelation
-        fields = ('id', 'lat', 'long', 'location_name', 'timestamp')
+        fields = ('id', 'lat', 'long', 'location_name', 'timestamp', 'exit_timestamp')
 
     def create(self, validated_data):
         """
         Records historic location of citizen to database
 
+        If the location continues the stay at the latest recorded location of the citizen, the latest location
+        is extended instead of recording it, and the posted location is returned with the id and the exit
+        timestamp of the latest location.
+
         :param validated_data:
         :return:
         """
@@ -207,12 +208,22 @@ class CitizenHistoricLocationDiseaseRelationSerializer(serializers.ModelSerializ
 
         # Check if the location is in proximity of patient historic location
         #  if in proximity, send notifications, also check the delay between last notification
-        threading.Thread(target=send_hotspot_proximity_notifications,
-                         args=(validated_data.get('lat'), validated_data.get('long'), citizen)).start()
+        run_in_background(send_batch_hotspot_proximity_notifications,
+                          [(validated_data.get('lat'), validated_data.get('long'))], citizen)
 
-        return CitizenHistoricLocationDiseaseRelation.objects.create(**validated_data,
-                                                                     recorded_date_time=timestamp,
-                                                                     citizen=citizen, disease=disease)
+        settings.LOGGER_LOCATION_UPLOAD.info("Citizen {} uploaded a historic location".format(citizen.id))
+
+        historic_location = CitizenHistoricLocationDiseaseRelation(**validated_data, recorded_date_time=timestamp)
+        recorded_historic_location = record_citizen_historic_locations(citizen, disease, [historic_location])[0]
+
+        # stored risk assessment exposure is outdated with the new historic location, once it is recorded
+        invalidate_risk_assessment(citizen.id)
+
+        if recorded_historic_location is not historic_location:
+            historic_location.id = recorded_historic_location.id
+            historic_location.exit_date_time = recorded_historic_location.exit_date_time
+
+        return historic_location
 
     def update(self, instance, validated_data):
         """
@@ -229,9 +240,12 @@ class CitizenHistoricLocationDiseaseRelationSerializer(serializers.ModelSerializ
         instance.recorded_date_time = validated_data.get('timestamp', instance.recorded_date_time)
         instance.save()
 
+        # stored risk assessment exposure is outdated with the updated historic location, once it is saved
+        invalidate_risk_assessment(instance.citizen_id)
+
         # Check if the location is in proximity of patient historic location
         #  if in proximity, send notifications, also check the delay between last notification
-        threading.Thread(target=send_hotspot_proximity_notifications,
-                         args=(instance.lat, instance.long, instance.citizen)).start()
+        run_in_background(send_batch_hotspot_proximity_notifications, [(instance.lat, instance.long)],
+                          instance.citizen)
 
         return instance
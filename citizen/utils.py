@@ -1,19 +1,29 @@
 # Reference - https://github.com/jitendrapurbey/qr_api/blob/master/api/utils.py
 
-import base64
-import io
+import itertools
 import json
-from datetime import date, timedelta
+import math
+from datetime import date, datetime, timedelta
 
-import qrcode
 # e.g. calculateAge(date(1997, 2, 3))
 from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
 from django.utils import timezone
-from haversine import haversine, Unit
 
-from authentication.models import FCMPushNotificationRegistrationToken
+from authentication.models import FCMPushNotificationRegistrationToken, Citizen
 from authentication.utils import iam_update_user_info, iam_get_user_token
-from core.models import PatientHistoricLocation, CitizenPushNotifications
+from core.models import CitizenPushNotifications, CitizenHistoricLocationDiseaseRelation, \
+    RiskAssessmentRecommendation, CitizenExposure
+from core.spatial import get_patient_historic_location_index, get_patient_historic_location_generation
+from core.instrumentation import timed
+from core.trajectory import TrajectoryPoint, compress_trajectory
+from core.utils import lazy_import
+
+qrcode = lazy_import('qrcode')
+
+# Exposures upserted per statement by the rescoring of all the citizens
+EXPOSURE_BATCH_SIZE = 1000
 
 
 def calculateAge(dob):
@@ -56,25 +66,6 @@ def generate_qr_code(data, size=10, border=0):
     return img
 
 
-def generate_qr(payload):
-    """
-    Generate the QR code and returns the base64 of image
-
-    :param payload:
-    :return:
-    """
-    generated_code = generate_qr_code(data=payload, size=4, border=1)
-    bio = io.BytesIO()
-    img_save = generated_code.save(bio)
-    png_qr = bio.getvalue()
-    base64qr = base64.b64encode(png_qr)
-    img_base64_data = base64qr.decode("utf-8")
-    context_dict = dict()
-    context_dict['file_type'] = "png"
-    context_dict['image_base64'] = img_base64_data
-    return context_dict
-
-
 def update_citizen_user_info_to_iam(citizen_disease_relation_instance):
     """
     Reflecting the updates to citizen profile to the corresponding user info in keycloak IAM
@@ -113,68 +104,390 @@ def update_citizen_user_info_to_iam(citizen_disease_relation_instance):
     return True
 
 
-def send_hotspot_proximity_notifications(citizen_location_lat, citizen_location_long, citizen_obj):
+def send_hotspot_proximity_notification(citizen_obj):
+    """
+    Sends hotspot proximity notification to the citizen devices and records it, unless the citizen
+    is notified within `DELAY_BETWEEN_NOTIFICATIONS_IN_SECONDS`
+
+    Returns True if the notification is sent
+
+    :param citizen_obj:
+    :return:
     """
-    Function that check if the provided citizen location coordinates is in proximity with patient historic locations
-    if it is within proximity, then send hotspot proximity notifications
+    last_notification = CitizenPushNotifications.objects.filter(citizen=citizen_obj).order_by('-added_on').first()
+    if last_notification is not None and (timezone.now() - last_notification.added_on).total_seconds() <= \
+            settings.DELAY_BETWEEN_NOTIFICATIONS_IN_SECONDS:
+        return False
+
+    notification_title = "Hotspot proximity warning !"
+    notification_body = "There are disease hotspots nearby your location !"
+
+    try:
+        citizen_device_query_set = FCMPushNotificationRegistrationToken.objects.filter(user=citizen_obj.user)
+        citizen_device_query_set.send_message(None, extra={
+            "notification": {
+                "title": notification_title,
+                "body": notification_body
+            },
+            "data": {
+                "type": "HOTSPOT-PROXIMITY"
+            }
+        })
+    except Exception as e:
+        settings.LOGGER_ERROR.error(
+            "Failed to send push notifications to citizen:{} devices, error:{}".format(citizen_obj.mobile_number,
+                                                                                       str(e)))
+
+    # Recording the send push notification to db
+    CitizenPushNotifications.objects.create(type='HOTSPOT-PROXIMITY',
+                                            title=notification_title,
+                                            body=notification_body,
+                                            citizen=citizen_obj)
+
+    return True
+
+
+@timed('proximity_check')
+def send_batch_hotspot_proximity_notifications(citizen_locations, citizen_obj):
+    """
+    Checks a batch of citizen locations against non expired patient historic locations in a single pass
+    over the patient historic location index, and sends at most one hotspot proximity notification
 
     This function is to executed thread for non blocking experience
 
-    :param citizen_location_lat:
-    :param citizen_location_long:
+    :param citizen_locations: list of (lat, long)
     :param citizen_obj:
     :return:
     """
     try:
+        patient_historic_location_index = get_patient_historic_location_index(
+            settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS)
+        if patient_historic_location_index.is_empty():
+            return None
+
+        end_timestamp = timezone.now().timestamp()
+        start_timestamp = end_timestamp - settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS
+
+        for lat, long in set(citizen_locations):
+            if patient_historic_location_index.has_match(lat, long, start_timestamp, end_timestamp):
+                send_hotspot_proximity_notification(citizen_obj)
+                return None
+
+        return None
+
+    except Exception as e:
+        settings.LOGGER_ERROR.error(
+            "Something went wrong while trying to send proximity notifications to citizen:{}, error:{}".format(
+                citizen_obj.mobile_number, str(e)))
+
+
+def get_citizen_historic_location_observed_after_filter(date_time):
+    """
+    Returns the filter for citizen historic locations observed at or after the datetime, i.e. locations recorded
+    after it and stay-points exited after it
+
+    :param date_time:
+    :return:
+    """
+    return Q(recorded_date_time__gte=date_time) | Q(
+        recorded_date_time__gte=date_time - timedelta(seconds=settings.TRAJECTORY_MAX_STAY_IN_SECONDS),
+        exit_date_time__gte=date_time)
+
+
+def _get_citizen_historic_location_trajectory_point(historic_location):
+    return TrajectoryPoint(historic_location.lat, historic_location.long,
+                           historic_location.recorded_date_time.timestamp(),
+                           historic_location.exit_date_time.timestamp() if historic_location.exit_date_time else None,
+                           payload=historic_location)
+
+
+def compress_citizen_historic_locations(historic_locations):
+    """
+    Compresses historic locations of a citizen into stay-points and simplified moving segments
+
+    :param historic_locations: list of CitizenHistoricLocationDiseaseRelation sorted by recorded date time
+    :return: list of TrajectoryPoint, with the historic locations as payload
+    """
+    return compress_trajectory([_get_citizen_historic_location_trajectory_point(historic_location)
+                                for historic_location in historic_locations],
+                               settings.TRAJECTORY_STAY_RADIUS_IN_METRES, settings.TRAJECTORY_MAX_GAP_IN_SECONDS,
+                               settings.TRAJECTORY_MAX_STAY_IN_SECONDS,
+                               settings.TRAJECTORY_SIMPLIFICATION_TOLERANCE_IN_METRES,
+                               settings.TRAJECTORY_SIMPLIFICATION_MAX_SEGMENT_LENGTH_IN_METRES)
+
+
+def record_citizen_historic_locations(citizen, disease, historic_locations):
+    """
+    Records new historic locations of a citizen compressed into stay-points and simplified moving segments
+
+    Compression continues from the latest recorded location of the citizen, if the new locations are a
+    continuation of its stay, the exit date time of the latest location is extended instead of recording them.
+    Locations older than the latest location (e.g. uploaded late) are compressed among themselves.
+
+    Returns the list of recorded historic locations, including the latest location if it is extended
+
+    :param citizen:
+    :param disease:
+    :param historic_locations: list of unsaved CitizenHistoricLocationDiseaseRelation
+    :return:
+    """
+    if not historic_locations:
+        return []
+
+    historic_locations = sorted(historic_locations,
+                                key=lambda historic_location: historic_location.recorded_date_time.timestamp())
+
+    with transaction.atomic():
+        # only a location observed within the max gap can be continued, which limits the partitions scanned
+        latest_historic_location = CitizenHistoricLocationDiseaseRelation.objects.select_for_update().filter(
+            citizen=citizen, disease=disease,
+            recorded_date_time__gte=historic_locations[0].recorded_date_time - timedelta(
+                seconds=settings.TRAJECTORY_MAX_STAY_IN_SECONDS + settings.TRAJECTORY_MAX_GAP_IN_SECONDS)).order_by(
+            '-recorded_date_time').first()
+
+        older_historic_locations = []
+        if latest_historic_location is not None:
+            latest_point = _get_citizen_historic_location_trajectory_point(latest_historic_location)
+            latest_exit_timestamp = latest_point.exit_timestamp
+
+            older_historic_locations = [historic_location for historic_location in historic_locations if
+                                        historic_location.recorded_date_time.timestamp() <= latest_exit_timestamp]
+            historic_locations = [latest_historic_location] + historic_locations[len(older_historic_locations):]
+
+        compressed_points = compress_citizen_historic_locations(older_historic_locations) + \
+            compress_citizen_historic_locations(historic_locations)
+
+        recorded_historic_locations = []
+        for point in compressed_points:
+            historic_location = point.payload
+            exit_date_time = datetime.fromtimestamp(point.exit_timestamp, tz=timezone.utc) if point.is_stay else None
+
+            if historic_location is latest_historic_location:
+                if point.exit_timestamp > latest_exit_timestamp:
+                    historic_location.exit_date_time = exit_date_time
+                    historic_location.save(update_fields=['exit_date_time'])
+                    recorded_historic_locations.append(historic_location)
+                continue
+
+            historic_location.citizen = citizen
+            historic_location.disease = disease
+            historic_location.exit_date_time = exit_date_time
+            recorded_historic_locations.append(historic_location)
+
+        CitizenHistoricLocationDiseaseRelation.objects.bulk_create(
+            [historic_location for historic_location in recorded_historic_locations if
+             historic_location is not latest_historic_location], batch_size=1000)
+
+    return recorded_historic_locations
+
+
+def store_exposures(exposures, generation):
+    """
+    Upserts the exposures of the citizens, calculated for a generation of the patient historic locations
+
+    :param exposures: list of (citizen id, exposure)
+    :param generation:
+    :return:
+    """
+    if not exposures:
+        return
+
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        # exposures of the citizens deleted meanwhile are skipped
+        cursor.execute("""
+            INSERT INTO {table} (citizen_id, generation, exposure, calculated_at)
+            SELECT exposure.citizen_id, exposure.generation, exposure.exposure, exposure.calculated_at
+            FROM (VALUES {values}) AS exposure (citizen_id, generation, exposure, calculated_at)
+            JOIN {citizen_table} citizen ON citizen.id = exposure.citizen_id
+            ON CONFLICT (citizen_id) DO UPDATE SET generation = EXCLUDED.generation, exposure = EXCLUDED.exposure,
+                calculated_at = EXCLUDED.calculated_at
+        """.format(table=CitizenExposure._meta.db_table, citizen_table=Citizen._meta.db_table,
+                   values=', '.join(['(%s::uuid, %s::bigint, %s::double precision, %s::timestamptz)'] *
+                                    len(exposures))),
+            [value for citizen_id, exposure in exposures for value in (citizen_id, generation, exposure, now)])
+
+
+def get_citizen_historic_location_trail(citizen_id):
+    """
+    Returns non expired historic locations of a citizen as a list of (lat, long, start timestamp, end timestamp)
+
+    :param citizen_id:
+    :return:
+    """
+    citizen_historic_locations = CitizenHistoricLocationDiseaseRelation.objects.filter(
+        get_citizen_historic_location_observed_after_filter(
+            timezone.now() - timedelta(seconds=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS)),
+        citizen__id=citizen_id).values_list('lat', 'long', 'recorded_date_time', 'exit_date_time')
+
+    trail = []
+    for lat, long, recorded_date_time, exit_date_time in citizen_historic_locations:
+        timestamp = recorded_date_time.timestamp()
+        trail.append((lat, long, timestamp, exit_date_time.timestamp() if exit_date_time else timestamp))
+
+    return trail
+
+
+def calculate_exposure(trail, patient_historic_location_index):
+    """
+    Calculates the exposure of a citizen from the historic location trail
+
+    Every patient historic location within proximity and time window of a trail location adds to the exposure,
+    weighted by how close it is in distance and in time.
+
+    :param trail: list of (lat, long, start timestamp, end timestamp)
+    :param patient_historic_location_index:
+    :return:
+    """
+    if patient_historic_location_index.is_empty():
+        return 0.0
+
+    radius = patient_historic_location_index.radius_in_metres
+    time_window = float(settings.RISK_ASSESSMENT_TIME_WINDOW_IN_SECONDS)
+
+    exposure = 0.0
+    for lat, long, start_timestamp, end_timestamp in trail:
+        for distance, (timestamp, _, _, _) in patient_historic_location_index.query(
+                lat, long, start_timestamp - time_window, end_timestamp + time_window):
+
+            # seconds between patient visit and citizen visit, zero if the visits overlap
+            time_difference = max(start_timestamp - timestamp, timestamp - end_timestamp, 0.0)
+
+            exposure += (1.0 - distance / radius) * (1.0 - time_difference / time_window)
+
+    return exposure
+
+
+def calculate_risk_assessment_score(exposure, recommendations):
+    """
+    Maps the exposure onto the point scale of risk assessment recommendations
 
-        # fetching all non expired patient historic locations
-        patient_historic_locations = PatientHistoricLocation.objects.filter(
-            recorded_date_time__gte=timezone.now() - timedelta(
-                seconds=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS)).order_by('-recorded_date_time')
-
-        # looping through patient historic locations to find if anything is in proximity with citizen location
-        for patient_historic_location in patient_historic_locations:
-            historic_location_coords = (patient_historic_location.lat, patient_historic_location.long)
-            citizen_location_coords = (citizen_location_lat, citizen_location_long)
-
-            # Check if the distance within proximity
-            distance = haversine(citizen_location_coords, historic_location_coords, unit=Unit.METERS)
-            if distance <= settings.HOTSPOT_PROXIMITY_IN_METRES:
-                # check the delay between last notification send to this citizen
-                citizen_notifications_set = CitizenPushNotifications.objects.filter(citizen=citizen_obj).order_by(
-                    '-added_on')
-
-                is_send_notification = False
-
-                if citizen_notifications_set.count() == 0:
-                    is_send_notification = True
-                else:
-                    # calculate the delay in seconds between last notification and current time
-                    last_notification = citizen_notifications_set[0]
-                    seconds_elapsed_since_last_notification = (timezone.now() - last_notification.added_on).seconds
-
-                    if seconds_elapsed_since_last_notification > settings.DELAY_BETWEEN_NOTIFICATIONS_IN_SECONDS:
-                        is_send_notification = True
-
-                if is_send_notification:
-                    # send hotspot proximity notifications
-                    citizen_device_query_set = FCMPushNotificationRegistrationToken.objects.filter(
-                        user=citizen_obj.user)
-                    citizen_device_query_set.send_message(None, extra={
-                        "notification": {
-                            "title": "Hotspot proximity warning !",
-                            "body": "There are disease hotspots nearby your location !"
-                        },
-                        "data": {
-                            "type": "HOTSPOT-PROXIMITY"
-                        }
-                    })
-
-                    return None
+    Score grows with exposure and saturates at the highest recommendation point upper limit
 
+    :param exposure:
+    :param recommendations:
+    :return:
+    """
+    if not recommendations:
+        return 0.0
+
+    max_points = max(recommendation.point_upper_limit for recommendation in recommendations)
+    score = max_points * (1.0 - math.exp(-exposure / settings.RISK_ASSESSMENT_EXPOSURE_SCALE))
+
+    return round(score, 1)
+
+
+def get_risk_assessment_recommendation(score, recommendations):
+    """
+    Returns the recommendation whose point range contains the score,
+    if none of them contains the score then the recommendation with the nearest point range is returned.
+
+    :param score:
+    :param recommendations:
+    :return:
+    """
+    if not recommendations:
         return None
 
-    except:
+    def distance_from_point_range(recommendation):
+        if recommendation.point_lower_limit <= score <= recommendation.point_upper_limit:
+            return 0.0
+        return min(abs(score - recommendation.point_lower_limit), abs(score - recommendation.point_upper_limit))
+
+    return min(recommendations, key=distance_from_point_range)
+
+
+def get_citizen_exposure(citizen_id):
+    """
+    Returns the exposure of a citizen
+
+    Exposure is stored per citizen (CitizenExposure) until the citizen records new historic locations or patient
+    historic locations are changed, for up to `RISK_ASSESSMENT_SCORE_CACHE_TIMEOUT_IN_SECONDS`.
+
+    :param citizen_id:
+    :return:
+    """
+    generation = get_patient_historic_location_generation()
+
+    stored_exposure = CitizenExposure.objects.filter(
+        citizen_id=citizen_id, generation=generation, calculated_at__gte=timezone.now() - timedelta(
+            seconds=settings.RISK_ASSESSMENT_SCORE_CACHE_TIMEOUT_IN_SECONDS)).values_list('exposure', flat=True).first()
+    if stored_exposure is not None:
+        return stored_exposure
+
+    exposure = calculate_exposure(get_citizen_historic_location_trail(citizen_id),
+                                  get_patient_historic_location_index())
+
+    store_exposures([(citizen_id, exposure)], generation)
+
+    return exposure
+
+
+def perform_risk_assessment(citizen_id):
+    """
+    Performs risk assessment for a citizen
+
+    Returns a tuple of score and the matching risk assessment recommendation
+
+    :param citizen_id:
+    :return:
+    """
+    recommendations = list(RiskAssessmentRecommendation.objects.all())
+
+    score = calculate_risk_assessment_score(get_citizen_exposure(citizen_id), recommendations)
+
+    return score, get_risk_assessment_recommendation(score, recommendations)
+
+
+def invalidate_risk_assessment(citizen_id):
+    """
+    Invalidates the stored risk assessment of a citizen, to be called once new historic locations are committed
+
+    :param citizen_id:
+    :return:
+    """
+    CitizenExposure.objects.filter(citizen_id=citizen_id).delete()
+
+
+def rescore_all_citizens():
+    """
+    Recalculates the exposure of every citizen with non expired historic locations and stores it
+
+    Citizen historic locations are streamed ordered by citizen, so that only one trail is held in memory
+    at a time, exposures are upserted `EXPOSURE_BATCH_SIZE` citizens at a time. This function is to be executed in a background thread after patient historic locations
+    are uploaded.
+
+    :return:
+    """
+    try:
+        generation = get_patient_historic_location_generation()
+        patient_historic_location_index = get_patient_historic_location_index()
+
+        citizen_historic_locations = CitizenHistoricLocationDiseaseRelation.objects.filter(
+            get_citizen_historic_location_observed_after_filter(
+                timezone.now() - timedelta(seconds=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS))).order_by(
+            'citizen_id').values_list('citizen_id', 'lat', 'long', 'recorded_date_time', 'exit_date_time')
+
+        no_of_citizens = 0
+        exposures = []
+        for citizen_id, citizen_historic_location_group in itertools.groupby(
+                citizen_historic_locations.iterator(), key=lambda historic_location: historic_location[0]):
+
+            trail = []
+            for _, lat, long, recorded_date_time, exit_date_time in citizen_historic_location_group:
+                timestamp = recorded_date_time.timestamp()
+                trail.append((lat, long, timestamp, exit_date_time.timestamp() if exit_date_time else timestamp))
+
+            exposures.append((citizen_id, calculate_exposure(trail, patient_historic_location_index)))
+            no_of_citizens += 1
+            if len(exposures) == EXPOSURE_BATCH_SIZE:
+                store_exposures(exposures, generation)
+                exposures = []
+
+        store_exposures(exposures, generation)
+
+        settings.LOGGER_INFO.info("Risk assessment scores recalculated for {} citizens".format(no_of_citizens))
+
+    except Exception as e:
         settings.LOGGER_ERROR.error(
-            "Something went wrong while trying to send proximity notifications to citizen:{}",
-            citizen_obj.mobile_number)
+            "Something went wrong while recalculating risk assessment scores, error:{}".format(str(e)))
@@ -1,27 +1,39 @@
-import base64
-import json
 from datetime import timedelta
 
 from django.conf import settings
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.http import HttpResponse
+from django.db.models import Subquery
+from django.http import HttpResponse, HttpResponseNotModified
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
 from rest_framework import generics, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from authentication.models import Citizen, FCMPushNotificationRegistrationToken
 from authentication.permissions import IsCitizen
-from citizen.serializers import CitizenSerializer, QRSerializer, \
+from citizen.serializers import CitizenSerializer, \
     PushNotificationDeviceRegistrationTokenSerializer, PushNotificationTokenDeleteSerializer, \
     PushNotificationListingSerializer, CitizenHistoricLocationDiseaseRelationSerializer
-from citizen.utils import generate_qr
+from citizen.qr import QR_CODE_CONTENT_TYPES, get_citizen_qr_code
+from citizen.utils import perform_risk_assessment, invalidate_risk_assessment, \
+    send_batch_hotspot_proximity_notifications, record_citizen_historic_locations, \
+    get_citizen_historic_location_observed_after_filter
 from core.models import CitizenDiseaseRelation, Disease, PatientHistoricLocation, CitizenPushNotifications, \
     CitizenHistoricLocationDiseaseRelation
+from core.parsers import GzipJSONParser, JSONLinesParser, MessagePackParser, PolylineJSONParser
+from core.throttling import UserThrottle
+from core.trajectory import TrajectoryPoint, is_on_trajectory, get_enter_timestamps
+from core.utils import run_in_background
+from core.views import ReplicaReadMixin
 from patient.serializers import HistoricLocationDataSerializer
+from super_admin.serializers import RiskAssessmentRecommendationSerializer
 
 
-class CitizenMapDataAPIView(generics.GenericAPIView):
+class CitizenMapDataAPIView(ReplicaReadMixin, generics.GenericAPIView):
     """
     CitizenMapDataAPIView
 
@@ -103,6 +115,14 @@ class CitizenHistoricLocationDiseaseRelationViewSet(viewsets.ModelViewSet):
     queryset = CitizenHistoricLocationDiseaseRelation.objects.all().order_by('-recorded_date_time')
     serializer_class = CitizenHistoricLocationDiseaseRelationSerializer
     permission_classes = (IsAuthenticated, IsCitizen)
+    throttle_classes = (UserThrottle,)
+    throttle_scope = 'location_upload'
+
+    def get_throttles(self):
+        # only the uploads are rate limited, not the reads and deletes of the locations
+        if self.action in ('create', 'batch'):
+            return super().get_throttles()
+        return []
 
     def create(self, request, *args, **kwargs):
         citizen = Citizen.objects.get(user__id=request.user.id)
@@ -113,23 +133,141 @@ class CitizenHistoricLocationDiseaseRelationViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_risk_assessment(instance.citizen_id)
+
+    @action(detail=False, methods=['post'],
+            parser_classes=(GzipJSONParser, JSONLinesParser, MessagePackParser, PolylineJSONParser))
+    def batch(self, request):
+        """
+        Records a batch of historic locations of the citizen, e.g. locations recorded while the device was offline
+
+        Accepts a JSON array of locations (or {"historic_locations": [...]}) or newline delimited JSON with
+        a location per line (`Content-Type: application/x-ndjson`), MessagePack (`Content-Type: application/msgpack`)
+        or polyline encoded JSON (`Content-Type: application/vnd.polyline+json`), optionally gzip compressed.
+
+        Valid locations are recorded as stay-points and simplified moving segments, invalid and already recorded
+        locations are reported back as rejects along with their index in the batch.
+        Proximity to hotspots is checked once for the whole batch.
+
+        :param request:
+        :return:
+        """
+        citizen = Citizen.objects.get(user__id=request.user.id)
+
+        points = request.data
+        if isinstance(points, dict):
+            points = points.get('historic_locations')
+
+        if not isinstance(points, list):
+            raise ValidationError({"historic_locations": ["Please provide a list of historic locations !"]})
+
+        if len(points) > settings.CITIZEN_HISTORIC_LOCATION_BATCH_MAX_SIZE:
+            raise ValidationError({"historic_locations": ["Please provide at most {} historic locations !".format(
+                settings.CITIZEN_HISTORIC_LOCATION_BATCH_MAX_SIZE)]})
+
+        try:
+            disease = Disease.objects.get(name="COVID-19")
+        except Disease.DoesNotExist:
+            raise ValidationError('Unable to fetch diseases. Initialize disease db')
+
+        # validating all the points with a single serializer instance
+        point_serializer = self.serializer_class()
+        validated_points = []
+        rejects = []
+        for index, point in enumerate(points):
+            try:
+                validated_points.append((index, point_serializer.run_validation(point)))
+            except ValidationError as e:
+                rejects.append({"index": index, "errors": e.detail})
+
+        # skipping the points which are already recorded, e.g. a batch uploaded again after a timeout,
+        #  either as a location or within a stay-point or a simplified segment
+        trajectory = []
+        if validated_points:
+            timestamps = [validated_point['timestamp'] for _, validated_point in validated_points]
+            trajectory = [TrajectoryPoint(lat, long, recorded_date_time.timestamp(),
+                                          exit_date_time.timestamp() if exit_date_time else None)
+                          for lat, long, recorded_date_time, exit_date_time in
+                          CitizenHistoricLocationDiseaseRelation.objects.filter(
+                              get_citizen_historic_location_observed_after_filter(min(timestamps)),
+                              citizen=citizen,
+                              recorded_date_time__lte=max(timestamps) + timedelta(
+                                  seconds=settings.TRAJECTORY_MAX_GAP_IN_SECONDS)).order_by(
+                              'recorded_date_time').values_list('lat', 'long', 'recorded_date_time', 'exit_date_time')]
+        enter_timestamps = get_enter_timestamps(trajectory)
+
+        recorded = set()
+        historic_locations = []
+        for index, validated_point in validated_points:
+            lat, long, timestamp = validated_point['lat'], validated_point['long'], validated_point['timestamp']
+            key = (lat, long, int(timestamp.timestamp()))
+            if key in recorded or is_on_trajectory(
+                    TrajectoryPoint(lat, long, timestamp.timestamp()), trajectory,
+                    settings.TRAJECTORY_STAY_RADIUS_IN_METRES, settings.TRAJECTORY_MAX_GAP_IN_SECONDS,
+                    settings.TRAJECTORY_SIMPLIFICATION_TOLERANCE_IN_METRES, enter_timestamps):
+                rejects.append({"index": index, "errors": {"error": ["Historic location is already recorded !"]}})
+                continue
+            recorded.add(key)
+
+            historic_locations.append(CitizenHistoricLocationDiseaseRelation(
+                lat=lat, long=long, location_name=validated_point.get('location_name', ""),
+                recorded_date_time=timestamp))
+
+        if historic_locations:
+            # consecutive locations are recorded as stay-points and simplified moving segments
+            record_citizen_historic_locations(citizen, disease, historic_locations)
+
+            # stored risk assessment exposure is outdated with the new historic locations
+            invalidate_risk_assessment(citizen.id)
+
+            # Check if any of the locations is in proximity of patient historic locations
+            #  if in proximity, send a single notification, also check the delay between last notification
+            run_in_background(send_batch_hotspot_proximity_notifications,
+                              [(historic_location.lat, historic_location.long) for historic_location in
+                               historic_locations], citizen)
+
+        settings.LOGGER_LOCATION_UPLOAD.info("Citizen {} uploaded {} historic locations, {} rejected".format(
+            citizen.id, len(historic_locations), len(rejects)))
+
+        return Response({
+            "created": len(historic_locations),
+            "rejected": len(rejects),
+            "rejects": sorted(rejects, key=lambda reject: reject['index'])
+        }, status=status.HTTP_201_CREATED if historic_locations else status.HTTP_200_OK)
+
 
 class CitizenQRCodeAPIView(generics.GenericAPIView):
     """
-    QR code for citizen profile
+    QR code for citizen profile, as PNG or as SVG with `?output=svg`
+
+    QR code of a citizen never changes, it is served from the QR code cache (citizen/qr.py) with its digest as
+    `ETag` and cached by the clients as immutable. Clients revalidating their copy with `If-None-Match` get a 304
+    response.
 
     Todo : What is the use case of this ??
     """
     permission_classes = (IsAuthenticated, IsCitizen)
 
     def get(self, request):
-        output = generate_qr(json.dumps(
-            {"id": str(Citizen.objects.get(user__id=request.user.id).id)}))
-        result = QRSerializer(output).data
+        image_format = request.query_params.get('output', 'png')
+        if image_format not in QR_CODE_CONTENT_TYPES:
+            raise ValidationError({"output": ["Output must be one of {}".format(", ".join(QR_CODE_CONTENT_TYPES))]})
+
+        citizen_id = Citizen.objects.values_list('id', flat=True).get(user__id=request.user.id)
+        content, etag = get_citizen_qr_code(citizen_id, image_format)
 
-        # custom response for serving QR code
-        response = HttpResponse(content_type="image/png")
-        response.write(base64.b64decode(result['image_base64'].encode()))
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            # custom response for serving QR code
+            response = HttpResponse(content, content_type=QR_CODE_CONTENT_TYPES[image_format])
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        # the same url serves the code of the citizen of the access token
+        patch_vary_headers(response, ('Authorization',))
         return response
 
 
@@ -183,7 +321,7 @@ class PushNotificationDeviceRegistrationTokenDeleteAPIView(generics.GenericAPIVi
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class NotificationsListingAPIView(generics.GenericAPIView):
+class NotificationsListingAPIView(ReplicaReadMixin, generics.GenericAPIView):
     """
     NotificationsListingAPIView
 
@@ -198,8 +336,10 @@ class NotificationsListingAPIView(generics.GenericAPIView):
 
         page = request.GET.get('page', 1)
 
-        notifications_query_set = CitizenPushNotifications.objects.filter(citizen__user__id=request.user.id).order_by(
-            '-added_on')
+        # the citizen is looked up in a subquery rather than joined, so that the notifications are read newest first
+        # from citizen_notification_added_idx instead of being sorted
+        notifications_query_set = CitizenPushNotifications.objects.filter(citizen_id=Subquery(
+            Citizen.objects.filter(user__id=request.user.id).values('id'))).order_by('-added_on')
 
         paginator = Paginator(notifications_query_set, 10)
         try:
@@ -247,12 +387,25 @@ class NotificationReadStatusUpdate(generics.GenericAPIView):
 
 class PerformRiskAssessmentAPI(generics.GenericAPIView):
     """
-    Returns a mock score for risk assessment
+    PerformRiskAssessmentAPI
+
+    Returns the risk assessment score of the citizen along with the matching recommendation.
+
+    Score is calculated from the exposure of citizen historic locations to non expired
+    patient historic locations (proximity in distance and time).
     """
 
     permission_classes = (IsAuthenticated, IsCitizen,)
 
     def get(self, request):
-        return Response({"score": 4.3})
+        citizen = Citizen.objects.get(user__id=request.user.id)
+
+        score, recommendation = perform_risk_assessment(citizen.id)
+
+        return Response({
+            "score": score,
+            "recommendation": RiskAssessmentRecommendationSerializer(
+                recommendation).data if recommendation is not None else None
+        })
 
 # Todo : List notification types
@@ -1,5 +1,18 @@
+import os
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # registering signal receivers checking and counting the database connections
+        import core.db  # noqa: F401
+        # registering signal receiver timing the database queries of instrumented requests
+        import core.instrumentation  # noqa: F401
+
+        # directories used by the application, created once the settings are loaded rather than on import
+        for directory in (settings.STATIC_TMP, settings.UPLOADS_TMP, settings.CACHE_LOCATION):
+            os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,18 @@
+class Benchmark(object):
+    """
+    Benchmark run with `python manage.py benchmark <name>` (see core/management/commands/benchmark.py)
+
+    Benchmarks are written like management commands, they add their arguments to the parser of their sub command in
+    `add_arguments`, run in `handle` with the parsed options and write their results to `self.stdout`.
+    """
+    help = ''
+
+    def __init__(self, stdout, stderr):
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def add_arguments(self, parser):
+        pass
+
+    def handle(self, *args, **options):
+        raise NotImplementedError("Benchmarks should implement handle")
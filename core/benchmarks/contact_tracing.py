@@ -0,0 +1,89 @@
+import random
+import time
+
+from haversine import haversine, Unit
+
+from core.benchmarks import Benchmark
+from patient.utils import find_contact_traced_citizens
+
+
+class ContactTracingBenchmark(Benchmark):
+    """
+    Benchmarks the contact tracing spatio temporal join on synthetic data, without touching the database.
+
+    Citizen and patient historic locations are scattered uniformly over a city sized area and over the
+    historic location expiry period. The nested loop join is timed on a sample of citizen locations
+    and extrapolated, since running it on the full data set takes hours.
+
+    e.g. python manage.py benchmark contact_tracing --citizen-points 1000000 --patient-points 10000
+    """
+    help = "Benchmarks the contact tracing join between citizen and patient historic locations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citizen-points', type=int, default=1000000)
+        parser.add_argument('--patient-points', type=int, default=10000)
+        parser.add_argument('--citizens', type=int, default=50000)
+        parser.add_argument('--radius', type=float, default=100.0, help="Proximity radius in metres")
+        parser.add_argument('--time-window', type=float, default=3600.0, help="Time window in seconds")
+        parser.add_argument('--area', type=float, default=0.5, help="Side of the area in degrees")
+        parser.add_argument('--days', type=int, default=14)
+        parser.add_argument('--nested-loop-sample', type=int, default=200,
+                            help="Number of citizen locations used for timing the nested loop join")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        # somewhere around Kochi
+        origin_lat, origin_long = 9.9, 76.2
+        area = options['area']
+        end_timestamp = time.time()
+        start_timestamp = end_timestamp - options['days'] * 24 * 3600
+
+        def random_point():
+            return (origin_lat + rng.random() * area, origin_long + rng.random() * area,
+                    rng.uniform(start_timestamp, end_timestamp))
+
+        patient_points = [random_point() for _ in range(options['patient_points'])]
+        citizen_historic_locations = []
+        for _ in range(options['citizen_points']):
+            lat, long, timestamp = random_point()
+            citizen_historic_locations.append((rng.randrange(options['citizens']), lat, long, timestamp, timestamp))
+
+        radius = options['radius']
+        time_window = options['time_window']
+
+        self.stdout.write("Citizen points: {}, patient points: {}, citizens: {}".format(
+            len(citizen_historic_locations), len(patient_points), options['citizens']))
+
+        started = time.perf_counter()
+        matched_citizen_ids = find_contact_traced_citizens(patient_points, citizen_historic_locations, radius,
+                                                           time_window)
+        index_join_seconds = time.perf_counter() - started
+
+        self.stdout.write("Grid hash join: {:.2f} s, {:.0f} citizen points/s, matched citizens: {}".format(
+            index_join_seconds, len(citizen_historic_locations) / index_join_seconds, len(matched_citizen_ids)))
+
+        # nested loop join over a sample, for comparison
+        sample = citizen_historic_locations[:options['nested_loop_sample']]
+
+        started = time.perf_counter()
+        nested_loop_matched_citizen_ids = set()
+        for citizen_id, lat, long, timestamp, _ in sample:
+            for patient_lat, patient_long, patient_timestamp in patient_points:
+                if abs(patient_timestamp - timestamp) <= time_window and \
+                        haversine((lat, long), (patient_lat, patient_long), unit=Unit.METERS) <= radius:
+                    nested_loop_matched_citizen_ids.add(citizen_id)
+                    break
+        nested_loop_seconds = time.perf_counter() - started
+
+        estimated_nested_loop_seconds = nested_loop_seconds * len(citizen_historic_locations) / len(sample)
+        self.stdout.write("Nested loop join (estimated from {} points): {:.0f} s, speed up: {:.0f}x".format(
+            len(sample), estimated_nested_loop_seconds, estimated_nested_loop_seconds / index_join_seconds))
+
+        # join results must agree on the sample
+        sample_matched_citizen_ids = find_contact_traced_citizens(patient_points, sample, radius, time_window)
+        if sample_matched_citizen_ids != nested_loop_matched_citizen_ids:
+            self.stderr.write("Grid hash join and nested loop join results differ !")
+        else:
+            self.stdout.write("Grid hash join and nested loop join results match on the sample")
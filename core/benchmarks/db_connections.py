@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.signals import request_started, request_finished
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarks import Benchmark
+from core.db import get_connection_stats
+from disease.views import DiseaseCRUDViewSet
+
+
+class DBConnectionsBenchmark(Benchmark):
+    """
+    Benchmarks request latency with a new database connection per request (CONN_MAX_AGE = 0) against
+    persistent connections, with and without the connection health check
+
+    Requests are simulated in this thread with the request started / finished signals, which open and
+    close the database connections the same way as in a worker.
+
+    e.g. python manage.py benchmark db_connections --requests 500
+    """
+    help = "Benchmarks request latency with and without persistent database connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def _run(self, label, conn_max_age, health_checks, requests):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        settings.DATABASE_CONNECTION_HEALTH_CHECKS = health_checks
+
+        view = DiseaseCRUDViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        opened_before = get_connection_stats()['opened']
+
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            try:
+                response = view(factory.get('/v1/disease/'))
+                response.render()
+            finally:
+                request_finished.send(sender=self.__class__)
+            latencies.append(time.perf_counter() - started)
+
+        latencies.sort()
+        self.stdout.write("{:<36} {:>10.2f} {:>10.2f} {:>10.2f} {:>12}".format(
+            label, statistics.mean(latencies) * 1000, latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.95)] * 1000, get_connection_stats()['opened'] - opened_before))
+
+    def handle(self, *args, **options):
+        conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+        health_checks = settings.DATABASE_CONNECTION_HEALTH_CHECKS
+
+        self.stdout.write("{:<36} {:>10} {:>10} {:>10} {:>12}".format(
+            "mode", "mean ms", "p50 ms", "p95 ms", "connections"))
+        try:
+            self._run("new connection per request", 0, False, options['requests'])
+            self._run("persistent", 600, False, options['requests'])
+            self._run("persistent with health check", 600, True, options['requests'])
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+            settings.DATABASE_CONNECTION_HEALTH_CHECKS = health_checks
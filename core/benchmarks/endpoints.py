@@ -0,0 +1,375 @@
+import json
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+import warnings
+from contextlib import ExitStack
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User, Citizen, DataEntryAdmin, FCMPushNotificationRegistrationToken
+from authentication.utils import hex_uuid
+from core.benchmarks import Benchmark
+from core.models import Disease, DiseaseInfectionStatus, PatientHistoricLocation, CitizenDiseaseRelation, \
+    CitizenHistoricLocationDiseaseRelation, CitizenPushNotifications, MobileNumberWhitelist
+from core.spatial import bump_patient_historic_location_generation
+
+ENDPOINTS = ('citizen_map_data', 'location_upload', 'profile_get', 'profile_put', 'notifications_listing',
+             'otp_send', 'patient_bulk_create')
+
+# citizens whose tokens are used for the requests, the rest of the seeded citizens is data only
+REQUESTING_CITIZENS = 100
+
+
+class FakeTwilioClient(object):
+    """
+    Stands in for twilio.rest.Client, taking `latency` seconds per SMS without sending it
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.messages = self
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return SimpleNamespace(sid="SM{}".format(hex_uuid()))
+
+
+class EndpointsBenchmark(Benchmark):
+    """
+    Benchmarks the hot endpoints through the whole middleware and authentication stack, on a database seeded with
+    synthetic citizens, devices, notifications, patient and citizen historic locations at the given scale
+
+        - citizen map data, location upload (batch), profile GET / PUT and notifications listing as citizens
+        - OTP send, against a fake Twilio client
+        - patient historic location bulk create as a data entry admin
+
+    Push notifications (FCM) and IAM profile updates are faked. Seeded data is deleted afterwards.
+
+    Reports throughput, p50 / p95 / p99 latency and database queries per request of every endpoint, written as
+    JSON with `--output` for comparing commits with `--compare`
+
+    e.g. python manage.py benchmark endpoints --citizens 10000 --requests 200 --output benchmark.json
+         python manage.py benchmark endpoints --citizens 10000 --requests 200 --compare benchmark.json
+    """
+    help = "Benchmarks the hot endpoints on a database seeded at the given scale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citizens', type=int, default=1000)
+        parser.add_argument('--devices-per-citizen', type=int, default=1)
+        parser.add_argument('--notifications-per-citizen', type=int, default=20)
+        parser.add_argument('--citizen-locations-per-citizen', type=int, default=50)
+        parser.add_argument('--patient-locations', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=100, help="Requests per endpoint")
+        parser.add_argument('--concurrency', type=int, default=1, help="Client threads per endpoint")
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help="Locations per location upload and patient bulk create request")
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+        parser.add_argument('--twilio-latency-ms', type=float, default=0.0)
+        parser.add_argument('--push-latency-ms', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', default=None, help="Path of the JSON report")
+        parser.add_argument('--compare', default=None, help="Path of a JSON report to compare against")
+
+    def _seed(self, options, rng, disease):
+        """
+        Seeds the benchmark data, created rows are tagged by the returned namespace for the cleanup
+
+        :param options:
+        :param rng:
+        :param disease:
+        :return:
+        """
+        now = timezone.now()
+        expiry = settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS
+
+        def random_coordinates():
+            return {"lat": 9.9 + rng.random() / 2, "long": 76.2 + rng.random() / 2}
+
+        def random_recent_time():
+            return now - timedelta(seconds=rng.randrange(60, expiry))
+
+        # +910 numbers are possible numbers which are not assigned to mobiles
+        first_number = rng.randrange(10 ** 8)
+        mobile_numbers = ["+910{:09d}".format(first_number + index) for index in range(options['citizens'])]
+        if User.objects.filter(username__in=mobile_numbers[:1000]).exists():
+            raise CommandError("Seeded mobile numbers are in use, run with another --seed")
+
+        seeded = SimpleNamespace(mobile_numbers=mobile_numbers, user_ids=[], infection_status=None)
+
+        seeded.infection_status = DiseaseInfectionStatus.objects.create(
+            disease=disease, infection_status="benchmark-{}".format(hex_uuid()[:8]))
+
+        users = [User(username=mobile_number) for mobile_number in mobile_numbers]
+        User.objects.bulk_create(users, batch_size=1000)
+        seeded.user_ids = [user.id for user in users]
+
+        citizens = [Citizen(user=user, mobile_number=user.username, fullname="Citizen {}".format(index))
+                    for index, user in enumerate(users)]
+        Citizen.objects.bulk_create(citizens, batch_size=1000)
+        CitizenDiseaseRelation.objects.bulk_create(
+            [CitizenDiseaseRelation(citizen=citizen, disease=disease) for citizen in citizens], batch_size=1000)
+        MobileNumberWhitelist.objects.bulk_create(
+            [MobileNumberWhitelist(mobile_number=mobile_number) for mobile_number in mobile_numbers],
+            batch_size=1000)
+
+        FCMPushNotificationRegistrationToken.objects.bulk_create([
+            FCMPushNotificationRegistrationToken(user=user, registration_id=hex_uuid(), device_id=hex_uuid(),
+                                                 cloud_message_type="FCM")
+            for user in users for _ in range(options['devices_per_citizen'])], batch_size=1000)
+
+        CitizenPushNotifications.objects.bulk_create([
+            CitizenPushNotifications(citizen=citizen, type="HOTSPOT-PROXIMITY", title="Hotspot proximity warning !",
+                                     body="There are disease hotspots nearby your location !",
+                                     added_on=random_recent_time())
+            for citizen in citizens for _ in range(options['notifications_per_citizen'])], batch_size=1000)
+
+        CitizenHistoricLocationDiseaseRelation.objects.bulk_create([
+            CitizenHistoricLocationDiseaseRelation(citizen=citizen, disease=disease, **random_coordinates(),
+                                                   recorded_date_time=random_recent_time())
+            for citizen in citizens for _ in range(options['citizen_locations_per_citizen'])], batch_size=1000)
+
+        PatientHistoricLocation.objects.bulk_create([
+            PatientHistoricLocation(**random_coordinates(), recorded_date_time=random_recent_time(),
+                                    disease_infection_status=seeded.infection_status)
+            for _ in range(options['patient_locations'])], batch_size=1000)
+        bump_patient_historic_location_generation()
+
+        admin = User.objects.create(username="benchmark-admin-{}".format(hex_uuid()))
+        seeded.user_ids.append(admin.id)
+        DataEntryAdmin.objects.create(user=admin, fullname="Benchmark", department="Benchmark",
+                                      designation="Benchmark", organisation="Benchmark")
+
+        seeded.citizens = citizens[:REQUESTING_CITIZENS]
+        seeded.citizen_tokens = [str(RefreshToken.for_user(user).access_token)
+                                 for user in users[:REQUESTING_CITIZENS]]
+        seeded.admin_token = str(RefreshToken.for_user(admin).access_token)
+        return seeded
+
+    def _clean_up(self, seeded):
+        # citizens, devices, notifications and historic locations are deleted along with the users
+        for start in range(0, len(seeded.user_ids), 1000):
+            User.objects.filter(id__in=seeded.user_ids[start:start + 1000]).delete()
+        for start in range(0, len(seeded.mobile_numbers), 1000):
+            MobileNumberWhitelist.objects.filter(mobile_number__in=seeded.mobile_numbers[start:start + 1000]).delete()
+        if seeded.infection_status is not None:
+            seeded.infection_status.delete()
+        bump_patient_historic_location_generation()
+
+    def _get_requests(self, seeded, rng, batch_size):
+        """
+        Returns the request maker of every endpoint, called with the request index it returns
+        (client method, path, data, token)
+
+        :param seeded:
+        :param rng:
+        :param batch_size:
+        :return:
+        """
+        now = int(time.time())
+
+        def citizen_token(index):
+            return seeded.citizen_tokens[index % len(seeded.citizen_tokens)]
+
+        def location_batch(index):
+            # timestamps are unique per request, so that no location is rejected as already recorded
+            return [{
+                "lat": 9.9 + rng.random() / 2,
+                "long": 76.2 + rng.random() / 2,
+                "location_name": "",
+                "timestamp": str(now - (index * batch_size + point) * 60)
+            } for point in range(batch_size)]
+
+        return {
+            'citizen_map_data': lambda index: ('get', '/v1/citizen/map/data/', None, citizen_token(index)),
+            'location_upload': lambda index: (
+                'post', '/v1/citizen/historic-location/batch/', location_batch(index), citizen_token(index)),
+            'profile_get': lambda index: ('get', '/v1/citizen/profile/', None, citizen_token(index)),
+            'profile_put': lambda index: ('put', '/v1/citizen/profile/', {
+                "fullname": "Citizen {}".format(index),
+                "home_latitude": 9.9 + rng.random() / 2,
+                "home_longitude": 76.2 + rng.random() / 2
+            }, citizen_token(index)),
+            'notifications_listing': lambda index: (
+                'get', '/v1/citizen/notification/?page={}'.format(index % 3 + 1), None, citizen_token(index)),
+            'otp_send': lambda index: ('post', '/v1/citizen/auth/send-otp/', {
+                "mobile_number": seeded.citizens[index % len(seeded.citizens)].mobile_number
+            }, None),
+            'patient_bulk_create': lambda index: ('post', '/v1/patient/historic-location/', {
+                "infection_status_id": seeded.infection_status.id,
+                "historic_locations": location_batch(index)
+            }, seeded.admin_token)
+        }
+
+    def _load(self, make_request, requests, concurrency):
+        latencies = []
+        queries = [0]
+        errors = []
+        lock = threading.Lock()
+
+        def client(indexes):
+            http_client = Client()
+            thread_latencies = []
+            thread_queries = 0
+            try:
+                for index in indexes:
+                    method, path, data, token = make_request(index)
+                    headers = {'HTTP_AUTHORIZATION': 'Bearer {}'.format(token)} if token else {}
+                    kwargs = {'data': json.dumps(data), 'content_type': 'application/json'} if data else {}
+
+                    with ExitStack() as stack:
+                        captures = [stack.enter_context(CaptureQueriesContext(connections[alias]))
+                                    for alias in connections]
+                        started = time.perf_counter()
+                        response = getattr(http_client, method)(path, **kwargs, **headers)
+                        elapsed = time.perf_counter() - started
+
+                    thread_queries += sum(len(capture) for capture in captures)
+                    if not 200 <= response.status_code < 300:
+                        with lock:
+                            errors.append("{} {}".format(response.status_code, response.content[:200]))
+                    else:
+                        thread_latencies.append(elapsed)
+            finally:
+                connections.close_all()
+
+            with lock:
+                latencies.extend(thread_latencies)
+                queries[0] += thread_queries
+
+        threads_before = set(threading.enumerate())
+        started = time.perf_counter()
+        workers = [threading.Thread(target=client, args=(range(worker, requests, concurrency),))
+                   for worker in range(concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        # waiting for the threads started by the requests through core.utils.run_in_background (proximity checks,
+        # contact tracing, risk assessment) before the next endpoint is loaded
+        for thread in set(threading.enumerate()) - threads_before:
+            if thread.name.startswith('background-'):
+                thread.join()
+
+        return sorted(latencies), errors, queries[0], elapsed
+
+    def _get_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  universal_newlines=True).stdout.strip() or None
+        except OSError:
+            return None
+
+    def _report(self, results, baseline):
+        self.stdout.write("{:<24} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+            "endpoint", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "queries"))
+        for name, result in results.items():
+            self.stdout.write("{:<24} {:>8} {:>8} {:>10.1f} {:>10.2f} {:>10.2f} {:>10.2f} {:>8.1f}".format(
+                name, result['requests'], result['errors'], result['throughput'], result['p50_ms'],
+                result['p95_ms'], result['p99_ms'], result['queries_per_request']))
+
+            compared = (baseline or {}).get(name)
+            if compared:
+                self.stdout.write("{:<24} {:>8} {:>8} {:>+9.1f}% {:>+9.1f}% {:>+9.1f}% {:>+9.1f}% {:>+8.1f}".format(
+                    "  vs {}".format(baseline.get('commit') or "baseline")[:24], "", "",
+                    *[(result[key] - compared[key]) / compared[key] * 100 if compared[key] else 0.0
+                      for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms')],
+                    result['queries_per_request'] - compared['queries_per_request']))
+
+    def handle(self, *args, **options):
+        endpoints = [endpoint.strip() for endpoint in options['endpoints'].split(',') if endpoint.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError("Unknown endpoints {}, should be some of {}".format(
+                ', '.join(sorted(unknown)), ', '.join(ENDPOINTS)))
+
+        try:
+            disease = Disease.objects.get(name="COVID-19")
+        except Disease.DoesNotExist:
+            raise CommandError("Disease COVID-19 is not found, initialize the database with initdb.py")
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            baseline = dict(baseline['endpoints'], commit=baseline.get('commit'))
+
+        # timestamps are parsed into naive datetimes by TimeStampField
+        warnings.filterwarnings('ignore', message='DateTimeField .* received a naive datetime')
+
+        rng = random.Random(options['seed'])
+        scale = {key: options[key] for key in ('citizens', 'devices_per_citizen', 'notifications_per_citizen',
+                                               'citizen_locations_per_citizen', 'patient_locations')}
+
+        fake_twilio = SimpleNamespace(Client=lambda account, token: FakeTwilioClient(
+            options['twilio_latency_ms'] / 1000))
+
+        def fake_push(registration_ids, data, cloud_type, application_id=None, **kwargs):
+            time.sleep(options['push_latency_ms'] / 1000)
+            return {"success": len(registration_ids) if isinstance(registration_ids, list) else 1, "failure": 0}
+
+        self.stdout.write("Seeding {}".format(", ".join("{} {}".format(key, value) for key, value in scale.items())))
+        started = time.perf_counter()
+        seeded = None
+        results = {}
+        try:
+            seeded = self._seed(options, rng, disease)
+            self.stdout.write("Seeded in {:.1f} s".format(time.perf_counter() - started))
+
+            requests = self._get_requests(seeded, rng, options['batch_size'])
+            # requests come from a single client IP and a few users, which the rate limits would throttle
+            with override_settings(RATE_LIMIT_ENABLED=False), \
+                    mock.patch('authentication.serializers.twilio_rest', fake_twilio), \
+                    mock.patch('push_notifications.gcm.send_message', fake_push), \
+                    mock.patch('citizen.serializers.update_citizen_user_info_to_iam', lambda instance: True):
+                for endpoint in endpoints:
+                    latencies, errors, queries, elapsed = self._load(
+                        requests[endpoint], options['requests'], options['concurrency'])
+                    if errors:
+                        self.stderr.write("{}: {} failed requests, e.g. {}".format(endpoint, len(errors), errors[0]))
+                    if not latencies:
+                        continue
+
+                    results[endpoint] = {
+                        "requests": len(latencies) + len(errors),
+                        "errors": len(errors),
+                        "throughput": len(latencies) / elapsed,
+                        "mean_ms": statistics.mean(latencies) * 1000,
+                        "p50_ms": latencies[int(len(latencies) * 0.50)] * 1000,
+                        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+                        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+                        "queries_per_request": queries / (len(latencies) + len(errors))
+                    }
+        finally:
+            if seeded is not None:
+                self._clean_up(seeded)
+
+        self._report(results, baseline)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    "commit": self._get_commit(),
+                    "created_at": timezone.now().isoformat(),
+                    "scale": scale,
+                    "requests": options['requests'],
+                    "concurrency": options['concurrency'],
+                    "batch_size": options['batch_size'],
+                    "endpoints": results
+                }, f, indent=2)
+            self.stdout.write("Report written to {}".format(os.path.abspath(options['output'])))
@@ -0,0 +1,112 @@
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarks import Benchmark
+from core.partitions import create_partitions, drop_expired_partitions, get_default_partition_name
+
+REGULAR_TABLE = 'benchmark_historic_location_regular'
+PARTITIONED_TABLE = 'benchmark_historic_location_partitioned'
+
+
+class HistoricLocationPartitionsBenchmark(Benchmark):
+    """
+    Benchmarks insert, expiry window query and retention cost of a regular historic location table against
+    a table range partitioned by recorded date time.
+
+    Benchmark runs on scratch tables shaped like the historic location tables, which are dropped afterwards.
+    Rows are generated by the database and spread uniformly over `--days` days.
+
+    e.g. python manage.py benchmark historic_location_partitions --rows 100000000 --days 60
+    """
+    help = "Benchmarks regular and partitioned historic location tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=60)
+        parser.add_argument('--interval', default=settings.HISTORIC_LOCATION_PARTITION_INTERVAL)
+
+    def _timed(self, cursor, label, sql, params=None):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        elapsed = time.perf_counter() - started
+        self.stdout.write("  {:<40} {:>10.3f} s".format(label, elapsed))
+        return elapsed
+
+    def _create_tables(self, cursor, now, days, interval):
+        columns = """
+            id varchar(36) NOT NULL,
+            lat double precision NOT NULL,
+            long double precision NOT NULL,
+            recorded_date_time timestamp with time zone NOT NULL,
+            citizen_id varchar(36) NOT NULL
+        """
+        cursor.execute('CREATE TABLE "{}" ({}, PRIMARY KEY (id))'.format(REGULAR_TABLE, columns))
+        cursor.execute('CREATE INDEX ON "{}" (recorded_date_time)'.format(REGULAR_TABLE))
+        cursor.execute('CREATE INDEX ON "{}" (citizen_id)'.format(REGULAR_TABLE))
+
+        cursor.execute('CREATE TABLE "{}" ({}, PRIMARY KEY (id, recorded_date_time)) '
+                       'PARTITION BY RANGE (recorded_date_time)'.format(PARTITIONED_TABLE, columns))
+        cursor.execute('CREATE INDEX ON "{}" (recorded_date_time)'.format(PARTITIONED_TABLE))
+        cursor.execute('CREATE INDEX ON "{}" (citizen_id)'.format(PARTITIONED_TABLE))
+        cursor.execute('CREATE TABLE "{}" PARTITION OF "{}" DEFAULT'.format(
+            get_default_partition_name(PARTITIONED_TABLE), PARTITIONED_TABLE))
+        create_partitions(cursor, PARTITIONED_TABLE, 'recorded_date_time', now - timedelta(days=days),
+                          now + timedelta(days=1), interval)
+
+    def _drop_tables(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS "{}"'.format(REGULAR_TABLE))
+        cursor.execute('DROP TABLE IF EXISTS "{}"'.format(PARTITIONED_TABLE))
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        days = options['days']
+        now = timezone.now()
+        expired_before = now - timedelta(seconds=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS)
+
+        insert_sql = """
+            INSERT INTO "{}" (id, lat, long, recorded_date_time, citizen_id)
+            SELECT md5(i::text), 9.9 + random() / 2, 76.2 + random() / 2,
+                %s - random() * %s * interval '1 day', md5((i %% 100000)::text)
+            FROM generate_series(1, %s) AS i
+        """
+        window_sql = 'SELECT count(*) FROM "{}" WHERE recorded_date_time >= %s'
+        citizen_window_sql = 'SELECT count(*) FROM "{}" WHERE citizen_id = %s AND recorded_date_time >= %s'
+
+        with connection.cursor() as cursor:
+            self._drop_tables(cursor)
+            try:
+                self._create_tables(cursor, now, days, options['interval'])
+
+                self.stdout.write("Rows: {}, days: {}, expiry: {} s".format(
+                    rows, days, settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS))
+
+                for table in (REGULAR_TABLE, PARTITIONED_TABLE):
+                    self.stdout.write(table)
+                    self._timed(cursor, "insert", insert_sql.format(table), [now, days, rows])
+                    cursor.execute('ANALYZE "{}"'.format(table))
+
+                    self._timed(cursor, "count non expired", window_sql.format(table), [expired_before])
+                    self._timed(cursor, "citizen non expired locations", citizen_window_sql.format(table),
+                                [hashlib.md5(b'42').hexdigest(), expired_before])
+
+                    cursor.execute('EXPLAIN ' + window_sql.format(table), [expired_before])
+                    scanned = sum(1 for (line,) in cursor.fetchall() if ' on {}'.format(table) in line or
+                                  ' on "{}'.format(table) in line)
+                    self.stdout.write("  {:<40} {:>10}".format("relations scanned", scanned))
+
+                self.stdout.write("Retention")
+                self._timed(cursor, "DELETE expired rows (regular)",
+                            'DELETE FROM "{}" WHERE recorded_date_time < %s'.format(REGULAR_TABLE),
+                            [expired_before])
+
+                started = time.perf_counter()
+                dropped = drop_expired_partitions(cursor, PARTITIONED_TABLE, 'recorded_date_time', expired_before)
+                self.stdout.write("  {:<40} {:>10.3f} s ({} partitions)".format(
+                    "DROP expired partitions (partitioned)", time.perf_counter() - started, len(dropped)))
+            finally:
+                self._drop_tables(cursor)
@@ -0,0 +1,58 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.test import Client, override_settings
+
+from core.benchmarks import Benchmark
+
+
+class InstrumentationBenchmark(Benchmark):
+    """
+    Benchmarks the overhead of the request instrumentation (core.instrumentation), serving `--requests` in process
+    requests with the instrumentation disabled and enabled, alternating in `--rounds` so that both are measured
+    under the same conditions
+
+    e.g. python manage.py benchmark instrumentation --path /v1/disease/ --requests 500
+    """
+    help = "Benchmarks the overhead of the request instrumentation"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/v1/disease/')
+        parser.add_argument('--requests', type=int, default=500, help="Requests per round")
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def _serve(self, client, path, requests):
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = client.get(path)
+            if response.status_code >= 400:
+                raise CommandError("{} returned {}".format(path, response.status_code))
+        return (time.perf_counter() - started) / requests
+
+    def handle(self, *args, **options):
+        client = Client()
+        # the first requests fill the caches and open the database connection
+        self._serve(client, options['path'], 10)
+
+        durations = {False: [], True: []}
+        for _ in range(options['rounds']):
+            for enabled in (False, True):
+                # logging of sampled requests is not part of the measured overhead
+                with override_settings(INSTRUMENTATION_ENABLED=enabled, INSTRUMENTATION_LOG_SAMPLE_RATE=0.0,
+                                       INSTRUMENTATION_SLOW_REQUEST_IN_SECONDS=float('inf')):
+                    durations[enabled].append(self._serve(client, options['path'], options['requests']))
+
+        # the fastest round is the least disturbed by the rest of the machine
+        disabled, enabled = min(durations[False]), min(durations[True])
+        self.stdout.write("{} x {} requests to {}".format(options['rounds'], options['requests'], options['path']))
+        self.stdout.write("Instrumentation disabled: {:.3f} ms per request (median round {:.3f} ms)".format(
+            disabled * 1000, statistics.median(durations[False]) * 1000))
+        self.stdout.write("Instrumentation enabled: {:.3f} ms per request (median round {:.3f} ms)".format(
+            enabled * 1000, statistics.median(durations[True]) * 1000))
+        self.stdout.write("Overhead: {:.3f} ms per request ({:.1f}%)".format(
+            (enabled - disabled) * 1000, (enabled - disabled) / disabled * 100))
+
+        if not settings.INSTRUMENTATION_SERVER_TIMING_HEADER:
+            self.stdout.write("Server-Timing header is disabled in the settings")
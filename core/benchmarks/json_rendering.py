@@ -0,0 +1,73 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from authentication.models import User, Citizen, DataEntryAdmin
+from authentication.utils import hex_uuid
+from citizen.views import CitizenMapDataAPIView, CitizenHistoricLocationDiseaseRelationViewSet
+from core.benchmarks import Benchmark
+from core.renderers import ORJSONRenderer
+from dashboard.views import MapDataAPIView
+from patient.views import PatientHistoricLocationViewSet
+from super_admin.views import RegionCRUDViewSet
+
+
+class JSONRenderingBenchmark(Benchmark):
+    """
+    Benchmarks rendering the responses of the map and listing endpoints with DRF JSONRenderer against
+    ORJSONRenderer
+
+    Responses are generated once from the current database with a temporary user (citizen, data entry admin
+    and super user), which is deleted afterwards. Only the rendering is timed, best of `--repeat` runs.
+
+    e.g. python manage.py benchmark json_rendering --repeat 5
+    """
+    help = "Benchmarks JSON rendering of the map and listing endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _time_render(self, renderer, data, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = renderer.render(data)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, body
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username="benchmark-{}".format(hex_uuid()), is_staff=True, is_superuser=True)
+        Citizen.objects.create(user=user, mobile_number="+0000000000")
+        DataEntryAdmin.objects.create(user=user)
+
+        factory = APIRequestFactory()
+        endpoints = (
+            ("citizen map data", CitizenMapDataAPIView.as_view(), '/v1/citizen/map/data/'),
+            ("dashboard map data", MapDataAPIView.as_view(), '/v1/dashboard/map/data/'),
+            ("patient historic locations", PatientHistoricLocationViewSet.as_view({'get': 'list'}),
+             '/v1/patient/historic-location/'),
+            ("citizen historic locations", CitizenHistoricLocationDiseaseRelationViewSet.as_view({'get': 'list'}),
+             '/v1/citizen/historic-location/'),
+            ("regions", RegionCRUDViewSet.as_view({'get': 'list'}), '/v1/region/'),
+        )
+
+        try:
+            self.stdout.write("{:<28} {:>8} {:>12} {:>12} {:>12} {:>8}".format(
+                "endpoint", "items", "bytes", "json ms", "orjson ms", "speed up"))
+
+            for name, view, path in endpoints:
+                request = factory.get(path)
+                force_authenticate(request, user=user)
+                data = view(request).data
+
+                json_seconds, json_body = self._time_render(JSONRenderer(), data, options['repeat'])
+                orjson_seconds, orjson_body = self._time_render(ORJSONRenderer(), data, options['repeat'])
+
+                self.stdout.write("{:<28} {:>8} {:>12} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+                    name, len(data), len(orjson_body), json_seconds * 1000, orjson_seconds * 1000,
+                    json_seconds / orjson_seconds))
+        finally:
+            user.delete()
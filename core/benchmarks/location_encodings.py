@@ -0,0 +1,65 @@
+import gzip
+import io
+import random
+import time
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks import Benchmark
+from core.parsers import MessagePackParser, PolylineJSONParser, ORJSONParser
+from core.renderers import MessagePackRenderer, PolylineJSONRenderer, ORJSONRenderer
+
+
+class LocationEncodingsBenchmark(Benchmark):
+    """
+    Benchmarks payload size and encode/decode time of location lists in JSON (DRF and orjson), MessagePack
+    and polyline encoded JSON, the way they are rendered and parsed by the API.
+
+    Locations are shaped like the map data responses, a trail of nearby locations with string timestamps.
+
+    e.g. python manage.py benchmark location_encodings --points 100000
+    """
+    help = "Benchmarks JSON, MessagePack and polyline encodings of location payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        # somewhere around Kochi, a location every 5 minutes
+        lat, long, timestamp = 9.9, 76.2, int(time.time()) - options['points'] * 300
+        locations = []
+        for _ in range(options['points']):
+            lat += rng.uniform(-0.001, 0.001)
+            long += rng.uniform(-0.001, 0.001)
+            timestamp += 300
+            locations.append({"lat": lat, "long": long, "timestamp": str(timestamp)})
+
+        self.stdout.write("Locations: {}".format(len(locations)))
+        self.stdout.write("{:<12} {:>12} {:>12} {:>12} {:>12}".format(
+            "encoding", "bytes", "gzip bytes", "encode ms", "decode ms"))
+
+        for name, renderer, parser in (("json", JSONRenderer(), JSONParser()),
+                                       ("orjson", ORJSONRenderer(), ORJSONParser()),
+                                       ("msgpack", MessagePackRenderer(), MessagePackParser()),
+                                       ("polyline", PolylineJSONRenderer(), PolylineJSONParser())):
+            started = time.perf_counter()
+            body = renderer.render(locations)
+            encode_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            decoded = parser.parse(io.BytesIO(body), parser.media_type, {})
+            decode_seconds = time.perf_counter() - started
+
+            self.stdout.write("{:<12} {:>12} {:>12} {:>12.1f} {:>12.1f}".format(
+                name, len(body), len(gzip.compress(body)), encode_seconds * 1000, decode_seconds * 1000))
+
+            if len(decoded) != len(locations) or any(
+                    abs(location['lat'] - decoded_location['lat']) > 1e-5 or
+                    abs(location['long'] - decoded_location['long']) > 1e-5 or
+                    str(location['timestamp']) != str(decoded_location['timestamp'])
+                    for location, decoded_location in zip(locations, decoded)):
+                self.stderr.write("{} round trip does not match the locations !".format(name))
@@ -0,0 +1,107 @@
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from core.benchmarks import Benchmark
+from core.log import QueuedFileHandler
+
+
+class SlowDiskStream(object):
+    """
+    Wraps a file stream, sleeping on every flush as if the data was written to a slow disk
+    """
+
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, data):
+        return self.stream.write(data)
+
+    def flush(self):
+        time.sleep(self.latency)
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class LoggingBenchmark(Benchmark):
+    """
+    Benchmarks the latency of logging calls on the request threads with the synchronous `logging.FileHandler`
+    against the queued handler (core/log.py), on a simulated slow disk (every flush takes `--disk-latency-ms`)
+
+    e.g. python manage.py benchmark logging --threads 16 --records 1000 --disk-latency-ms 5
+    """
+    help = "Benchmarks the latency of logging calls with synchronous and queued file handlers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--records', type=int, default=1000, help="Records logged by every thread")
+        parser.add_argument('--disk-latency-ms', type=float, default=5.0)
+
+    def _slow_down(self, handler, latency):
+        open_stream = handler._open
+        handler._open = lambda: SlowDiskStream(open_stream(), latency)
+
+    def _load(self, logger, threads, records):
+        latencies = []
+        lock = threading.Lock()
+
+        def log():
+            thread_latencies = []
+            for index in range(records):
+                started = time.perf_counter()
+                logger.info("Citizen {} uploaded {} historic locations, {} rejected".format(index, 10, 0))
+                thread_latencies.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(thread_latencies)
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=log) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return sorted(latencies), time.perf_counter() - started
+
+    def _report(self, label, latencies, elapsed, written_in, dropped):
+        self.stdout.write("{:<10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.0f} {:>12.0f} {:>8}".format(
+            label, statistics.mean(latencies) * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6,
+            latencies[-1] * 1e6, len(latencies) / elapsed, written_in * 1000, dropped))
+
+    def handle(self, *args, **options):
+        latency = options['disk_latency_ms'] / 1000
+        formatter = logging.Formatter("[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] %(message)s")
+
+        self.stdout.write("{} threads x {} records, {} ms per disk flush".format(
+            options['threads'], options['records'], options['disk_latency_ms']))
+        self.stdout.write("{:<10} {:>10} {:>10} {:>10} {:>10} {:>12} {:>8}".format(
+            "handler", "mean us", "p99 us", "max us", "records/s", "written ms", "dropped"))
+
+        with tempfile.TemporaryDirectory() as directory:
+            for label in ("file", "queued"):
+                if label == "file":
+                    handler = logging.FileHandler(os.path.join(directory, 'file.log'), delay=True)
+                    self._slow_down(handler, latency)
+                else:
+                    handler = QueuedFileHandler(os.path.join(directory, 'queued.log'))
+                    self._slow_down(handler.target, latency)
+                handler.setFormatter(formatter)
+
+                logger = logging.getLogger('benchmark.{}'.format(label))
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                logger.addHandler(handler)
+
+                started = time.perf_counter()
+                latencies, elapsed = self._load(logger, options['threads'], options['records'])
+                # queued records are written by the time the handler is closed
+                handler.close()
+                logger.removeHandler(handler)
+                self._report(label, latencies, elapsed, time.perf_counter() - started,
+                             getattr(handler, 'dropped', 0))
@@ -0,0 +1,104 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import CommandError
+from django.test import Client, override_settings
+
+from authentication.utils import hex_uuid
+from core.benchmarks import Benchmark
+from core.throttling import MemoryTokenBucketBackend, SharedMemoryTokenBucketBackend, CacheTokenBucketBackend, \
+    parse_rate
+
+# rates high enough that no benchmark request is throttled
+UNLIMITED_RATE_LIMITS = {
+    'otp_send': {
+        'ip': '1000000000/s',
+        'mobile_number': '1000000000/s',
+    }
+}
+
+
+class RateLimitingBenchmark(Benchmark):
+    """
+    Benchmarks the overhead of the rate limiting (core/throttling.py),
+    1. Token bucket checks per second of the memory, shared memory and cache backends, over `--keys` distinct
+       clients
+    2. In process requests to the send OTP view (rejected by validation, so that no SMS is sent) with the rate
+       limiting disabled and enabled for each backend, alternating in `--rounds` so that all are measured under the
+       same conditions
+
+    e.g. python manage.py benchmark rate_limiting --requests 500
+    """
+    help = "Benchmarks the overhead of the rate limiting"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20000, help="Token bucket checks per backend")
+        parser.add_argument('--keys', type=int, default=1000, help="Distinct clients of the checks")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per round")
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def _check(self, label, backend, checks, keys):
+        capacity, refill_rate = parse_rate('1000000000/s')
+        # buckets of the run expire from the cache within a second
+        prefix = 'rate_limit:benchmark:{}:'.format(hex_uuid())
+
+        started = time.perf_counter()
+        for index in range(checks):
+            backend.consume(prefix + str(index % keys), capacity, refill_rate)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write("{:<8} {:>12.0f} checks/s {:>10.1f} us/check".format(
+            label, checks / elapsed, elapsed / checks * 1000000))
+
+    def _serve(self, client, requests):
+        started = time.perf_counter()
+        for index in range(requests):
+            # every request from a distinct client, as the buckets of many clients are checked in production
+            response = client.post('/v1/citizen/auth/send-otp/', {'mobile_number': 'x{}'.format(index)},
+                                   content_type='application/json', REMOTE_ADDR='10.0.{}.{}'.format(
+                                       index // 256 % 256, index % 256))
+            if response.status_code != 400:
+                raise CommandError("Send OTP returned {}, expected a validation error".format(response.status_code))
+        return (time.perf_counter() - started) / requests
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            self._run(options, os.path.join(directory, 'buckets'))
+
+    def _run(self, options, shared_memory_location):
+        self._check("memory", MemoryTokenBucketBackend(), options['checks'], options['keys'])
+        self._check("shared", SharedMemoryTokenBucketBackend(shared_memory_location), options['checks'],
+                    options['keys'])
+        self._check("cache", CacheTokenBucketBackend('default'), options['checks'], options['keys'])
+
+        client = Client()
+        configurations = (
+            ("disabled", dict(RATE_LIMIT_ENABLED=False)),
+            ("memory", dict(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='memory')),
+            ("shared memory", dict(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='shared_memory')),
+            ("cache", dict(RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='cache')),
+        )
+
+        durations = {label: [] for label, _ in configurations}
+        # clients connect directly, so that they are limited by IP as well
+        with override_settings(RATE_LIMITS=UNLIMITED_RATE_LIMITS, RATE_LIMIT_NUM_PROXIES=0,
+                               RATE_LIMIT_SHARED_MEMORY_LOCATION=shared_memory_location):
+            # the first requests fill the caches and open the database connection
+            self._serve(client, 10)
+
+            for _ in range(options['rounds']):
+                for label, configuration in configurations:
+                    with override_settings(**configuration):
+                        durations[label].append(self._serve(client, options['requests']))
+
+        # the fastest round is the least disturbed by the rest of the machine
+        disabled = min(durations["disabled"])
+        self.stdout.write("{} x {} requests to send OTP".format(options['rounds'], options['requests']))
+        for label, _ in configurations:
+            fastest = min(durations[label])
+            self.stdout.write("Rate limiting {}: {:.3f} ms per request (median round {:.3f} ms), "
+                              "overhead {:.3f} ms ({:.1f}%)".format(
+                                  label, fastest * 1000, statistics.median(durations[label]) * 1000,
+                                  (fastest - disabled) * 1000, (fastest - disabled) / disabled * 100))
@@ -0,0 +1,86 @@
+import time
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from authentication.models import User, Citizen, DataEntryAdmin
+from authentication.utils import hex_uuid
+from citizen.views import CitizenMapDataAPIView
+from core.benchmarks import Benchmark
+from core.compression import compressed_content_cache
+from core.middleware import CompressionMiddleware
+from dashboard.views import MapDataAPIView
+from patient.views import PatientHistoricLocationViewSet
+
+
+class ResponseCompressionBenchmark(Benchmark):
+    """
+    Benchmarks response compression of the map endpoints with gzip and brotli, compressing on every request
+    against compressing once and serving the cached compressed content
+
+    Responses are generated from the current database with a temporary user (citizen and data entry admin),
+    which is deleted afterwards. Only the compression middleware is timed.
+
+    e.g. python manage.py benchmark response_compression --requests 20
+    """
+    help = "Benchmarks response compression of the map endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20)
+
+    def handle(self, *args, **options):
+        user = User.objects.create(username="benchmark-{}".format(hex_uuid()))
+        Citizen.objects.create(user=user, mobile_number="+0000000000")
+        DataEntryAdmin.objects.create(user=user)
+
+        factory = APIRequestFactory()
+        endpoints = (
+            ("citizen map data", CitizenMapDataAPIView.as_view(), '/v1/citizen/map/data/'),
+            ("dashboard map data", MapDataAPIView.as_view(), '/v1/dashboard/map/data/'),
+            ("patient historic locations", PatientHistoricLocationViewSet.as_view({'get': 'list'}),
+             '/v1/patient/historic-location/'),
+        )
+
+        try:
+            self.stdout.write("{:<28} {:>8} {:>10} {:>10} {:>14} {:>14} {:>14}".format(
+                "endpoint", "encoding", "bytes", "ratio", "per request ms", "cold ms", "cached ms"))
+
+            for name, view, path in endpoints:
+                request = factory.get(path)
+                force_authenticate(request, user=user)
+                response = view(request)
+                response.render()
+                content = response.content
+
+                for encoding in ('identity', 'gzip', 'br'):
+                    def compress_response():
+                        response.content = content
+                        del response['Content-Encoding']
+                        compression_request = factory.get(path, HTTP_ACCEPT_ENCODING=encoding)
+                        return CompressionMiddleware(lambda _: response).process_response(
+                            compression_request, response)
+
+                    # compressing on every request
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        compressed_content_cache.clear()
+                        compressed_response = compress_response()
+                    per_request_seconds = (time.perf_counter() - started) / options['requests']
+
+                    # compressing once, then serving from the compressed content cache
+                    compressed_content_cache.clear()
+                    started = time.perf_counter()
+                    compress_response()
+                    cold_seconds = time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        compressed_response = compress_response()
+                    cached_seconds = (time.perf_counter() - started) / options['requests']
+
+                    self.stdout.write("{:<28} {:>8} {:>10} {:>9.1f}x {:>14.2f} {:>14.2f} {:>14.2f}".format(
+                        name, encoding, len(compressed_response.content),
+                        len(content) / len(compressed_response.content), per_request_seconds * 1000,
+                        cold_seconds * 1000, cached_seconds * 1000))
+        finally:
+            compressed_content_cache.clear()
+            user.delete()
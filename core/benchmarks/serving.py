@@ -0,0 +1,122 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from core.benchmarks import Benchmark
+
+
+class ServingBenchmark(Benchmark):
+    """
+    Benchmarks request throughput of `runserver` against gunicorn with the production configuration
+    (data4life_backend/gunicorn_conf.py) for each worker class.
+
+    Every server is started on a free local port and loaded by `--concurrency` client threads for `--duration`
+    seconds, each request on a new connection.
+
+    e.g. python manage.py benchmark serving --path /v1/health/ --concurrency 16 --workers 4
+    """
+    help = "Benchmarks request throughput of runserver against gunicorn worker classes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/v1/health/')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--worker-classes', default='sync,gthread,uvicorn')
+
+    def _get_free_port(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def _wait_until_ready(self, process, port, path):
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError("Server exited with code {}".format(process.returncode))
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', path)
+                connection.getresponse().read()
+                connection.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("Server did not start in 60 seconds")
+
+    def _load(self, port, path, concurrency, duration):
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                    connection.request('GET', path)
+                    response = connection.getresponse()
+                    response.read()
+                    connection.close()
+                    failed = response.status >= 500
+                except OSError:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if failed:
+                        errors[0] += 1
+                    else:
+                        latencies.append(elapsed)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return sorted(latencies), errors[0]
+
+    def _run(self, label, command, env, port, options):
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self._wait_until_ready(process, port, options['path'])
+            latencies, errors = self._load(port, options['path'], options['concurrency'], options['duration'])
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        if not latencies:
+            raise CommandError("No successful requests to {}".format(label))
+
+        self.stdout.write("{:<20} {:>10.0f} {:>10.1f} {:>10.1f} {:>8}".format(
+            label, len(latencies) / options['duration'], statistics.mean(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95)] * 1000, errors))
+
+    def handle(self, *args, **options):
+        manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+
+        self.stdout.write("{} with {} concurrent clients for {} s".format(
+            options['path'], options['concurrency'], options['duration']))
+        self.stdout.write("{:<20} {:>10} {:>10} {:>10} {:>8}".format("server", "req/s", "mean ms", "p95 ms", "errors"))
+
+        port = self._get_free_port()
+        self._run("runserver", [sys.executable, manage_py, 'runserver', '--noreload', '127.0.0.1:{}'.format(port)],
+                  dict(os.environ), port, options)
+
+        for worker_class in options['worker_classes'].split(','):
+            port = self._get_free_port()
+            env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class, GUNICORN_WORKERS=str(options['workers']),
+                       GUNICORN_BIND='127.0.0.1:{}'.format(port),
+                       PYTHONPATH=os.pathsep.join(filter(None, (settings.BASE_DIR, os.environ.get('PYTHONPATH')))))
+            self._run("gunicorn {}".format(worker_class),
+                      [sys.executable, '-m', 'gunicorn', '--config', 'python:data4life_backend.gunicorn_conf'],
+                      env, port, options)
@@ -0,0 +1,169 @@
+import random
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connection
+from django.utils import timezone
+
+from authentication.utils import hex_uuid, hex_uuid7
+from core.benchmarks import Benchmark
+from core.custom_fields import HexUUIDField
+
+# (label, id column type, id generator of the locations, LIKE indexes of the varchar columns created by Django)
+VARIANTS = (
+    ('varchar', 'varchar(36)', hex_uuid, True),
+    ('uuid4', 'uuid', hex_uuid, False),
+    ('uuid7', 'uuid', hex_uuid7, False),
+)
+
+CITIZEN_TABLE = 'benchmark_uuid_{}_citizen'
+LOCATION_TABLE = 'benchmark_uuid_{}_location'
+
+
+class UUIDPrimaryKeysBenchmark(Benchmark):
+    """
+    Benchmarks the ids of the models, varchar(36) hex ids against native UUIDs (HexUUIDField), random (uuid4) or
+    time ordered (uuid7)
+
+    1. Size of the tables of the models and of their indexes, for comparing the database before and after
+       core/migrations/0018_native_uuid_primary_keys.py
+    2. Inserts of `--rows` locations of `--citizens` citizens, in batches of `--batch-size` rows with the ids
+       generated in Python, into scratch tables shaped like the citizen historic locations (primary key and
+       citizen foreign key), for each kind of id. Batches of the kinds alternate, so that all are measured under
+       the same conditions. Followed by the size of the tables and indexes, primary key lookups and a join of the
+       locations to their citizens.
+
+    Scratch tables are dropped afterwards.
+
+    e.g. python manage.py benchmark uuid_primary_keys --rows 1000000
+    """
+    help = "Benchmarks varchar ids against native UUID ids"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000)
+        parser.add_argument('--citizens', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--lookups', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _write_model_tables(self, cursor):
+        self.stdout.write("{:<48} {:>12} {:>10} {:>10}".format("Table", "id", "table MB", "indexes MB"))
+        for model in apps.get_models():
+            if model._meta.proxy or not isinstance(model._meta.pk, HexUUIDField):
+                continue
+
+            table = model._meta.db_table
+            cursor.execute("SELECT format_type(atttypid, atttypmod) FROM pg_attribute WHERE attrelid = %s::regclass "
+                           "AND attname = 'id'", [table])
+            column_type = cursor.fetchone()[0]
+            # partitioned tables are measured with their partitions
+            cursor.execute("""
+                SELECT sum(pg_table_size(relid)), sum(pg_indexes_size(relid)) FROM (
+                    SELECT relid FROM pg_partition_tree(%s) UNION SELECT %s::regclass) AS relations
+            """, [table, table])
+            table_size, indexes_size = cursor.fetchone()
+            self.stdout.write("{:<48} {:>12} {:>10.1f} {:>10.1f}".format(
+                table, column_type, table_size / 1024 / 1024, indexes_size / 1024 / 1024))
+
+    def _create_tables(self, cursor, label, column_type, like_indexes):
+        citizen_table, location_table = CITIZEN_TABLE.format(label), LOCATION_TABLE.format(label)
+        cursor.execute('CREATE TABLE "{}" (id {} PRIMARY KEY)'.format(citizen_table, column_type))
+        cursor.execute("""
+            CREATE TABLE "{}" (
+                id {type} PRIMARY KEY,
+                citizen_id {type} NOT NULL REFERENCES "{citizen_table}" (id) DEFERRABLE INITIALLY DEFERRED,
+                lat double precision NOT NULL,
+                long double precision NOT NULL,
+                recorded_date_time timestamp with time zone NOT NULL
+            )
+        """.format(location_table, type=column_type, citizen_table=citizen_table))
+        cursor.execute('CREATE INDEX "{0}_citizen_id" ON "{0}" (citizen_id)'.format(location_table))
+
+        if like_indexes:
+            for table, column in ((citizen_table, 'id'), (location_table, 'id'), (location_table, 'citizen_id')):
+                cursor.execute('CREATE INDEX "{0}_{1}_like" ON "{0}" ({1} varchar_pattern_ops)'.format(table, column))
+
+    def _drop_tables(self, cursor):
+        for label, _, _, _ in VARIANTS:
+            cursor.execute('DROP TABLE IF EXISTS "{}"'.format(LOCATION_TABLE.format(label)))
+            cursor.execute('DROP TABLE IF EXISTS "{}"'.format(CITIZEN_TABLE.format(label)))
+
+    def _insert(self, cursor, table, rows):
+        cursor.execute('INSERT INTO "{}" VALUES {}'.format(table, ', '.join(
+            ['({})'.format(', '.join(['%s'] * len(rows[0])))] * len(rows))), [value for row in rows for value in row])
+
+    def _timed(self, cursor, sql, params_list):
+        started = time.perf_counter()
+        for params in params_list:
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        return time.perf_counter() - started
+
+    def _write_sizes(self, cursor, table):
+        cursor.execute("""
+            SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) FROM pg_index
+            WHERE indrelid = %s::regclass ORDER BY 1
+        """, [table])
+        indexes = cursor.fetchall()
+        cursor.execute("SELECT pg_relation_size(%s)", [table])
+        self.stdout.write("  {:<52} {:>8.1f} MB".format(table, cursor.fetchone()[0] / 1024 / 1024))
+        for index, size in indexes:
+            self.stdout.write("  {:<52} {:>8.1f} MB".format(index, size / 1024 / 1024))
+        self.stdout.write("  {:<52} {:>8.1f} MB".format("indexes", sum(size for _, size in indexes) / 1024 / 1024))
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows, batch_size = options['rows'], options['batch_size']
+        citizen_ids = ['{:032x}'.format(rng.getrandbits(128)) for _ in range(options['citizens'])]
+        start = timezone.now() - timedelta(seconds=rows)
+
+        with connection.cursor() as cursor:
+            self._write_model_tables(cursor)
+
+            self._drop_tables(cursor)
+            try:
+                for label, column_type, _, like_indexes in VARIANTS:
+                    self._create_tables(cursor, label, column_type, like_indexes)
+                    for index in range(0, len(citizen_ids), batch_size):
+                        self._insert(cursor, CITIZEN_TABLE.format(label),
+                                     [(citizen_id,) for citizen_id in citizen_ids[index:index + batch_size]])
+
+                durations = {label: 0.0 for label, _, _, _ in VARIANTS}
+                samples = {label: [] for label, _, _, _ in VARIANTS}
+                for batch_start in range(0, rows, batch_size):
+                    # a location every second, of random citizens
+                    batch = [(rng.choice(citizen_ids), 9.9 + rng.random() / 2, 76.2 + rng.random() / 2,
+                              start + timedelta(seconds=index))
+                             for index in range(batch_start, min(rows, batch_start + batch_size))]
+                    for label, _, generate_id, _ in VARIANTS:
+                        started = time.perf_counter()
+                        locations = [(generate_id(),) + location for location in batch]
+                        self._insert(cursor, LOCATION_TABLE.format(label), locations)
+                        durations[label] += time.perf_counter() - started
+                        samples[label].append(locations[rng.randrange(len(locations))][0])
+
+                self.stdout.write("{} locations of {} citizens, in batches of {}".format(
+                    rows, len(citizen_ids), batch_size))
+                for label, column_type, _, _ in VARIANTS:
+                    location_table = LOCATION_TABLE.format(label)
+                    cursor.execute('ANALYZE "{}"'.format(location_table))
+                    cursor.execute('ANALYZE "{}"'.format(CITIZEN_TABLE.format(label)))
+
+                    self.stdout.write("{} ({})".format(label, column_type))
+                    self.stdout.write("  {:<52} {:>8.0f} rows/s".format("insert", rows / durations[label]))
+                    self._write_sizes(cursor, location_table)
+
+                    lookups = [(rng.choice(samples[label]),) for _ in range(options['lookups'])]
+                    elapsed = self._timed(cursor, 'SELECT lat FROM "{}" WHERE id = %s'.format(location_table),
+                                          lookups)
+                    self.stdout.write("  {:<52} {:>8.1f} us/lookup".format(
+                        "primary key lookup", elapsed / len(lookups) * 1000000))
+
+                    elapsed = min(self._timed(cursor, 'SELECT count(*) FROM "{}" location JOIN "{}" citizen ON '
+                                                      'citizen.id = location.citizen_id'.format(
+                                                          location_table, CITIZEN_TABLE.format(label)), [None])
+                                  for _ in range(3))
+                    self.stdout.write("  {:<52} {:>8.3f} s".format("join locations to citizens", elapsed))
+            finally:
+                self._drop_tables(cursor)
@@ -0,0 +1,182 @@
+import gzip
+import hashlib
+import io
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import brotli
+from django.conf import settings
+
+ACCEPT_ENCODING_REGEX = re.compile(r'^\s*(?P<encoding>[^\s;]+)\s*(?:;\s*q\s*=\s*(?P<q>[0-9.]+))?\s*$')
+
+
+def _get_encoding_qualities(accept_encoding):
+    """
+    Returns the quality of each content encoding of an `Accept-Encoding` header, by lower cased encoding
+
+    :param accept_encoding:
+    :return:
+    """
+    qualities = {}
+    for value in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_REGEX.match(value)
+        if not match:
+            continue
+
+        try:
+            quality = float(match.group('q')) if match.group('q') is not None else 1.0
+        except ValueError:
+            continue
+
+        qualities[match.group('encoding').lower()] = quality
+    return qualities
+
+
+def accepts_encoding(accept_encoding, encoding):
+    """
+    Returns whether the content encoding is acceptable by an `Accept-Encoding` header, i.e. its quality is not 0
+
+    :param accept_encoding:
+    :param encoding:
+    :return:
+    """
+    qualities = _get_encoding_qualities(accept_encoding)
+    return qualities.get(encoding, qualities.get('*', 0.0)) > 0
+
+
+def get_accepted_encoding(accept_encoding):
+    """
+    Returns the preferred supported content encoding ('br' or 'gzip') of an `Accept-Encoding` header,
+    None if neither of them is acceptable
+
+    Brotli is preferred over gzip when both of them are equally acceptable.
+
+    :param accept_encoding:
+    :return:
+    """
+    qualities = _get_encoding_qualities(accept_encoding)
+
+    wildcard_quality = qualities.get('*', 0.0)
+    best_encoding, best_quality = None, 0.0
+    for encoding in ('br', 'gzip'):
+        quality = qualities.get(encoding, wildcard_quality)
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+
+    return best_encoding
+
+
+def compress(content, encoding):
+    """
+    Compresses the content with the content encoding ('br' or 'gzip')
+
+    :param content:
+    :param encoding:
+    :return:
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    # mtime is fixed, so that the same content is always compressed to the same bytes
+    buffer = io.BytesIO()
+    with gzip.GzipFile(mode='wb', compresslevel=settings.COMPRESSION_GZIP_LEVEL, fileobj=buffer, mtime=0) as file:
+        file.write(content)
+    return buffer.getvalue()
+
+
+def compress_stream(chunks, encoding):
+    """
+    Yields the chunks compressed with the content encoding ('br' or 'gzip') as they are streamed, a compressed chunk
+    is yielded once the compressor has output for it
+
+    :param chunks: iterable of bytes
+    :param encoding:
+    :return:
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        compress_chunk, finish = compressor.process, compressor.finish
+    else:
+        # wbits of 16 + 15 writes the gzip header and trailer
+        compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compress_chunk, finish = compressor.compress, compressor.flush
+
+    for chunk in chunks:
+        compressed = compress_chunk(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+class CompressedContentCache(object):
+    """
+    CompressedContentCache
+
+    Least recently used cache of compressed contents keyed by the digest of the uncompressed content and the
+    content encoding, limited to `max_size` bytes of compressed content.
+
+    Responses rendering the same content (e.g. map data until the patient historic locations change) are
+    compressed once per process.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest, encoding):
+        with self._lock:
+            compressed = self._entries.get((digest, encoding))
+            if compressed is not None:
+                self._entries.move_to_end((digest, encoding))
+            return compressed
+
+    def set(self, digest, encoding, compressed):
+        if len(compressed) > self.max_size:
+            return
+
+        with self._lock:
+            previous = self._entries.pop((digest, encoding), None)
+            if previous is not None:
+                self.size -= len(previous)
+
+            self._entries[(digest, encoding)] = compressed
+            self.size += len(compressed)
+
+            while self.size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+compressed_content_cache = CompressedContentCache(settings.COMPRESSION_CACHE_MAX_SIZE)
+
+
+def get_content_digest(content):
+    return hashlib.sha1(content).hexdigest()
+
+
+def get_compressed_content(content, encoding, digest=None):
+    """
+    Returns the compressed content, from the compressed content cache if the same content is compressed before
+
+    :param content:
+    :param encoding:
+    :param digest: digest of the content, if it is already calculated
+    :return:
+    """
+    digest = digest or get_content_digest(content)
+
+    compressed = compressed_content_cache.get(digest, encoding)
+    if compressed is None:
+        compressed = compress(content, encoding)
+        compressed_content_cache.set(digest, encoding, compressed)
+
+    return compressed
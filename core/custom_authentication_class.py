@@ -69,7 +69,7 @@ class KeycloakAuthentication(authentication.BaseAuthentication):
 
         try:
             # Check if the a matching citizen object exists !
-            citizen = Citizen.objects.get(iam_user_id__exact=validated_token_subject)
+            citizen = Citizen.objects.select_related('user').get(iam_user_id__exact=validated_token_subject)
         except Citizen.DoesNotExist:
             raise AuthenticationFailed('User not found', code='user_not_found')
 
@@ -1,5 +1,8 @@
+import uuid
 from datetime import datetime
 
+from django.core import exceptions
+from django.db import models
 from rest_framework import serializers
 
 
@@ -18,3 +21,64 @@ class TimeStampField(serializers.Field):
             return datetime_obj
         except:
             raise serializers.ValidationError("Please provide a valid UTC timestamp !")
+
+
+def _parse_uuid(value):
+    if isinstance(value, uuid.UUID):
+        return value
+    if isinstance(value, int):
+        return uuid.UUID(int=value)
+    return uuid.UUID(hex=str(value))
+
+
+# value of the lookups of ids which are not UUIDs, ids are never nil
+NIL_UUID = uuid.UUID(int=0)
+
+
+class HexUUIDField(models.UUIDField):
+    """
+    Native UUID column (16 bytes) for the ids, whose values are the 32 character hex strings of the former
+    CharField ids
+
+    Ids are read as hex strings, from the primary keys as well as from the foreign keys to them, so the ids in the
+    API responses, cache keys, tokens and QR codes do not change. Lookups take the hex or the hyphenated form, a
+    value which is not a UUID is looked up as the nil UUID, which is never generated, so it matches no rows, as it
+    matched no id before, and excluding it matches every row. Saving a value which is not a UUID raises a
+    ValidationError.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        # databases without a native UUID type store the hex string
+        if value is None or isinstance(value, str):
+            return value
+        return value.hex
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        try:
+            return _parse_uuid(value).hex
+        except ValueError:
+            raise exceptions.ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        # values are parsed in get_db_prep_value, which cannot fail a lookup
+        return models.Field.get_prep_value(self, value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        try:
+            value = _parse_uuid(value)
+        except ValueError:
+            # unlike NULL, which is neither equal nor unequal to an id, the nil UUID is unequal to every id
+            value = NIL_UUID
+
+        if connection.features.has_native_uuid_field:
+            return value
+        return value.hex
+
+    def get_db_prep_save(self, value, connection):
+        if value is not None:
+            value = self.to_python(value)
+        return super().get_db_prep_save(value, connection)
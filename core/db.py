@@ -0,0 +1,149 @@
+import os
+import threading
+import weakref
+from datetime import datetime
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_connection_stats_lock = threading.Lock()
+_connection_stats = {
+    "opened": 0,
+    "health_check_failures": 0
+}
+
+# database wrappers which opened a connection, for counting the open connections of the process
+_database_wrappers = weakref.WeakSet()
+
+
+@receiver(connection_created)
+def count_opened_connection(sender, connection, **kwargs):
+    with _connection_stats_lock:
+        _connection_stats['opened'] += 1
+        _database_wrappers.add(connection)
+
+
+@receiver(request_started)
+def close_unusable_connections(**kwargs):
+    """
+    Closes the persistent database connections of the thread which are no longer usable (e.g. restarted database
+    or pgbouncer), before they are reused by a request
+
+    Django closes the connections which are older than `CONN_MAX_AGE` at the start of a request, but a broken
+    connection is detected only after a query fails on it.
+
+    :param kwargs:
+    :return:
+    """
+    if not settings.DATABASE_CONNECTION_HEALTH_CHECKS:
+        return
+
+    for connection in connections.all():
+        if connection.connection is not None and not connection.in_atomic_block and not connection.is_usable():
+            connection.close()
+            with _connection_stats_lock:
+                _connection_stats['health_check_failures'] += 1
+
+
+def reset_connection_stats():
+    """
+    Resets the database connection stats, for a worker process forked from a master which has opened
+    connections
+
+    :return:
+    """
+    with _connection_stats_lock:
+        _connection_stats['opened'] = 0
+        _connection_stats['health_check_failures'] = 0
+
+
+def get_connection_stats():
+    """
+    Returns the database connection stats of the current process (worker)
+
+    `opened` - connections opened since the process started
+    `open` - connections currently open, across all threads
+    `health_check_failures` - persistent connections closed by the health check
+
+    :return:
+    """
+    with _connection_stats_lock:
+        return {
+            "pid": os.getpid(),
+            "opened": _connection_stats['opened'],
+            "open": sum(1 for wrapper in list(_database_wrappers) if wrapper.connection is not None),
+            "health_check_failures": _connection_stats['health_check_failures']
+        }
+
+
+def _format_copy_value(value):
+    # text format of COPY, https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.2
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+
+class CopyRowReader(object):
+    """
+    CopyRowReader
+
+    File like object reading the rows in the text format of COPY, rows are formatted as they are read by
+    `cursor.copy_expert`, so that rows of any number are streamed to the database in bounded memory.
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.count = 0
+        self._buffer = ''
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            line = '\t'.join(map(_format_copy_value, row)) + '\n'
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+
+        data = ''.join(chunks)
+        if 0 <= size < len(data):
+            self._buffer = data[size:]
+            return data[:size]
+
+        self._buffer = ''
+        return data
+
+    readline = read
+
+
+def copy_rows(cursor, table, columns, rows):
+    """
+    Inserts the rows into the table with `COPY ... FROM STDIN`, which is much faster than INSERT for large
+    numbers of rows. Rows are tuples of the values of the columns, streamed from any iterable.
+
+    e.g. copy_rows(cursor, 'core_mobilenumberwhitelist', ('id', 'mobile_number'), rows)
+
+    :param cursor:
+    :param table:
+    :param columns:
+    :param rows:
+    :return: number of rows inserted
+    """
+    reader = CopyRowReader(rows)
+    cursor.copy_expert('COPY "{}" ({}) FROM STDIN'.format(
+        table, ', '.join('"{}"'.format(column) for column in columns)), reader)
+    return reader.count
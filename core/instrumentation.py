@@ -0,0 +1,123 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core.metrics import OPERATION_LATENCY, OPERATION_ERRORS, DATABASE_QUERY_LATENCY, DATABASE_QUERY_ERRORS
+
+# timings of the request being served by the thread (None outside of an instrumented request) and the names of
+# the timed blocks running in the thread
+_instrumentation = threading.local()
+
+
+def start_request_timings():
+    _instrumentation.timings = {}
+
+
+def stop_request_timings():
+    """
+    Stops recording the timings of the current thread
+
+    :return: dict of timing name to [count, seconds]
+    """
+    timings = getattr(_instrumentation, 'timings', None)
+    _instrumentation.timings = None
+    return timings or {}
+
+
+def record_timing(name, seconds):
+    """
+    Adds the duration to the timing of the current request, if the request is instrumented
+
+    :param name:
+    :param seconds:
+    :return:
+    """
+    timings = getattr(_instrumentation, 'timings', None)
+    if timings is None:
+        return
+
+    timing = timings.get(name)
+    if timing is None:
+        timings[name] = [1, seconds]
+    else:
+        timing[0] += 1
+        timing[1] += seconds
+
+
+@contextmanager
+def timed(name):
+    """
+    Records the time spent in the block (or the decorated function) under the name, in the timings of the
+    current request and in the `operation_duration_seconds` metric (see core/metrics.py), e.g.
+
+        with timed('sms'):
+            client.messages.create(...)
+
+        @timed('iam')
+        def iam_get_user_token(...):
+
+    :param name:
+    :return:
+    """
+    running = getattr(_instrumentation, 'running', None)
+    if running is None:
+        running = _instrumentation.running = set()
+
+    # nested blocks of the same name (e.g. a renderer calling the render of its base class) are timed once
+    if name in running:
+        yield
+        return
+
+    running.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OPERATION_ERRORS.labels(name).inc()
+        raise
+    finally:
+        running.discard(name)
+        seconds = time.perf_counter() - started
+        record_timing(name, seconds)
+        OPERATION_LATENCY.labels(name).observe(seconds)
+
+
+def record_query_timing(execute, sql, params, many, context):
+    alias = context['connection'].alias
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    except Exception:
+        DATABASE_QUERY_ERRORS.labels(alias).inc()
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        record_timing('db', seconds)
+        DATABASE_QUERY_LATENCY.labels(alias).observe(seconds)
+
+
+def get_server_timing_header(timings, total_seconds):
+    """
+    Returns the `Server-Timing` header value of the request timings, durations in milliseconds and
+    counts as descriptions
+
+    e.g. db;desc="12";dur=8.3, render;desc="1";dur=0.6, total;dur=21.4
+
+    :param timings: dict of timing name to [count, seconds]
+    :param total_seconds:
+    :return:
+    """
+    metrics = ['{};desc="{}";dur={:.1f}'.format(name, count, seconds * 1000)
+               for name, (count, seconds) in sorted(timings.items())]
+    metrics.append('total;dur={:.1f}'.format(total_seconds * 1000))
+    return ', '.join(metrics)
+
+
+@receiver(connection_created)
+def install_query_timing(sender, connection, **kwargs):
+    # execute wrappers are kept by the database wrapper of the thread, across reconnections
+    if record_query_timing not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query_timing)
@@ -0,0 +1,260 @@
+"""
+Non blocking logging to rotated files
+
+Request threads only put the log records in a queue, records are formatted and written to the file by a background
+thread per handler, which flushes the file once per batch of records instead of after every record.
+
+    'handlers': {
+        'access': {
+            'class': 'core.log.QueuedFileHandler',
+            'filename': 'access.log',
+            'rotation': 'size',
+            'max_bytes': 50 * 1024 * 1024,
+            'backup_count': 5,
+            'filters': ['sampling'],
+            'formatter': 'json'
+        }
+    }
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler, TimedRotatingFileHandler
+
+
+class _BatchFlushMixin(object):
+    # streams are flushed by the listener thread once per batch of records, instead of after every record
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+    def _is_rotated_by_another_process(self):
+        # gunicorn worker processes write to the same file, the first one past the rollover rotates it and the
+        # others reopen the file instead of rotating it again
+        if self.stream is None:
+            return False
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.stream.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def _reopen(self):
+        self.stream.close()
+        self.stream = self._open()
+
+
+class BatchFileHandler(_BatchFlushMixin, logging.FileHandler):
+    pass
+
+
+class BatchRotatingFileHandler(_BatchFlushMixin, RotatingFileHandler):
+    def shouldRollover(self, record):
+        # the size of the file on disk is checked, the position of the stream would flush it for every record
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return os.fstat(self.stream.fileno()).st_size >= self.maxBytes
+
+    def doRollover(self):
+        if self._is_rotated_by_another_process():
+            self._reopen()
+            return
+        super().doRollover()
+
+
+class BatchTimedRotatingFileHandler(_BatchFlushMixin, TimedRotatingFileHandler):
+    def doRollover(self):
+        if self._is_rotated_by_another_process():
+            self._reopen()
+            self.rolloverAt = self.computeRollover(int(time.time()))
+            return
+        super().doRollover()
+
+
+# queued handlers of the process, whose streams are flushed before forking
+_queued_handlers = weakref.WeakSet()
+
+
+def _flush_before_fork():
+    # records buffered by the stream would be written again by the forked process, the handler lock is held
+    # until the fork is done so that the listener thread does not write meanwhile
+    for handler in list(_queued_handlers):
+        handler.target.acquire()
+        handler.target.flush_batch()
+
+
+def _release_after_fork_in_parent():
+    for handler in list(_queued_handlers):
+        handler.target.release()
+
+
+def _release_after_fork_in_child():
+    # the lock is held by the listener thread of the parent process
+    for handler in list(_queued_handlers):
+        handler.target.createLock()
+
+
+os.register_at_fork(before=_flush_before_fork, after_in_parent=_release_after_fork_in_parent,
+                    after_in_child=_release_after_fork_in_child)
+
+
+def create_file_handler(filename, rotation=None, max_bytes=0, backup_count=0, when='midnight'):
+    """
+    Returns the handler writing to the file, flushed by batch
+
+    :param filename:
+    :param rotation: 'size', 'time' or None
+    :param max_bytes: size of the file to rotate at, for size rotation
+    :param backup_count: rotated files kept
+    :param when: interval to rotate at, for time rotation (see logging.handlers.TimedRotatingFileHandler)
+    :return:
+    """
+    if rotation == 'size':
+        return BatchRotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+    if rotation == 'time':
+        return BatchTimedRotatingFileHandler(filename, when=when, backupCount=backup_count, delay=True)
+    if rotation in (None, 'none'):
+        return BatchFileHandler(filename, delay=True)
+    raise ValueError("Log rotation should be one of size, time or none")
+
+
+class QueuedFileHandler(QueueHandler):
+    """
+    QueuedFileHandler
+
+    Puts the records in a bounded queue, which is written to the file by a background thread (see
+    create_file_handler for the rotation options). Records are dropped when the queue is full, e.g. when the
+    disk is slower than the records are logged, the number of dropped records is logged once the queue drains.
+
+    The thread is started by the first record logged in a process, so that every gunicorn worker forked from
+    a preloaded master starts its own thread.
+    """
+
+    def __init__(self, filename, rotation=None, max_bytes=0, backup_count=0, when='midnight', queue_size=10000,
+                 batch_size=500):
+        super().__init__(None)
+        self.target = create_file_handler(filename, rotation, max_bytes, backup_count, when)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._pid = None
+        self._thread = None
+        _queued_handlers.add(self)
+
+    def setFormatter(self, fmt):
+        # records are formatted by the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # the message is resolved on the logging thread, since its arguments may change once the call returns
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        # called with the handler lock held
+        if self._pid != os.getpid():
+            self._start()
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # the queue and thread of the parent process are not used by a forked process
+        self.queue = queue.Queue(self.queue_size)
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._write, args=(self.queue,), name="log-{}".format(
+            os.path.basename(self.target.baseFilename)), daemon=True)
+        self._thread.start()
+
+    def _write(self, records):
+        reported_dropped = 0
+        while True:
+            batch = [records.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is None:
+                    self.target.flush_batch()
+                    return
+                self.target.handle(record)
+
+            if self.dropped != reported_dropped:
+                self.target.handle(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': "{} log records dropped, the log queue is full".format(self.dropped - reported_dropped)
+                }))
+                reported_dropped = self.dropped
+
+            self.target.flush_batch()
+
+    def close(self):
+        # called by logging.shutdown at exit, records queued until then are written
+        self.acquire()
+        try:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                try:
+                    self.queue.put(None, timeout=5)
+                    self._thread.join(timeout=5)
+                except queue.Full:
+                    pass
+            self._pid = None
+            self.target.close()
+        finally:
+            self.release()
+        super().close()
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats the records as JSON lines, for log aggregation
+    """
+
+    def format(self, record):
+        log = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": "{}:{}".format(record.module, record.lineno),
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            log["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets a fraction of the records below WARNING level through, by logger name, for high volume logs such as
+    location uploads. Records of loggers without a rate, and warnings and errors, are always logged.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
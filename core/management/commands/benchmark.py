@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from citizen.benchmarks.citizen_location_upload import CitizenLocationUploadBenchmark
+from citizen.benchmarks.qr_codes import QRCodesBenchmark
+from citizen.benchmarks.trajectory_compression import TrajectoryCompressionBenchmark
+from core.benchmarks.contact_tracing import ContactTracingBenchmark
+from core.benchmarks.db_connections import DBConnectionsBenchmark
+from core.benchmarks.endpoints import EndpointsBenchmark
+from core.benchmarks.historic_location_partitions import HistoricLocationPartitionsBenchmark
+from core.benchmarks.instrumentation import InstrumentationBenchmark
+from core.benchmarks.json_rendering import JSONRenderingBenchmark
+from core.benchmarks.location_encodings import LocationEncodingsBenchmark
+from core.benchmarks.logging import LoggingBenchmark
+from core.benchmarks.rate_limiting import RateLimitingBenchmark
+from core.benchmarks.response_compression import ResponseCompressionBenchmark
+from core.benchmarks.serving import ServingBenchmark
+from core.benchmarks.uuid_primary_keys import UUIDPrimaryKeysBenchmark
+
+# benchmarks by sub command name
+BENCHMARKS = OrderedDict((
+    ('citizen_location_upload', CitizenLocationUploadBenchmark),
+    ('contact_tracing', ContactTracingBenchmark),
+    ('db_connections', DBConnectionsBenchmark),
+    ('endpoints', EndpointsBenchmark),
+    ('historic_location_partitions', HistoricLocationPartitionsBenchmark),
+    ('instrumentation', InstrumentationBenchmark),
+    ('json_rendering', JSONRenderingBenchmark),
+    ('location_encodings', LocationEncodingsBenchmark),
+    ('logging', LoggingBenchmark),
+    ('qr_codes', QRCodesBenchmark),
+    ('rate_limiting', RateLimitingBenchmark),
+    ('response_compression', ResponseCompressionBenchmark),
+    ('serving', ServingBenchmark),
+    ('trajectory_compression', TrajectoryCompressionBenchmark),
+    ('uuid_primary_keys', UUIDPrimaryKeysBenchmark),
+))
+
+
+class Command(BaseCommand):
+    """
+    Runs one of the benchmarks of core/benchmarks and citizen/benchmarks, each benchmark is a sub command with its
+    own arguments
+
+    e.g. python manage.py benchmark --help
+         python manage.py benchmark endpoints --help
+         python manage.py benchmark endpoints --citizens 10000 --requests 200
+    """
+    help = "Runs a benchmark"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', metavar='benchmark', parser_class=CommandParser)
+        subparsers.required = True
+        for name, benchmark_class in BENCHMARKS.items():
+            subparser = subparsers.add_parser(name, help=benchmark_class.help, description=benchmark_class.help,
+                                              called_from_command_line=getattr(parser, 'called_from_command_line',
+                                                                               None))
+            benchmark_class(self.stdout, self.stderr).add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        benchmark = BENCHMARKS[options['benchmark']](self.stdout, self.stderr)
+        benchmark.handle(*args, **options)
@@ -0,0 +1,303 @@
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from authentication.models import User, Citizen, FCMPushNotificationRegistrationToken
+from authentication.utils import hex_uuid7
+from core.db import copy_rows
+from core.models import Disease, DiseaseInfectionStatus, CitizenDiseaseRelation, MobileNumberWhitelist, \
+    CitizenPushNotifications, CitizenHistoricLocationDiseaseRelation, PatientHistoricLocation
+from core.partitions import HISTORIC_LOCATION_PARTITIONED_TABLES, is_partitioned, create_partitions
+from core.seed import seed_reference_data
+from core.spatial import bump_patient_historic_location_generation
+from dashboard.utils import refresh_disease_stats
+from patient.utils import CONTACT_TRACING_NOTIFICATION_TITLE, CONTACT_TRACING_NOTIFICATION_BODY
+
+# centres of the towns citizens live and work around (lat, long, share of the citizens)
+CLUSTERS = (
+    (9.9312, 76.2673, 0.25),  # Kochi
+    (8.5241, 76.9366, 0.2),  # Thiruvananthapuram
+    (11.2588, 75.7804, 0.15),  # Kozhikode
+    (10.5276, 76.2144, 0.12),  # Thrissur
+    (8.8932, 76.6141, 0.1),  # Kollam
+    (9.5916, 76.5222, 0.08),  # Kottayam
+    (9.4981, 76.3388, 0.05),  # Alappuzha
+    (11.8745, 75.3704, 0.05),  # Kannur
+)
+
+# spread of homes and work places around the centre of the town, in degrees (0.01 degree is ~1.1 km)
+CLUSTER_SPREAD = 0.03
+
+# spread of the locations recorded during a stay and along a commute, in degrees
+STAY_SPREAD = 0.0002
+COMMUTE_SPREAD = 0.002
+
+# share of the citizens working in another town
+COMMUTER_RATIO = 0.2
+
+NOTIFICATIONS = (
+    ('CONTACT-TRACING', CONTACT_TRACING_NOTIFICATION_TITLE, CONTACT_TRACING_NOTIFICATION_BODY),
+    ('HOTSPOT-PROXIMITY', "Hotspot proximity warning !", "There are disease hotspots nearby your location !"),
+    ('ANNOUNCEMENT', "General announcement", "Stay at home and follow the instructions of the health department.")
+)
+
+
+def _random_id(rng):
+    # hex uuid drawn from the generator, so that ids are reproducible
+    return '{:032x}'.format(rng.getrandbits(128))
+
+
+def _time_ordered_id(rng, date_time):
+    # time ordered id of the models with uuid7 ids, at the time of the row
+    return hex_uuid7(date_time.timestamp(), rng.getrandbits(62))
+
+
+class Command(BaseCommand):
+    """
+    Generates a synthetic dataset for scaling tests, of citizens with their user, disease relation, whitelisted
+    mobile number, FCM devices, push notifications and location trails, and patient location trails
+
+    Citizens live and work around the towns of `CLUSTERS`. Their trail of every day is a stay at home, the commute
+    to work, a stay at work, the commute back and the evening at home; weekends are spent at home. The trails of
+    `--patient-ratio` of the citizens are also recorded as patient historic locations.
+
+    Rows are generated in chunks of `--chunk-size` citizens and streamed to the database with COPY, a chunk is
+    inserted in a transaction. Every citizen is generated from a random generator seeded by `--seed` and the
+    index of the citizen, so the same options generate the same rows. Indexes start at `--offset`, disjoint ranges
+    of citizens can be generated by parallel runs. Trails cover the `--days` days up to `--end-date` (excluded).
+
+    Reference data of initdb.py is seeded first, `--reference-data-only` only seeds it.
+
+    e.g. python manage.py generate_dataset --citizens 1000000 --days 14 --seed 42 --end-date 2020-06-01
+    """
+    help = "Generates a synthetic dataset of citizens, devices, notifications and location trails"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citizens', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=14)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--offset', type=int, default=0, help="Index of the first citizen")
+        parser.add_argument('--end-date', default=None, help="YYYY-MM-DD, today by default")
+        parser.add_argument('--devices-per-citizen', type=int, default=1)
+        parser.add_argument('--notifications-per-citizen', type=int, default=5)
+        parser.add_argument('--commute-points', type=int, default=4, help="Locations recorded along a commute")
+        parser.add_argument('--patient-ratio', type=float, default=0.001)
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Citizens inserted per transaction")
+        parser.add_argument('--reference-data-only', action='store_true')
+
+    def _get_rng(self, index, table):
+        return random.Random("{}:{}:{}".format(self.options['seed'], index, table))
+
+    def _get_profile(self, index):
+        rng = self._get_rng(index, 'profile')
+
+        def random_place(cluster):
+            lat, long, _ = cluster
+            return lat + rng.gauss(0, CLUSTER_SPREAD), long + rng.gauss(0, CLUSTER_SPREAD)
+
+        weights = [share for _, _, share in CLUSTERS]
+        home_cluster = rng.choices(CLUSTERS, weights)[0]
+        work_cluster = rng.choices(CLUSTERS, weights)[0] if rng.random() < COMMUTER_RATIO else home_cluster
+
+        return SimpleNamespace(
+            index=index,
+            user_id=_random_id(rng),
+            citizen_id=_random_id(rng),
+            mobile_number="+911{:09d}".format(index),
+            joined_at=self.start - timedelta(seconds=rng.randrange(30 * 24 * 60 * 60)),
+            home=random_place(home_cluster),
+            work=random_place(work_cluster),
+            # hours of the day
+            leaves_at=min(max(rng.gauss(8.5, 0.75), 6), 10),
+            returns_at=min(max(rng.gauss(17.5, 1), 15), 20),
+            commute=timedelta(minutes=rng.randint(15, 90)),
+            is_patient=rng.random() < self.options['patient_ratio']
+        )
+
+    def _get_trail(self, profile):
+        """
+        Yields the locations of the citizen as (lat, long, recorded date time, exit date time)
+
+        :param profile:
+        :return:
+        """
+        rng = self._get_rng(profile.index, 'trail')
+        commute_points = self.options['commute_points']
+
+        def stay(place, entered, exited):
+            return (place[0] + rng.gauss(0, STAY_SPREAD), place[1] + rng.gauss(0, STAY_SPREAD), entered,
+                    exited - timedelta(seconds=1))
+
+        def commute(origin, destination, left):
+            for point in range(1, commute_points + 1):
+                fraction = point / (commute_points + 1)
+                yield (origin[0] + (destination[0] - origin[0]) * fraction + rng.gauss(0, COMMUTE_SPREAD),
+                       origin[1] + (destination[1] - origin[1]) * fraction + rng.gauss(0, COMMUTE_SPREAD),
+                       left + profile.commute * fraction, None)
+
+        for day in range(self.options['days']):
+            midnight = self.start + timedelta(days=day)
+            next_midnight = midnight + timedelta(days=1)
+            if midnight.weekday() >= 5:
+                yield stay(profile.home, midnight, next_midnight)
+                continue
+
+            leaves = midnight + timedelta(hours=profile.leaves_at + rng.uniform(-0.25, 0.25))
+            returns = midnight + timedelta(hours=profile.returns_at + rng.uniform(-0.25, 0.25))
+            yield stay(profile.home, midnight, leaves)
+            yield from commute(profile.home, profile.work, leaves)
+            yield stay(profile.work, leaves + profile.commute, returns)
+            yield from commute(profile.work, profile.home, returns)
+            yield stay(profile.home, returns + profile.commute, next_midnight)
+
+    def _users(self, profiles):
+        for profile in profiles:
+            yield (profile.user_id, UNUSABLE_PASSWORD_PREFIX, None, False, profile.mobile_number, "", True, False,
+                   profile.joined_at, profile.joined_at, None, None)
+
+    def _citizens(self, profiles):
+        for profile in profiles:
+            yield (profile.citizen_id, "", profile.user_id, profile.mobile_number,
+                   "Citizen {}".format(profile.index), "01-01-1970", profile.home[0], profile.home[1], True)
+
+    def _citizen_disease_relations(self, profiles):
+        for profile in profiles:
+            rng = self._get_rng(profile.index, 'disease')
+            yield _random_id(rng), profile.citizen_id, self.disease.id, ""
+
+    def _whitelisted_mobile_numbers(self, profiles):
+        for profile in profiles:
+            rng = self._get_rng(profile.index, 'whitelist')
+            yield _random_id(rng), profile.mobile_number
+
+    def _devices(self, profiles):
+        for profile in profiles:
+            rng = self._get_rng(profile.index, 'devices')
+            for _ in range(self.options['devices_per_citizen']):
+                yield (None, True, profile.joined_at, None, _random_id(rng), _random_id(rng) + _random_id(rng),
+                       "FCM", profile.user_id)
+
+    def _notifications(self, profiles):
+        period = self.options['days'] * 24 * 60 * 60
+        for profile in profiles:
+            rng = self._get_rng(profile.index, 'notifications')
+            for _ in range(self.options['notifications_per_citizen']):
+                notification_type, title, body = rng.choice(NOTIFICATIONS)
+                added_on = self.start + timedelta(seconds=rng.randrange(period))
+                yield (_time_ordered_id(rng, added_on), notification_type, title, body, rng.random() < 0.5, added_on,
+                       profile.citizen_id)
+
+    def _citizen_locations(self, profiles):
+        for profile in profiles:
+            rng = self._get_rng(profile.index, 'citizen_locations')
+            for lat, long, recorded_date_time, exit_date_time in self._get_trail(profile):
+                yield (_time_ordered_id(rng, recorded_date_time), profile.citizen_id, self.disease.id, lat, long, "",
+                       recorded_date_time, exit_date_time, exit_date_time or recorded_date_time)
+
+    def _patient_locations(self, profiles):
+        for profile in profiles:
+            if not profile.is_patient:
+                continue
+
+            rng = self._get_rng(profile.index, 'patient_locations')
+            infection_status = rng.choice(self.infection_statuses)
+            for lat, long, recorded_date_time, _ in self._get_trail(profile):
+                yield _time_ordered_id(rng, recorded_date_time), lat, long, recorded_date_time, infection_status.id
+
+    def _get_tables(self):
+        return (
+            (User, ('id', 'password', 'last_login', 'is_superuser', 'username', 'email', 'is_active', 'is_staff',
+                    'created_at', 'updated_at', 'otp', 'otp_expiry'), self._users),
+            (Citizen, ('id', 'iam_user_id', 'user_id', 'mobile_number', 'fullname', 'dob', 'home_latitude',
+                       'home_longitude', 'is_location_sync_enabled'), self._citizens),
+            (CitizenDiseaseRelation, ('id', 'citizen_id', 'disease_id', 'wellness'), self._citizen_disease_relations),
+            (MobileNumberWhitelist, ('id', 'mobile_number'), self._whitelisted_mobile_numbers),
+            # ids are generated by the serial of the table
+            (FCMPushNotificationRegistrationToken, ('name', 'active', 'date_created', 'application_id', 'device_id',
+                                                    'registration_id', 'cloud_message_type', 'user_id'),
+             self._devices),
+            (CitizenPushNotifications, ('id', 'type', 'title', 'body', 'is_read', 'added_on', 'citizen_id'),
+             self._notifications),
+            (CitizenHistoricLocationDiseaseRelation, ('id', 'citizen_id', 'disease_id', 'lat', 'long',
+                                                      'location_name', 'recorded_date_time', 'exit_date_time',
+                                                      'added_on'), self._citizen_locations),
+            (PatientHistoricLocation, ('id', 'lat', 'long', 'recorded_date_time', 'disease_infection_status_id'),
+             self._patient_locations),
+        )
+
+    def _create_partitions(self, end):
+        with connection.cursor() as cursor:
+            for table, column in HISTORIC_LOCATION_PARTITIONED_TABLES:
+                if is_partitioned(cursor, table):
+                    create_partitions(cursor, table, column, self.start, end,
+                                      settings.HISTORIC_LOCATION_PARTITION_INTERVAL)
+
+    def _seed_reference_data(self):
+        for model_name, created in seed_reference_data().items():
+            self.stdout.write("{}: {} created".format(model_name, created))
+
+    def handle(self, *args, **options):
+        self.options = options
+        if not options['reference_data_only'] and options['citizens'] < 1:
+            raise CommandError("--citizens must be at least 1")
+
+        self._seed_reference_data()
+        if options['reference_data_only']:
+            return
+
+        if options['end_date'] is None:
+            end_date = timezone.now().date()
+        else:
+            try:
+                end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--end-date must be in YYYY-MM-DD format")
+
+        end = datetime(end_date.year, end_date.month, end_date.day, tzinfo=timezone.utc)
+        self.start = end - timedelta(days=options['days'])
+
+        self.disease = Disease.objects.get(name__iexact="COVID-19")
+        self.infection_statuses = list(DiseaseInfectionStatus.objects.filter(disease=self.disease).order_by('id'))
+
+        indexes = range(options['offset'], options['offset'] + options['citizens'])
+        if User.objects.filter(username__in=[self._get_profile(index).mobile_number
+                                             for index in (indexes[0], indexes[-1])]).exists():
+            raise CommandError("Citizens of the range are already generated, run with another --offset")
+
+        self._create_partitions(end)
+
+        rows = Counter()
+        started = time.perf_counter()
+        for chunk_start in range(indexes.start, indexes.stop, options['chunk_size']):
+            profiles = [self._get_profile(index) for index in
+                        range(chunk_start, min(chunk_start + options['chunk_size'], indexes.stop))]
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                for model, columns, generate_rows in self._get_tables():
+                    rows[model.__name__] += copy_rows(cursor, model._meta.db_table, columns, generate_rows(profiles))
+
+            self.stdout.write("{} / {} citizens, {} rows in {:.1f} s".format(
+                chunk_start + len(profiles) - indexes.start, len(indexes), sum(rows.values()),
+                time.perf_counter() - started))
+
+        with connection.cursor() as cursor:
+            for model, _, _ in self._get_tables():
+                cursor.execute('ANALYZE "{}"'.format(model._meta.db_table))
+
+        # rows inserted by COPY are not counted by the dashboard signals
+        refresh_disease_stats()
+        bump_patient_historic_location_generation()
+
+        elapsed = time.perf_counter() - started
+        for model_name, count in rows.items():
+            self.stdout.write("{:<40} {:>12}".format(model_name, count))
+        self.stdout.write("{} rows in {:.1f} s ({:.0f} rows/s)".format(
+            sum(rows.values()), elapsed, sum(rows.values()) / elapsed))
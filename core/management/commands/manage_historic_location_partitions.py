@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.partitions import HISTORIC_LOCATION_PARTITIONED_TABLES, maintain_partitions
+
+
+class Command(BaseCommand):
+    """
+    Maintains the partitions of historic location tables, to be scheduled daily (e.g. cron)
+
+    1. Creates the partitions for the upcoming `HISTORIC_LOCATION_PARTITION_PREMAKE` days / weeks
+    2. Drops the partitions older than `HISTORIC_LOCATION_EXPIRY_IN_SECONDS`, instead of deleting the expired rows
+
+    e.g. python manage.py manage_historic_location_partitions
+    """
+    help = "Creates upcoming and drops expired partitions of historic location tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--premake', type=int, default=settings.HISTORIC_LOCATION_PARTITION_PREMAKE,
+                            help="Number of partitions to create ahead of the current one")
+
+    def handle(self, *args, **options):
+        for table, column in HISTORIC_LOCATION_PARTITIONED_TABLES:
+            created, dropped = maintain_partitions(table, column, settings.HISTORIC_LOCATION_PARTITION_INTERVAL,
+                                                   options['premake'], settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS)
+
+            self.stdout.write("{}: created {} partitions, dropped {} partitions".format(
+                table, len(created), len(dropped)))
+            for name in created:
+                self.stdout.write("  + {}".format(name))
+            for name in dropped:
+                self.stdout.write("  - {}".format(name))
@@ -0,0 +1,96 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORT_TIME_REGEX = re.compile(r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<indent>\s*)(?P<name>\S+)')
+
+# run in a new interpreter for every profile run, so that every import is cold
+STARTUP_SCRIPT = """
+import json, sys, time
+
+started = time.perf_counter()
+import django
+django.setup()
+setup_finished = time.perf_counter()
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+url_conf_finished = time.perf_counter()
+
+from django.test import Client
+response = Client().get(sys.argv[1])
+first_request_finished = time.perf_counter()
+
+print(json.dumps({
+    "setup_ms": (setup_finished - started) * 1000,
+    "url_conf_ms": (url_conf_finished - setup_finished) * 1000,
+    "first_request_ms": (first_request_finished - url_conf_finished) * 1000,
+    "total_ms": (first_request_finished - started) * 1000,
+    "status_code": response.status_code
+}))
+"""
+
+
+class Command(BaseCommand):
+    """
+    Profiles the cold start of the application in a new interpreter, reporting
+
+        - import time by top level package (from `python -X importtime`)
+        - app registry setup time (django.setup())
+        - URL conf import time
+        - first request latency
+
+    With `--budget-ms`, fails if the cold start (setup, URL conf and first request) of the fastest run takes
+    longer than the budget, e.g. for catching startup regressions in CI
+
+    e.g. python manage.py startup_profile --budget-ms 1500
+    """
+    help = "Profiles the cold start time of the application"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/v1/health/', help="Path of the first request")
+        parser.add_argument('--runs', type=int, default=3, help="Cold starts profiled, the fastest one is reported")
+        parser.add_argument('--top', type=int, default=15, help="Packages listed in the import time breakdown")
+        parser.add_argument('--budget-ms', type=float, default=None)
+
+    def _profile(self, path):
+        env = dict(os.environ,
+                   PYTHONPATH=os.pathsep.join(filter(None, (settings.BASE_DIR, os.environ.get('PYTHONPATH')))))
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT, path], env=env,
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if process.returncode != 0:
+            raise CommandError("Cold start failed:\n{}".format(
+                '\n'.join(line for line in process.stderr.splitlines() if not line.startswith('import time:'))))
+
+        import_times = defaultdict(int)
+        for line in process.stderr.splitlines():
+            match = IMPORT_TIME_REGEX.match(line)
+            if match:
+                import_times[match.group('name').split('.')[0]] += int(match.group('self'))
+
+        return json.loads(process.stdout.strip().splitlines()[-1]), import_times
+
+    def handle(self, *args, **options):
+        profiles = [self._profile(options['path']) for _ in range(options['runs'])]
+        timings, import_times = min(profiles, key=lambda profile: profile[0]['total_ms'])
+
+        self.stdout.write("Import time by package (self time in ms):")
+        for package, microseconds in sorted(import_times.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write("    {:<40} {:>8.1f}".format(package, microseconds / 1000))
+        self.stdout.write("    {:<40} {:>8.1f}".format("all", sum(import_times.values()) / 1000))
+
+        self.stdout.write("App registry setup: {:.1f} ms".format(timings['setup_ms']))
+        self.stdout.write("URL conf: {:.1f} ms".format(timings['url_conf_ms']))
+        self.stdout.write("First request ({} {}): {:.1f} ms".format(
+            options['path'], timings['status_code'], timings['first_request_ms']))
+        self.stdout.write("Cold start: {:.1f} ms (fastest of {} runs)".format(timings['total_ms'], options['runs']))
+
+        if options['budget_ms'] is not None and timings['total_ms'] > options['budget_ms']:
+            raise CommandError("Cold start of {:.1f} ms is over the budget of {:.1f} ms".format(
+                timings['total_ms'], options['budget_ms']))
@@ -0,0 +1,214 @@
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Subquery
+from django.utils import timezone
+
+from authentication.models import User, Citizen, FCMPushNotificationRegistrationToken
+from authentication.utils import hex_uuid
+from citizen.utils import get_citizen_historic_location_observed_after_filter
+from core.models import CitizenPushNotifications, CitizenHistoricLocationDiseaseRelation, PatientHistoricLocation
+
+INDEX_SCAN_NODE_TYPES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+SORT_NODE_TYPES = ('Sort', 'Incremental Sort')
+
+# citizens of the dataset seeded for the verification, the hot queries are served by their indexes from a few
+# thousands of citizens on
+DATASET_CITIZENS = 20000
+DATASET_DAYS = 2
+DATASET_PATIENT_RATIO = 0.05
+DATASET_NOTIFICATIONS_PER_CITIZEN = 20
+# with a single device per user, the index of the user foreign key is as selective as the user and device index
+DATASET_DEVICES_PER_CITIZEN = 3
+# index of the first seeded citizen, far from the citizens seeded with generate_dataset by default
+DATASET_OFFSET = 900000000
+
+
+class Command(BaseCommand):
+    """
+    Verifies that the hot lookups are served by their indexes. Each query is explained and fails unless the plan
+    scans its expected index, or the indexes of the partitions for an index of a partitioned table. Queries of the
+    latest rows (ORDER BY ... LIMIT) fail as well when the plan sorts the rows instead of reading them in the order
+    of the index.
+
+    On a small table the planner rightly prefers a sequential scan, so the plans depend on the size of the dataset.
+    By default `--citizens` citizens are seeded with generate_dataset in a transaction which is rolled back
+    afterwards, so that the plans are verified on a dataset of a pinned size whatever the data of the database, e.g.
+    in CI on an empty database. Queries are then run as at the end of the dataset, today at midnight. With
+    `--current-data` the plans are verified on the data of the database, which should have at least `--min-citizens`
+    citizens. Tables are analyzed beforehand. Queries look up citizens, users and devices which are not in the
+    dataset, as new ones would be.
+
+    e.g. python manage.py verify_query_plans --verbose
+         python manage.py verify_query_plans --current-data
+    """
+    help = "Verifies that the hot lookups are served by their indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citizens', type=int, default=DATASET_CITIZENS,
+                            help="Citizens of the dataset seeded for the verification")
+        parser.add_argument('--current-data', action='store_true',
+                            help="Verifies the plans on the data of the database, without seeding a dataset")
+        parser.add_argument('--min-citizens', type=int, default=10000,
+                            help="Citizens the data of the database should have, with --current-data")
+        parser.add_argument('--skip-analyze', action='store_true', help="Uses the current table statistics")
+        parser.add_argument('--verbose', action='store_true', help="Prints the plan of every query")
+
+    def _get_hot_queries(self, now):
+        """
+        Returns (description, queryset, expected index) of the hot queries
+
+        :param now: time the queries are run at
+        :return: list of (description, queryset, expected index)
+        """
+        citizen_id, user_id = hex_uuid(), hex_uuid()
+        # locations are recorded for a few diseases, an unknown disease would be estimated to match no locations
+        disease_id = CitizenHistoricLocationDiseaseRelation.objects.values_list('disease_id', flat=True).first() or \
+            hex_uuid()
+
+        return (
+            ("Keycloak authentication, citizen by IAM user id",
+             Citizen.objects.select_related('user').filter(iam_user_id__exact=hex_uuid()),
+             'citizen_iam_user_id_unique'),
+            ("Push notification to a citizen, citizen by mobile number",
+             Citizen.objects.filter(mobile_number='+910000000000'),
+             'citizen_mobile_number_idx'),
+            ("Login and registration, user by email",
+             User.objects.filter(email='verify.query.plans@example.com'),
+             'user_email_idx'),
+            ("Notification listing, latest notifications of a user",
+             CitizenPushNotifications.objects.filter(citizen_id=Subquery(
+                 Citizen.objects.filter(user__id=user_id).values('id'))).order_by('-added_on')[:10],
+             'citizen_notification_added_idx'),
+            ("Hotspot proximity, last notification of a citizen",
+             CitizenPushNotifications.objects.filter(citizen_id=citizen_id).order_by('-added_on')[:1],
+             'citizen_notification_added_idx'),
+            ("Device registration, devices of a user by device id",
+             FCMPushNotificationRegistrationToken.objects.filter(user__id=user_id, device_id=hex_uuid()),
+             'fcm_token_user_device_idx'),
+            ("Location upload, latest location of a citizen",
+             CitizenHistoricLocationDiseaseRelation.objects.filter(
+                 citizen_id=citizen_id, disease_id=disease_id, recorded_date_time__gte=now - timedelta(
+                     seconds=settings.TRAJECTORY_MAX_STAY_IN_SECONDS + settings.TRAJECTORY_MAX_GAP_IN_SECONDS)
+             ).order_by('-recorded_date_time')[:1],
+             'citizen_location_recorded_idx'),
+            ("Risk assessment, non expired trail of a citizen",
+             CitizenHistoricLocationDiseaseRelation.objects.filter(
+                 get_citizen_historic_location_observed_after_filter(
+                     now - timedelta(seconds=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS)),
+                 citizen__id=citizen_id).values_list('lat', 'long', 'recorded_date_time', 'exit_date_time'),
+             'citizen_location_recorded_idx'),
+            ("Map data, patient locations of the last hour, newest first",
+             PatientHistoricLocation.objects.filter(
+                 recorded_date_time__gte=now - timedelta(hours=1)).order_by('-recorded_date_time'),
+             'patient_location_recorded_idx'),
+        )
+
+    def _get_partition_indexes(self, cursor, index):
+        # indexes of the partitions are attached to the index of the partitioned table
+        cursor.execute("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+        """, [index])
+        return {row[0] for row in cursor.fetchall()}
+
+    def _get_nodes(self, plan):
+        """
+        Returns (node type, relation, index) of the nodes of the plan
+        """
+        found = []
+        nodes = [plan]
+        while nodes:
+            node = nodes.pop()
+            found.append((node['Node Type'], node.get('Relation Name'), node.get('Index Name')))
+            nodes.extend(node.get('Plans', []))
+        return found
+
+    def _seed_dataset(self, citizens):
+        """
+        Seeds the dataset the plans are verified on, ending today at midnight
+
+        :param citizens: citizens of the dataset
+        :return: end of the dataset, the time the queries are run at
+        """
+        self.stdout.write("Seeding {} citizens, rolled back afterwards".format(citizens))
+        end_date = timezone.now().date()
+        call_command('generate_dataset', citizens=citizens, days=DATASET_DAYS, offset=DATASET_OFFSET,
+                     end_date=end_date.isoformat(), patient_ratio=DATASET_PATIENT_RATIO,
+                     notifications_per_citizen=DATASET_NOTIFICATIONS_PER_CITIZEN,
+                     devices_per_citizen=DATASET_DEVICES_PER_CITIZEN, stdout=StringIO())
+        return datetime(end_date.year, end_date.month, end_date.day, tzinfo=timezone.utc)
+
+    def _verify(self, now, options):
+        """
+        Returns the number of hot queries which are not served by their indexes
+
+        :param now: time the queries are run at
+        :param options: options of the command
+        :return: number of failures
+        """
+        failures = 0
+        with connection.cursor() as cursor:
+            if not options['skip_analyze']:
+                cursor.execute('ANALYZE')
+
+            for description, queryset, index in self._get_hot_queries(now):
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+                # the JSON plan is decoded by psycopg2, unless its type is not known to the connection
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plan = plan[0]['Plan']
+
+                nodes = self._get_nodes(plan)
+                scans = [node for node in nodes if 'Scan' in node[0]]
+                expected_indexes = {index} | self._get_partition_indexes(cursor, index)
+                used = [scan for scan in scans if scan[0] in INDEX_SCAN_NODE_TYPES and scan[2] in expected_indexes]
+                # the latest rows are read in the order of the index, instead of sorting all the rows of the lookup
+                sorted_by_index = queryset.query.high_mark is None or not any(
+                    node_type in SORT_NODE_TYPES for node_type, _, _ in nodes)
+
+                ok = used and sorted_by_index
+                if ok:
+                    self.stdout.write("OK    {} - {} {} ({} scans)".format(description, used[0][0], index, len(used)))
+                else:
+                    failures += 1
+                    self.stdout.write("FAIL  {} - expected {}{}, scans: {}".format(
+                        description, index, "" if sorted_by_index else " without a sort", ", ".join(
+                            "{} {}".format(node_type, index_name or relation) for node_type, relation, index_name in
+                            scans)))
+
+                if options['verbose'] or not ok:
+                    cursor.execute('EXPLAIN ' + sql, params)
+                    self.stdout.write("\n".join("      " + row[0] for row in cursor.fetchall()))
+
+        return failures
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Query plans are verified on PostgreSQL only")
+
+        if options['current_data']:
+            citizens = Citizen.objects.count()
+            if citizens < options['min_citizens']:
+                raise CommandError("Dataset has {} citizens, seed at least {} with generate_dataset, or lower "
+                                   "--min-citizens".format(citizens, options['min_citizens']))
+            failures = self._verify(timezone.now(), options)
+        else:
+            with transaction.atomic():
+                now = self._seed_dataset(options['citizens'])
+                failures = self._verify(now, options)
+                # the seeded dataset, its partitions and statistics are discarded
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError("{} of the hot queries are not served by their indexes".format(failures))
+        self.stdout.write("Every hot query is served by its index")
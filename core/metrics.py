@@ -0,0 +1,72 @@
+"""
+Prometheus metrics of the application, exposed at /metrics
+
+When served by multiple gunicorn workers, `PROMETHEUS_MULTIPROC_DIR` is set (see data4life_backend/gunicorn_conf.py)
+before the metrics are created, every worker then records its metrics in memory mapped files of that directory,
+which are aggregated on every scrape. Otherwise (e.g. runserver) metrics are kept in the memory of the process.
+"""
+import os
+
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
+
+# latencies from a millisecond to a minute, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Latency of the requests by view",
+    ['view', 'method'], buckets=LATENCY_BUCKETS)
+
+REQUEST_ERRORS = Counter(
+    'http_request_errors_total', "Requests answered with an error status by view",
+    ['view', 'method', 'status'])
+
+DATABASE_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds', "Latency of the database queries by database alias",
+    ['database'], buckets=LATENCY_BUCKETS)
+
+DATABASE_QUERY_ERRORS = Counter(
+    'db_query_errors_total', "Database queries which raised an error by database alias",
+    ['database'])
+
+# IAM requests, push notifications, SMS, rendering and proximity checks, timed by core.instrumentation.timed
+OPERATION_LATENCY = Histogram(
+    'operation_duration_seconds', "Latency of the timed operations (IAM, push, SMS, rendering, proximity check)",
+    ['operation'], buckets=LATENCY_BUCKETS)
+
+OPERATION_ERRORS = Counter(
+    'operation_errors_total', "Timed operations which raised an error",
+    ['operation'])
+
+BACKGROUND_TASK_LATENCY = Histogram(
+    'background_task_duration_seconds', "Duration of the functions run in background threads",
+    ['task'], buckets=LATENCY_BUCKETS)
+
+BACKGROUND_TASK_ERRORS = Counter(
+    'background_task_errors_total', "Functions run in background threads which raised an error",
+    ['task'])
+
+# requests throttled by core.throttling, by throttle scope of the view and kind of the throttle (ip, user, ...)
+RATE_LIMITED_REQUESTS = Counter(
+    'rate_limited_requests_total', "Requests throttled by the rate limits",
+    ['scope', 'kind'])
+
+
+def is_multiprocess():
+    return 'PROMETHEUS_MULTIPROC_DIR' in os.environ or 'prometheus_multiproc_dir' in os.environ
+
+
+def get_metrics():
+    """
+    Returns the metrics in the Prometheus text exposition format, aggregated over every worker process
+    in multiprocess mode
+
+    :return: (content, content type)
+    """
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,182 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_etags
+
+from core.compression import get_accepted_encoding, get_compressed_content, get_content_digest, compress_stream
+from core.instrumentation import start_request_timings, stop_request_timings, get_server_timing_header
+from core.metrics import REQUEST_LATENCY, REQUEST_ERRORS
+from core.routers import reset_writes, has_written, pin_to_primary, is_replica_configured
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses with brotli or gzip, negotiated through the `Accept-Encoding` header
+
+    Only successful responses of the content types in `COMPRESSION_CONTENT_TYPES` which are at least
+    `COMPRESSION_MIN_SIZE` bytes are compressed, streamed responses of those content types are compressed as they
+    are streamed. Compressed contents are cached by the digest of the content
+    (see core/compression.py), so that a response rendering the same content is compressed only once.
+
+    Responses of the views in `COMPRESSION_EXCLUDED_URL_NAMES` are never compressed, they carry secrets.
+
+    Responses without an ETag get a weak ETag from the digest of the content, requests with a matching
+    `If-None-Match` header are answered with 304 Not Modified. ETags set by the views are kept as they are, those
+    views answer their conditional requests themselves.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is not None and resolver_match.url_name in settings.COMPRESSION_EXCLUDED_URL_NAMES:
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+
+        if response.streaming:
+            return self._compress_stream(request, response)
+
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        digest = get_content_digest(response.content)
+
+        if not response.has_header('ETag'):
+            # the same ETag is used for every encoding of the content, hence it is weak
+            response['ETag'] = 'W/"{}"'.format(digest)
+
+            # If-None-Match uses the weak comparison, ignoring the W/ prefixes
+            if_none_match = [etag[2:] if etag.startswith('W/') else etag
+                             for etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+            if request.method in ('GET', 'HEAD') and ('*' in if_none_match or response['ETag'][2:] in if_none_match):
+                not_modified_response = HttpResponseNotModified()
+                for header in ('ETag', 'Vary', 'Cache-Control', 'Expires'):
+                    if response.has_header(header):
+                        not_modified_response[header] = response[header]
+                return not_modified_response
+
+        encoding = get_accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        response.content = get_compressed_content(response.content, encoding, digest)
+        response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+
+        return response
+
+    def _compress_stream(self, request, response):
+        # content is not known upfront, streamed responses are compressed as they are streamed, without an ETag
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = get_accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        response.streaming_content = compress_stream(response.streaming_content, encoding)
+        if response.has_header('Content-Length'):
+            del response['Content-Length']
+        response['Content-Encoding'] = encoding
+
+        return response
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+    Pins the replica reads of a user to the primary database for `DATABASE_REPLICA_PIN_IN_SECONDS` after a
+    request of the user wrote to the primary (see core/routers.py), so that the user reads their own writes
+    while the replica catches up
+    """
+
+    def process_request(self, request):
+        reset_writes()
+
+    def process_response(self, request, response):
+        # request.user is the user authenticated by rest_framework, once a view has accessed it
+        user = getattr(request, 'user', None)
+        if has_written() and is_replica_configured() and user is not None and user.is_authenticated:
+            pin_to_primary(user.id)
+
+        reset_writes()
+        return response
+
+
+class InstrumentationMiddleware(MiddlewareMixin):
+    """
+    Records the time spent by a request in database queries, IAM requests, push notifications, SMS and
+    rendering (see core/instrumentation.py)
+
+    Timings are sent in the `Server-Timing` response header when `INSTRUMENTATION_SERVER_TIMING_HEADER` is set,
+    and logged for a sample of the requests (`INSTRUMENTATION_LOG_SAMPLE_RATE`) and for every slow request
+    (`INSTRUMENTATION_SLOW_REQUEST_IN_SECONDS`).
+    """
+
+    def process_request(self, request):
+        if settings.INSTRUMENTATION_ENABLED:
+            request.instrumentation_started = time.perf_counter()
+            start_request_timings()
+
+    def process_response(self, request, response):
+        started = getattr(request, 'instrumentation_started', None)
+        if started is None:
+            return response
+
+        timings = stop_request_timings()
+        total_seconds = time.perf_counter() - started
+
+        if settings.INSTRUMENTATION_SERVER_TIMING_HEADER:
+            response['Server-Timing'] = get_server_timing_header(timings, total_seconds)
+
+        if total_seconds >= settings.INSTRUMENTATION_SLOW_REQUEST_IN_SECONDS or \
+                random.random() < settings.INSTRUMENTATION_LOG_SAMPLE_RATE:
+            log = {
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "total_ms": round(total_seconds * 1000, 1)
+            }
+            for name, (count, seconds) in sorted(timings.items()):
+                log[name + "_count"] = count
+                log[name + "_ms"] = round(seconds * 1000, 1)
+            settings.LOGGER_INFO.info("Request timings {}".format(json.dumps(log)))
+
+        return response
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Records the latency of every request in the `http_request_duration_seconds` metric and the requests answered
+    with an error status in the `http_request_errors_total` metric, by view name (see core/metrics.py)
+
+    Requests which do not match a URL pattern are recorded under the `unmatched` view, so that the number of
+    label values stays bounded.
+    """
+
+    def process_request(self, request):
+        if settings.METRICS_ENABLED:
+            request.metrics_started = time.perf_counter()
+
+    def process_response(self, request, response):
+        started = getattr(request, 'metrics_started', None)
+        if started is None:
+            return response
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.view_name if resolver_match is not None else 'unmatched'
+
+        REQUEST_LATENCY.labels(view, request.method).observe(time.perf_counter() - started)
+        if response.status_code >= 400:
+            REQUEST_ERRORS.labels(view, request.method, str(response.status_code)).inc()
+
+        return response
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import migrations
+
+from core.partitions import HISTORIC_LOCATION_PARTITIONED_TABLES, convert_to_partitioned_table, \
+    convert_to_regular_table, is_partitioned
+
+
+def partition_historic_location_tables(apps, schema_editor):
+    """
+    Converts the historic location tables into tables range partitioned by the recorded date time
+
+    Partitions are created for the non expired rows and the upcoming days, older rows are kept in the
+    default partition until the partition maintenance command deletes them.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for table, column in HISTORIC_LOCATION_PARTITIONED_TABLES:
+            if is_partitioned(cursor, table):
+                continue
+
+            convert_to_partitioned_table(cursor, table, column, settings.HISTORIC_LOCATION_PARTITION_INTERVAL,
+                                         days_before=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS // 86400 + 1,
+                                         days_after=settings.HISTORIC_LOCATION_PARTITION_PREMAKE)
+
+
+def unpartition_historic_location_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for table, _ in HISTORIC_LOCATION_PARTITIONED_TABLES:
+            if is_partitioned(cursor, table):
+                convert_to_regular_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_auto_20200611_2259'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_historic_location_tables, unpartition_historic_location_tables),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.7 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_partition_historic_locations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='citizenhistoriclocationdiseaserelation',
+            name='exit_date_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
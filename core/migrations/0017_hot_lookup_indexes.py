@@ -0,0 +1,28 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # indexes of the regular tables are created concurrently, which cannot run in a transaction. Partitioned
+    # tables cannot be indexed concurrently, their partitions are indexed while the writes wait.
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_citizenhistoriclocationdiseaserelation_exit_date_time'),
+        ('authentication', '0008_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='citizenpushnotifications',
+            index=models.Index(fields=['citizen', '-added_on'], name='citizen_notification_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patienthistoriclocation',
+            index=models.Index(fields=['recorded_date_time'], name='patient_location_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='citizenhistoriclocationdiseaserelation',
+            index=models.Index(fields=['citizen', 'recorded_date_time'], name='citizen_location_recorded_idx'),
+        ),
+    ]
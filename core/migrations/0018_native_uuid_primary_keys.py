@@ -0,0 +1,178 @@
+import authentication.utils
+import core.custom_fields
+from django.db import migrations
+
+# models whose 36 character CharField ids become native UUIDs, with the foreign keys to them
+UUID_PRIMARY_KEY_MODELS = (
+    ('authentication', 'User'),
+    ('authentication', 'Region'),
+    ('authentication', 'DataEntryAdmin'),
+    ('authentication', 'DataEntryAdminRegion'),
+    ('authentication', 'Citizen'),
+    ('core', 'Disease'),
+    ('core', 'DiseaseInfectionStatus'),
+    ('core', 'PatientHistoricLocation'),
+    ('core', 'CitizenDiseaseRelation'),
+    ('core', 'CitizenHistoricLocationDiseaseRelation'),
+    ('core', 'AreaSeverityLevel'),
+    ('core', 'RiskAssessmentRecommendation'),
+    ('core', 'SelfScreeningQuestion'),
+    ('core', 'WellnessStatusOutcome'),
+    ('core', 'CitizenPushNotifications'),
+    ('core', 'MobileNumberWhitelist'),
+    ('dashboard', 'DiseaseStatRollup'),
+)
+
+
+def _get_id_columns(cursor, tables):
+    """
+    Returns the id columns by table, with the columns of the foreign keys to them from any app (e.g. admin log
+    entries, push notification devices, many to many tables), and the foreign keys as (table, name, definition)
+
+    Foreign keys of the partitions are inherited from the partitioned table, they are left out.
+    """
+    cursor.execute("""
+        SELECT pg_class.relname, pg_constraint.conname, pg_get_constraintdef(pg_constraint.oid), pg_attribute.attname
+        FROM pg_constraint
+        JOIN pg_class ON pg_class.oid = pg_constraint.conrelid
+        JOIN pg_attribute ON pg_attribute.attrelid = pg_constraint.conrelid AND
+            pg_attribute.attnum = pg_constraint.conkey[1]
+        WHERE pg_constraint.contype = 'f' AND pg_constraint.conparentid = 0 AND
+            pg_constraint.confrelid = ANY(%s::regclass[])
+        ORDER BY 1, 2
+    """, [list(tables)])
+
+    columns = {table: ['id'] for table in tables}
+    foreign_keys = []
+    for table, name, definition, column in cursor.fetchall():
+        columns.setdefault(table, []).append(column)
+        foreign_keys.append((table, name, definition))
+    return columns, foreign_keys
+
+
+def _convert_id_columns(apps, schema_editor, to_uuid):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    tables = [apps.get_model(app_label, model_name)._meta.db_table for app_label, model_name in
+              UUID_PRIMARY_KEY_MODELS]
+
+    with schema_editor.connection.cursor() as cursor:
+        columns, foreign_keys = _get_id_columns(cursor, tables)
+
+        for table, name, _ in foreign_keys:
+            cursor.execute('ALTER TABLE "{}" DROP CONSTRAINT "{}"'.format(table, name))
+
+        for table, table_columns in columns.items():
+            if to_uuid:
+                # LIKE indexes of the varchar columns (`<column>_..._like`), of no use for UUIDs
+                for column in table_columns:
+                    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexdef LIKE %s",
+                                   [table, '%({} varchar_pattern_ops)'.format(column)])
+                    for (index,) in cursor.fetchall():
+                        cursor.execute('DROP INDEX "{}"'.format(index))
+
+                # the table and its indexes are rewritten once for all of its columns
+                cursor.execute('ALTER TABLE "{}" {}'.format(table, ', '.join(
+                    'ALTER COLUMN "{0}" TYPE uuid USING "{0}"::uuid'.format(column) for column in table_columns)))
+            else:
+                cursor.execute('ALTER TABLE "{}" {}'.format(table, ', '.join(
+                    'ALTER COLUMN "{0}" TYPE varchar(36) USING replace("{0}"::text, \'-\', \'\')'.format(column)
+                    for column in table_columns)))
+                for column in table_columns:
+                    cursor.execute('CREATE INDEX "{}" ON "{}" ("{}" varchar_pattern_ops)'.format(
+                        schema_editor._create_index_name(table, [column], suffix='_like'), table, column))
+
+        for table, name, definition in foreign_keys:
+            cursor.execute('ALTER TABLE "{}" ADD CONSTRAINT "{}" {}'.format(table, name, definition))
+
+
+def convert_ids_to_uuid(apps, schema_editor):
+    """
+    Converts the varchar(36) ids, and the foreign keys to them, into native 16 byte UUID columns
+
+    Ids are hex strings of UUIDs, which PostgreSQL parses as they are. Every table with an id column is rewritten
+    under an exclusive lock, the conversion should run in a maintenance window on a large database.
+    """
+    _convert_id_columns(apps, schema_editor, to_uuid=True)
+
+
+def convert_ids_to_varchar(apps, schema_editor):
+    _convert_id_columns(apps, schema_editor, to_uuid=False)
+
+
+class Migration(migrations.Migration):
+    # columns of every app are converted at once, the foreign keys being dropped until the columns they reference
+    # are converted. Ids of the models of the authentication and dashboard apps are altered in their state by
+    # their migrations which follow this one.
+
+    dependencies = [
+        ('core', '0017_hot_lookup_indexes'),
+        ('authentication', '0008_hot_lookup_indexes'),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(convert_ids_to_uuid, convert_ids_to_varchar),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='areaseveritylevel',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='citizendiseaserelation',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='citizenhistoriclocationdiseaserelation',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='citizenpushnotifications',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='disease',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='diseaseinfectionstatus',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='mobilenumberwhitelist',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='patienthistoriclocation',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='riskassessmentrecommendation',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='selfscreeningquestion',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+                migrations.AlterField(
+                    model_name='wellnessstatusoutcome',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+            ],
+        ),
+    ]
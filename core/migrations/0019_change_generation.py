@@ -0,0 +1,20 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_native_uuid_primary_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeGeneration',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.0.7 on 2026-10-19 11:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_native_uuid_primary_keys'),
+        ('core', '0019_change_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CitizenExposure',
+            fields=[
+                ('citizen', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='authentication.Citizen')),
+                ('generation', models.BigIntegerField()),
+                ('exposure', models.FloatField()),
+                ('calculated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+# infection statuses were seeded as the string of a dict, the disease APIs store the description
+INFECTION_STATUS_DESCRIPTIONS = ('with symptoms', 'without symptoms')
+
+
+def store_infection_status_descriptions(apps, schema_editor):
+    DiseaseInfectionStatus = apps.get_model('core', 'DiseaseInfectionStatus')
+    for description in INFECTION_STATUS_DESCRIPTIONS:
+        DiseaseInfectionStatus.objects.filter(infection_status=str({"desc": description})).update(
+            infection_status=description)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_citizen_exposure'),
+    ]
+
+    operations = [
+        migrations.RunPython(store_infection_status_descriptions, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,8 @@ from django.db import models
 from django.utils import timezone
 
 from authentication.models import Citizen, Region, FCMPushNotificationRegistrationToken, DataEntryAdminRegion
-from authentication.utils import hex_uuid
+from authentication.utils import hex_uuid, hex_uuid7
+from core.custom_fields import HexUUIDField
 
 
 class Disease(models.Model):
@@ -15,8 +16,7 @@ class Disease(models.Model):
     infection_status - [{"desc": "with symptoms"}, {"desc": "without symptoms"}]
 
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     name = models.CharField(max_length=250, unique=True)
 
     def __str__(self):
@@ -29,8 +29,7 @@ class DiseaseInfectionStatus(models.Model):
 
     For storing all the infection status associated with a disease
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     disease = models.ForeignKey(Disease, on_delete=models.CASCADE)
     infection_status = models.CharField(max_length=250)
 
@@ -43,15 +42,24 @@ class PatientHistoricLocation(models.Model):
     PatientHistoricLocation
 
     For storing historic locations of patients
+
+    Table is range partitioned by recorded date time (see core/partitions.py), the primary key in the
+    database is (id, recorded_date_time).
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    # time ordered ids, rows are appended to the primary key index in insertion order
+    id = HexUUIDField(primary_key=True, default=hex_uuid7, editable=False, unique=True)
     lat = models.FloatField(default=0.0)
     long = models.FloatField(default=0.0)
     recorded_date_time = models.DateTimeField()
     disease_infection_status = models.ForeignKey(
         DiseaseInfectionStatus, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # non expired locations are read newest first, merging the partitions in order
+            models.Index(fields=['recorded_date_time'], name='patient_location_recorded_idx'),
+        ]
+
     @property
     def timestamp(self):
         return str(int(self.recorded_date_time.timestamp()))
@@ -63,8 +71,7 @@ class CitizenDiseaseRelation(models.Model):
 
     For storing disease associated with a citizen and wellness
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     citizen = models.ForeignKey(Citizen, on_delete=models.CASCADE)
     disease = models.ForeignKey(Disease, on_delete=models.CASCADE)
     wellness = models.CharField(max_length=50, default="")
@@ -73,21 +80,41 @@ class CitizenDiseaseRelation(models.Model):
 class CitizenHistoricLocationDiseaseRelation(models.Model):
     """
     For storing historic locations of a citizen
+
+    Consecutive locations within `TRAJECTORY_STAY_RADIUS_IN_METRES` are recorded as a single stay-point,
+    from `recorded_date_time` up to `exit_date_time` (see core/trajectory.py). `exit_date_time` is null for
+    a location observed once.
+
+    Table is range partitioned by recorded date time (see core/partitions.py), the primary key in the
+    database is (id, recorded_date_time).
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    # time ordered ids, rows are appended to the primary key index in insertion order
+    id = HexUUIDField(primary_key=True, default=hex_uuid7, editable=False, unique=True)
     citizen = models.ForeignKey(Citizen, on_delete=models.CASCADE)
     disease = models.ForeignKey(Disease, on_delete=models.CASCADE)
     lat = models.FloatField()
     long = models.FloatField()
     location_name = models.CharField(max_length=250, blank=True, null=True, default="")
     recorded_date_time = models.DateTimeField()
+    exit_date_time = models.DateTimeField(blank=True, null=True)
     added_on = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # locations of a citizen are read within a time window, e.g. the latest location on upload
+            models.Index(fields=['citizen', 'recorded_date_time'], name='citizen_location_recorded_idx'),
+        ]
+
     @property
     def timestamp(self):
         return str(int(self.recorded_date_time.timestamp()))
 
+    @property
+    def exit_timestamp(self):
+        if self.exit_date_time is None:
+            return None
+        return str(int(self.exit_date_time.timestamp()))
+
 
 class AreaSeverityLevel(models.Model):
     """
@@ -105,8 +132,7 @@ class AreaSeverityLevel(models.Model):
     4. Region (foreign key) - Which region the severity level is applicable
     """
 
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     color_code = models.CharField(max_length=12)
     no_of_cases = models.IntegerField(default=1)
     description = models.TextField()
@@ -130,8 +156,7 @@ class RiskAssessmentRecommendation(models.Model):
     4. Point lower limit
 
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     recommendation = models.CharField(max_length=250)
     recommendation_detail = models.TextField()
     point_upper_limit = models.FloatField()
@@ -158,8 +183,7 @@ class SelfScreeningQuestion(models.Model):
     ]
 
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     instruction = models.TextField()
     question = models.TextField()
     choices = JSONField(default=list)
@@ -180,8 +204,7 @@ class WellnessStatusOutcome(models.Model):
     2. Point upper limit
     3. Point lower limit
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     outcome = models.CharField(max_length=80)
     point_upper_limit = models.FloatField()
     point_lower_limit = models.FloatField()
@@ -206,8 +229,8 @@ class CitizenPushNotifications(models.Model):
     2. Hotspot proximity - Triggered when in proximity of `x` metres of hotspot
     3. General announcement
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    # time ordered ids, rows are appended to the primary key index in insertion order
+    id = HexUUIDField(primary_key=True, default=hex_uuid7, editable=False, unique=True)
     type = models.CharField(max_length=50, choices=CITIZEN_PUSH_NOTIFICATION_TYPES)
     title = models.CharField(max_length=100)
     body = models.CharField(max_length=500)
@@ -215,6 +238,12 @@ class CitizenPushNotifications(models.Model):
     citizen = models.ForeignKey(Citizen, on_delete=models.CASCADE)
     added_on = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # notifications of a citizen are read newest first, for listing and for the delay between notifications
+            models.Index(fields=['citizen', '-added_on'], name='citizen_notification_added_idx'),
+        ]
+
 
 class MobileNumberWhitelist(models.Model):
     """
@@ -222,11 +251,38 @@ class MobileNumberWhitelist(models.Model):
 
     For storing all the all citizen mobile numbers that are allowed to login to citizen app using one time password
     """
-    id = models.CharField(primary_key=True, default=hex_uuid,
-                          editable=False, unique=True, max_length=36)
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
     mobile_number = models.CharField(unique=True, max_length=18)
 
 
+class ChangeGeneration(models.Model):
+    """
+    ChangeGeneration
+
+    For storing the generation numbers of the data cached by the worker processes, a generation is incremented
+    every time its data is changed so that all the worker processes can detect the changes
+
+    name - e.g. patient-historic-location
+    """
+    name = models.CharField(primary_key=True, max_length=100)
+    value = models.BigIntegerField(default=0)
+
+
+class CitizenExposure(models.Model):
+    """
+    CitizenExposure
+
+    For storing the risk assessment exposure of the citizens (see citizen/utils.py), an exposure is valid for the
+    generation of the patient historic locations it was calculated from
+
+    generation - value of the patient-historic-location ChangeGeneration
+    """
+    citizen = models.OneToOneField(Citizen, primary_key=True, on_delete=models.CASCADE)
+    generation = models.BigIntegerField()
+    exposure = models.FloatField()
+    calculated_at = models.DateTimeField()
+
+
 # A hack to show models from authentication app under core app in django admin panel
 # Reference - https://stackoverflow.com/questions/10561091/group-models-from-different-app-object-into-one-admin-block
 # proxy models
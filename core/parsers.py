@@ -0,0 +1,138 @@
+import zlib
+
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from core.polyline import decode_locations
+
+GZIP_MAGIC_NUMBER = b'\x1f\x8b'
+
+
+def read_limited(stream, max_size):
+    """
+    Reads the request body, up to `max_size` bytes
+
+    At most a byte more than `max_size` is read, so that a large body is rejected without holding it in memory.
+
+    :param stream:
+    :param max_size:
+    :return:
+    """
+    body = stream.read(max_size + 1)
+
+    if len(body) > max_size:
+        raise ParseError('Request body is larger than {} bytes'.format(max_size))
+
+    return body
+
+
+def read_request_body(stream, max_size):
+    """
+    Reads the request body, decompressing it if it is gzip compressed (either by `Content-Encoding: gzip`
+    or by the content itself)
+
+    Both the body and its decompressed size are limited to `max_size` bytes, to protect against large bodies
+    and compression bombs.
+
+    :param stream:
+    :param max_size:
+    :return:
+    """
+    body = read_limited(stream, max_size)
+
+    if body[:2] != GZIP_MAGIC_NUMBER:
+        return body
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        decompressed = decompressor.decompress(body, max_size + 1)
+    except zlib.error as e:
+        raise ParseError('Gzip decompression error - %s' % str(e))
+
+    if len(decompressed) > max_size:
+        raise ParseError('Decompressed request body is larger than {} bytes'.format(max_size))
+
+    return decompressed
+
+
+class ORJSONParser(BaseParser):
+    """
+    Parses JSON with orjson, a drop-in replacement of the JSONParser, the body is limited to
+    `MAX_DECOMPRESSED_REQUEST_BODY_SIZE` bytes
+    """
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_limited(stream, settings.MAX_DECOMPRESSED_REQUEST_BODY_SIZE)
+
+        try:
+            return orjson.loads(body)
+        except ValueError as e:
+            raise ParseError('JSON parse error - %s' % str(e))
+
+
+class JSONLinesParser(BaseParser):
+    """
+    Parses newline delimited JSON (one JSON document per line, e.g. one location per line) into a list,
+    optionally gzip compressed.
+
+    Empty lines are ignored.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_request_body(stream, settings.MAX_DECOMPRESSED_REQUEST_BODY_SIZE)
+
+        try:
+            return [orjson.loads(line) for line in body.splitlines() if line.strip()]
+        except ValueError as e:
+            raise ParseError('JSON lines parse error - %s' % str(e))
+
+
+class GzipJSONParser(BaseParser):
+    """
+    Parses gzip compressed JSON, sent with `Content-Type: application/json` and `Content-Encoding: gzip`
+    """
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_request_body(stream, settings.MAX_DECOMPRESSED_REQUEST_BODY_SIZE)
+
+        try:
+            return orjson.loads(body)
+        except ValueError as e:
+            raise ParseError('JSON parse error - %s' % str(e))
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack, sent with `Content-Type: application/msgpack`, optionally gzip compressed
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_request_body(stream, settings.MAX_DECOMPRESSED_REQUEST_BODY_SIZE)
+
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as e:
+            raise ParseError('MessagePack parse error - %s' % str(e))
+
+
+class PolylineJSONParser(BaseParser):
+    """
+    Parses JSON with lists of locations encoded as polylines (see core/polyline.py), sent with
+    `Content-Type: application/vnd.polyline+json`, optionally gzip compressed
+    """
+    media_type = 'application/vnd.polyline+json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_request_body(stream, settings.MAX_DECOMPRESSED_REQUEST_BODY_SIZE)
+
+        try:
+            return decode_locations(orjson.loads(body))
+        except ValueError as e:
+            raise ParseError('Polyline JSON parse error - %s' % str(e))
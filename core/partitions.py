@@ -0,0 +1,290 @@
+import re
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Tables range partitioned by the recorded date time, see core/migrations/0015_partition_historic_locations.py
+HISTORIC_LOCATION_PARTITIONED_TABLES = (
+    ('core_patienthistoriclocation', 'recorded_date_time'),
+    ('core_citizenhistoriclocationdiseaserelation', 'recorded_date_time'),
+)
+
+PARTITION_INTERVALS = ('day', 'week')
+
+PARTITION_BOUND_REGEX = re.compile(r"FOR VALUES FROM \('(?P<start>[^']+)'\) TO \('(?P<end>[^']+)'\)")
+
+
+def get_partition_start(date_time, interval):
+    """
+    Returns the start of the partition (UTC midnight of the day, or of the monday of the week) containing
+    the datetime
+
+    :param date_time:
+    :param interval: 'day' or 'week'
+    :return:
+    """
+    if interval not in PARTITION_INTERVALS:
+        raise ValueError("Partition interval should be one of {}".format(PARTITION_INTERVALS))
+
+    start = date_time.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def get_partition_end(start, interval):
+    return start + timedelta(days=1 if interval == 'day' else 7)
+
+
+def get_partition_name(table, start):
+    return "{}_p{}".format(table, start.strftime('%Y%m%d'))
+
+
+def get_default_partition_name(table):
+    return "{}_default".format(table)
+
+
+def _parse_timestamp(value):
+    # e.g. '2020-06-01 00:00:00+00'
+    return datetime.strptime(value + ('00' if re.search(r'[+-]\d\d$', value) else ''), '%Y-%m-%d %H:%M:%S%z')
+
+
+def get_partitions(cursor, table):
+    """
+    Returns the range partitions of a table as a list of (name, start, end), ordered by start.
+    Default partition is not included.
+
+    :param cursor:
+    :param table:
+    :return:
+    """
+    cursor.execute("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+            JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+            JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = %s
+    """, [table])
+
+    partitions = []
+    for name, bound in cursor.fetchall():
+        match = PARTITION_BOUND_REGEX.search(bound)
+        if match:
+            partitions.append((name, _parse_timestamp(match.group('start')), _parse_timestamp(match.group('end'))))
+
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+    return cursor.fetchone() is not None
+
+
+def create_partition(cursor, table, column, start, end):
+    """
+    Creates a partition of the table for [start, end)
+
+    Rows of the range are moved out of the default partition, since a partition can not be attached
+    while the default partition contains rows of its range.
+
+    :param cursor:
+    :param table:
+    :param column:
+    :param start:
+    :param end:
+    :return:
+    """
+    name = get_partition_name(table, start)
+    default_name = get_default_partition_name(table)
+
+    with transaction.atomic():
+        cursor.execute('CREATE TABLE "{}" (LIKE "{}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(name, table))
+        cursor.execute(
+            'WITH moved AS (DELETE FROM "{default}" WHERE "{column}" >= %s AND "{column}" < %s RETURNING *) '
+            'INSERT INTO "{name}" SELECT * FROM moved'.format(default=default_name, column=column, name=name),
+            [start, end])
+        cursor.execute('ALTER TABLE "{}" ATTACH PARTITION "{}" FOR VALUES FROM (%s) TO (%s)'.format(table, name),
+                       [start, end])
+
+    return name
+
+
+def create_partitions(cursor, table, column, start, end, interval):
+    """
+    Creates the missing partitions of the table covering [start, end)
+
+    Returns names of the created partitions
+
+    :param cursor:
+    :param table:
+    :param column:
+    :param start:
+    :param end:
+    :param interval:
+    :return:
+    """
+    existing_partitions = get_partitions(cursor, table)
+
+    created = []
+    partition_start = get_partition_start(start, interval)
+    while partition_start < end:
+        partition_end = get_partition_end(partition_start, interval)
+
+        # skipping the ranges overlapping with existing partitions, e.g. after changing the interval
+        if not any(existing_start < partition_end and partition_start < existing_end
+                   for _, existing_start, existing_end in existing_partitions):
+            created.append(create_partition(cursor, table, column, partition_start, partition_end))
+
+        partition_start = partition_end
+
+    return created
+
+
+def drop_expired_partitions(cursor, table, column, expired_before):
+    """
+    Drops the partitions containing only rows recorded before `expired_before`, expired rows that ended up in the
+    default partition are deleted.
+
+    Returns names of the dropped partitions
+
+    :param cursor:
+    :param table:
+    :param column:
+    :param expired_before:
+    :return:
+    """
+    dropped = []
+    for name, _, end in get_partitions(cursor, table):
+        if end <= expired_before:
+            with transaction.atomic():
+                cursor.execute('ALTER TABLE "{}" DETACH PARTITION "{}"'.format(table, name))
+                cursor.execute('DROP TABLE "{}"'.format(name))
+            dropped.append(name)
+
+    cursor.execute('DELETE FROM "{}" WHERE "{}" < %s'.format(get_default_partition_name(table), column),
+                   [expired_before])
+
+    return dropped
+
+
+def maintain_partitions(table, column, interval, premake, expiry_in_seconds, now=None):
+    """
+    Creates the partitions from the expiry up to `premake` intervals ahead and drops the expired partitions
+
+    Returns a tuple of created and dropped partition names
+
+    :param table:
+    :param column:
+    :param interval:
+    :param premake:
+    :param expiry_in_seconds:
+    :param now:
+    :return:
+    """
+    now = now or timezone.now()
+    expired_before = now - timedelta(seconds=expiry_in_seconds)
+
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return [], []
+
+        end = get_partition_start(now, interval)
+        for _ in range(premake + 1):
+            end = get_partition_end(end, interval)
+
+        created = create_partitions(cursor, table, column, expired_before, end, interval)
+        dropped = drop_expired_partitions(cursor, table, column, expired_before)
+
+    return created, dropped
+
+
+def _get_table_definition(cursor, table):
+    """
+    Returns the index definitions and foreign key constraints of a table, except the primary key
+
+    :param cursor:
+    :param table:
+    :return:
+    """
+    cursor.execute("""
+        SELECT indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname NOT IN (
+            SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p')
+    """, [table, table])
+    index_definitions = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f'
+    """, [table])
+    foreign_keys = cursor.fetchall()
+
+    return index_definitions, foreign_keys
+
+
+def _rebuild_table(cursor, table, partition_by):
+    index_definitions, foreign_keys = _get_table_definition(cursor, table)
+    old_table = "{}_old".format(table)
+
+    cursor.execute('ALTER TABLE "{}" RENAME TO "{}"'.format(table, old_table))
+    cursor.execute('CREATE TABLE "{}" (LIKE "{}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) {}'.format(
+        table, old_table, partition_by))
+
+    return old_table, index_definitions, foreign_keys
+
+
+def _finish_table(cursor, table, old_table, index_definitions, foreign_keys, primary_key):
+    cursor.execute('DROP TABLE "{}"'.format(old_table))
+
+    cursor.execute('ALTER TABLE "{}" ADD CONSTRAINT "{}_pkey" PRIMARY KEY ({})'.format(
+        table, table, ', '.join('"{}"'.format(column) for column in primary_key)))
+    for index_definition in index_definitions:
+        cursor.execute(index_definition)
+    for name, definition in foreign_keys:
+        cursor.execute('ALTER TABLE "{}" ADD CONSTRAINT "{}" {}'.format(table, name, definition))
+
+
+def convert_to_partitioned_table(cursor, table, column, interval, days_before, days_after):
+    """
+    Replaces a table with a table range partitioned by the column, keeping its rows, indexes and foreign keys
+
+    Primary key of a partitioned table has to include the partition column, hence it becomes (id, column).
+    Partitions are created from `days_before` up to `days_after` days from now, rows outside of them are
+    stored in the default partition.
+
+    :param cursor:
+    :param table:
+    :param column:
+    :param interval:
+    :param days_before:
+    :param days_after:
+    :return:
+    """
+    old_table, index_definitions, foreign_keys = _rebuild_table(
+        cursor, table, 'PARTITION BY RANGE ("{}")'.format(column))
+
+    cursor.execute('CREATE TABLE "{}" PARTITION OF "{}" DEFAULT'.format(get_default_partition_name(table), table))
+
+    now = timezone.now()
+    create_partitions(cursor, table, column, now - timedelta(days=days_before), now + timedelta(days=days_after),
+                      interval)
+
+    cursor.execute('INSERT INTO "{}" SELECT * FROM "{}"'.format(table, old_table))
+
+    _finish_table(cursor, table, old_table, index_definitions, foreign_keys, ('id', column))
+
+
+def convert_to_regular_table(cursor, table):
+    """
+    Replaces a partitioned table with a regular table, keeping its rows, indexes and foreign keys
+
+    :param cursor:
+    :param table:
+    :return:
+    """
+    old_table, index_definitions, foreign_keys = _rebuild_table(cursor, table, '')
+
+    cursor.execute('INSERT INTO "{}" SELECT * FROM "{}"'.format(table, old_table))
+
+    _finish_table(cursor, table, old_table, index_definitions, foreign_keys, ('id',))
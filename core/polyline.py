@@ -0,0 +1,225 @@
+# Reference - https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+
+# Maximum decimal places accepted in a polyline payload, beyond floating point precision of coordinates
+MAX_PRECISION = 10
+
+
+def _encode_value(value, chunks):
+    value = ~(value << 1) if value < 0 else value << 1
+
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def _decode_values(encoded):
+    """
+    Decodes a string of encoded signed integers
+
+    :param encoded:
+    :return:
+    """
+    values = []
+    value = 0
+    shift = 0
+    for character in encoded:
+        chunk = ord(character) - 63
+        if chunk < 0 or chunk > 0x3f:
+            raise ValueError("Invalid polyline character '{}'".format(character))
+
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = 0
+            shift = 0
+
+    if shift:
+        raise ValueError("Polyline is truncated")
+
+    return values
+
+
+def encode_integers(values):
+    """
+    Encodes a list of integers as deltas from the previous integer, e.g. timestamps
+
+    :param values:
+    :return:
+    """
+    chunks = []
+    previous = 0
+    for value in values:
+        _encode_value(value - previous, chunks)
+        previous = value
+
+    return ''.join(chunks)
+
+
+def decode_integers(encoded):
+    """
+    Decodes a list of integers encoded with `encode_integers`
+
+    :param encoded:
+    :return:
+    """
+    values = []
+    previous = 0
+    for delta in _decode_values(encoded):
+        previous += delta
+        values.append(previous)
+
+    return values
+
+
+def encode_polyline(coordinates, precision=5):
+    """
+    Encodes a list of (lat, long) with Google encoded polyline algorithm
+
+    Coordinates are rounded to `precision` decimal places, 5 decimal places is ~1 metre.
+
+    :param coordinates: list of (lat, long)
+    :param precision:
+    :return:
+    """
+    factor = 10 ** precision
+
+    chunks = []
+    previous_lat = previous_long = 0
+    for lat, long in coordinates:
+        lat, long = int(round(lat * factor)), int(round(long * factor))
+        _encode_value(lat - previous_lat, chunks)
+        _encode_value(long - previous_long, chunks)
+        previous_lat, previous_long = lat, long
+
+    return ''.join(chunks)
+
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decodes a polyline encoded with Google encoded polyline algorithm into a list of (lat, long)
+
+    :param encoded:
+    :param precision:
+    :return:
+    """
+    values = _decode_values(encoded)
+    if len(values) % 2:
+        raise ValueError("Polyline has an odd number of values")
+
+    factor = 10 ** precision
+
+    coordinates = []
+    lat = long = 0
+    for i in range(0, len(values), 2):
+        lat += values[i]
+        long += values[i + 1]
+        coordinates.append((lat / factor, long / factor))
+
+    return coordinates
+
+
+def _is_location_list(value):
+    return isinstance(value, list) and len(value) > 0 and all(
+        isinstance(item, dict) and isinstance(item.get('lat'), (int, float)) and
+        isinstance(item.get('long'), (int, float)) for item in value)
+
+
+def _is_integer_timestamp(timestamp):
+    return (isinstance(timestamp, int) and not isinstance(timestamp, bool)) or (
+        isinstance(timestamp, str) and timestamp.isdigit())
+
+
+def encode_locations(data, precision=5):
+    """
+    Replaces every list of locations (dicts with `lat` and `long`) in the data with a columnar object
+
+        {
+            "polyline": lat and long encoded as a polyline,
+            "precision": decimal places of the polyline,
+            "timestamps": integer timestamps encoded as deltas (if every location has one),
+            "columns": {"<field>": [value of every location], ...} for the rest of the fields
+        }
+
+    :param data:
+    :param precision:
+    :return:
+    """
+    if _is_location_list(data):
+        encoded = {
+            "polyline": encode_polyline([(location['lat'], location['long']) for location in data], precision),
+            "precision": precision
+        }
+
+        fields = []
+        for location in data:
+            for field in location:
+                if field not in ('lat', 'long') and field not in fields:
+                    fields.append(field)
+
+        if 'timestamp' in fields and all(_is_integer_timestamp(location.get('timestamp')) for location in data):
+            encoded['timestamps'] = encode_integers([int(location['timestamp']) for location in data])
+            fields.remove('timestamp')
+
+        if fields:
+            encoded['columns'] = {field: [location.get(field) for location in data] for field in fields}
+
+        return encoded
+
+    if isinstance(data, dict):
+        return {key: encode_locations(value, precision) for key, value in data.items()}
+
+    if isinstance(data, list):
+        return [encode_locations(item, precision) for item in data]
+
+    return data
+
+
+def decode_locations(data):
+    """
+    Replaces every columnar object encoded with `encode_locations` in the data with the list of locations,
+    timestamps are decoded as strings
+
+    :param data:
+    :return:
+    """
+    if isinstance(data, dict) and isinstance(data.get('polyline'), str) and \
+            set(data).issubset({'polyline', 'precision', 'timestamps', 'columns'}):
+        precision = data.get('precision', 5)
+        if not isinstance(precision, int) or not 0 <= precision <= MAX_PRECISION:
+            raise ValueError("Polyline precision should be an integer between 0 and {}".format(MAX_PRECISION))
+
+        columns = data.get('columns', {})
+        if not isinstance(columns, dict):
+            raise ValueError("Polyline columns should be an object")
+
+        coordinates = decode_polyline(data['polyline'], precision)
+        locations = [{"lat": lat, "long": long} for lat, long in coordinates]
+
+        if 'timestamps' in data:
+            if not isinstance(data['timestamps'], str):
+                raise ValueError("Polyline timestamps should be a string")
+
+            timestamps = decode_integers(data['timestamps'])
+            if len(timestamps) != len(locations):
+                raise ValueError("Number of timestamps does not match the number of locations")
+            for location, timestamp in zip(locations, timestamps):
+                location['timestamp'] = str(timestamp)
+
+        for field, values in columns.items():
+            if not isinstance(values, list) or len(values) != len(locations):
+                raise ValueError("Number of '{}' values does not match the number of locations".format(field))
+            for location, value in zip(locations, values):
+                location[field] = value
+
+        return locations
+
+    if isinstance(data, dict):
+        return {key: decode_locations(value) for key, value in data.items()}
+
+    if isinstance(data, list):
+        return [decode_locations(item) for item in data]
+
+    return data
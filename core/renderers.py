@@ -0,0 +1,65 @@
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.instrumentation import timed
+from core.polyline import encode_locations
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renders the response as JSON with orjson, in place of the JSONRenderer
+
+    UUID is serialized natively by orjson, datetime, date, time, Decimal and the rest of the values are converted
+    by the encoder of JSONRenderer, so that they are formatted exactly the same.
+
+    Differences from the JSONRenderer,
+        - NaN and Infinity are rendered as null, where the JSONRenderer raises an error
+        - indented output (e.g. `Accept: application/json; indent=4`) is always indented with 2 spaces
+    """
+
+    @timed('render')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=JSONEncoder().default, option=option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders the response as MessagePack, requested with `Accept: application/msgpack`
+
+    Values which are not natively supported by MessagePack (datetime, Decimal, UUID e.t.c) are converted
+    the same way as in JSON responses.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    @timed('render')
+    def render(self, data, media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, use_bin_type=True, default=JSONEncoder().default)
+
+
+class PolylineJSONRenderer(ORJSONRenderer):
+    """
+    Renders the response as JSON with lists of locations encoded as polylines, requested with
+    `Accept: application/vnd.polyline+json` (see core/polyline.py)
+    """
+    media_type = 'application/vnd.polyline+json'
+    format = 'polyline'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(encode_locations(data, settings.POLYLINE_PRECISION), accepted_media_type,
+                              renderer_context)
@@ -0,0 +1,134 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, DatabaseError, DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+# pins are kept in a cache of their own (see CACHES in settings), which never evicts them for other entries
+REPLICA_PIN_CACHE_ALIAS = 'replica_pins'
+REPLICA_PIN_CACHE_KEY = 'replica-pin:{user_id}'
+
+# routing state of the request being served by the thread
+_routing = threading.local()
+
+# replica is not used until below timestamp after a failure, shared by the threads of the process
+_replica_unavailable_until = 0.0
+
+
+def is_replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def start_replica_reads():
+    """
+    Sends the reads of the current thread to the replica, until `stop_replica_reads` is called
+
+    :return:
+    """
+    _routing.read_from_replica = True
+    _routing.replica_used = False
+
+
+def stop_replica_reads():
+    """
+    Sends the reads of the current thread back to the primary
+
+    :return: True if any read was sent to the replica
+    """
+    replica_used = getattr(_routing, 'replica_used', False)
+    _routing.read_from_replica = False
+    _routing.replica_used = False
+    return replica_used
+
+
+def reset_writes():
+    _routing.wrote = False
+
+
+def has_written():
+    """
+    Returns True if the current thread has written to the primary since `reset_writes`
+
+    :return:
+    """
+    return getattr(_routing, 'wrote', False)
+
+
+def pin_to_primary(user_id):
+    """
+    Sends the replica reads of the user to the primary for `DATABASE_REPLICA_PIN_IN_SECONDS`, so that the
+    user reads their own writes while the replica catches up
+
+    :param user_id:
+    :return:
+    """
+    caches[REPLICA_PIN_CACHE_ALIAS].set(REPLICA_PIN_CACHE_KEY.format(user_id=user_id), True,
+                                        timeout=settings.DATABASE_REPLICA_PIN_IN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return caches[REPLICA_PIN_CACHE_ALIAS].get(REPLICA_PIN_CACHE_KEY.format(user_id=user_id), False)
+
+
+def mark_replica_unavailable():
+    """
+    Stops using the replica for `DATABASE_REPLICA_RETRY_IN_SECONDS`, reads fall back to the primary
+
+    :return:
+    """
+    global _replica_unavailable_until
+
+    _replica_unavailable_until = time.monotonic() + settings.DATABASE_REPLICA_RETRY_IN_SECONDS
+    connections[REPLICA_DB_ALIAS].close()
+    settings.LOGGER_ERROR.error("Replica database is unavailable, reading from the primary for {} seconds".format(
+        settings.DATABASE_REPLICA_RETRY_IN_SECONDS))
+
+
+def _is_replica_available():
+    if time.monotonic() < _replica_unavailable_until:
+        return False
+
+    try:
+        connections[REPLICA_DB_ALIAS].ensure_connection()
+    except DatabaseError:
+        mark_replica_unavailable()
+        return False
+
+    return True
+
+
+class ReplicaRouter(object):
+    """
+    ReplicaRouter
+
+    Sends the reads of the views with `core.views.ReplicaReadMixin` to the `replica` database, when it is
+    configured. Every other read and all writes go to the primary (default) database.
+
+    Reads go to the primary instead,
+        - once the thread has written in the current request (read-your-writes within a request)
+        - inside a transaction on the primary
+        - while the replica is unavailable
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_routing, 'read_from_replica', False) or has_written() or not is_replica_configured():
+            return DEFAULT_DB_ALIAS
+
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or not _is_replica_available():
+            return DEFAULT_DB_ALIAS
+
+        _routing.replica_used = True
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica is a copy of the primary
+        if {obj1._state.db, obj2._state.db}.issubset({DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}):
+            return True
+        return None
@@ -0,0 +1,168 @@
+"""
+Reference data of the system (diseases, risk assessment recommendations, wellness status outcomes) and super admins,
+seeded by initdb.py and the generate_dataset command
+
+Seeding is idempotent and never changes existing rows, so that it can be run on every deploy without reverting the rows
+edited by the admins. Missing diseases and infection statuses are bulk created, the risk assessment recommendations
+and wellness status outcomes, which the admins manage, are seeded only into empty tables.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from authentication.models import User
+from core.models import Disease, DiseaseInfectionStatus, RiskAssessmentRecommendation, WellnessStatusOutcome
+
+DISEASES = [
+    {"name": "COVID-19", "infection_status": [{"desc": "with symptoms"}, {"desc": "without symptoms"}]},
+    {"name": "SARS", "infection_status": [{"desc": "with symptoms"}, {"desc": "without symptoms"}]},
+    {"name": "Ebola", "infection_status": [{"desc": "with symptoms"}, {"desc": "without symptoms"}]},
+    {"name": "Smallpox", "infection_status": [{"desc": "with symptoms"}, {"desc": "without symptoms"}]},
+    {"name": "Influenza", "infection_status": [{"desc": "with symptoms"}, {"desc": "without symptoms"}]},
+    {"name": "Yellow fever", "infection_status": [{"desc": "with symptoms"}, {"desc": "without symptoms"}]},
+    {"name": "Spanish flu", "infection_status": [{"desc": "with symptoms"}, {"desc": "without symptoms"}]}
+]
+
+RISK_ASSESSMENT_RECOMMENDATIONS = [
+    {
+        "recommendation": "Stay cautious as this is a serious pandemic",
+        "upper_limit": 2,
+        "lower_limit": 1,
+        "recommendation_detail": "Based on your health profile and based on your contact tracing record, you are perceived to have low risk of being infected. We recommend you to stay cautious as this is a serious pandemic."
+    },
+    {
+        "recommendation": "Stay at home with limited movements",
+        "upper_limit": 4.9,
+        "lower_limit": 2.1,
+        "recommendation_detail": "Based on your health profile and based on your contact tracing record, you are perceived to have low risk of being infected. We recommend you to stay at home with limited movements."
+    },
+    {
+        "recommendation": "Self Quarantine",
+        "upper_limit": 6.9,
+        "lower_limit": 5,
+        "recommendation_detail": "Based on your health profile and based on your contact tracing record, you are perceived to be at risk of infected. We recommend you to stay indoor and self quarantine."
+    },
+    {
+        "recommendation": "Get yourself tested",
+        "upper_limit": 8.9,
+        "lower_limit": 7,
+        "recommendation_detail": "Based on your health profile and based on your contact tracing record, you are perceived to be at higher risk of infected. We recommend you to get tested."
+    },
+    {
+        "recommendation": "Stay in isolation as you are positive",
+        "upper_limit": 10,
+        "lower_limit": 9,
+        "recommendation_detail": "Based on your health profile and based on your contact tracing record, you are perceived to be infected. We recommend you to stay isolated."
+    }
+]
+
+WELLNESS_STATUS_OUTCOMES = [
+    {"outcome": "Healthy", "upper_limit": 50, "lower_limit": 0.1},
+    {"outcome": "Healthy, but susceptible", "upper_limit": 100, "lower_limit": 50}
+]
+
+
+def _create_missing(model, key_fields, rows):
+    """
+    Bulk creates the rows missing from the table, rows are matched by the (case insensitive) values of the key fields
+    and the existing rows are left as they are
+
+    Returns the number of created rows
+
+    :param model:
+    :param key_fields: fields identifying a row, e.g. ('name',)
+    :param rows: list of dicts of field values
+    :return:
+    """
+
+    def get_key(values):
+        return tuple(str(values[field]).lower() for field in key_fields)
+
+    existing = {get_key(values) for values in model.objects.values(*key_fields)}
+
+    to_create = [model(**row) for row in rows if get_key(row) not in existing]
+    model.objects.bulk_create(to_create)
+
+    return len(to_create)
+
+
+def _create_if_empty(model, rows):
+    """
+    Bulk creates the rows if the table is empty, for the tables managed by the admins, whose rows may be renamed or
+    deleted
+
+    Returns the number of created rows
+
+    :param model:
+    :param rows: list of dicts of field values
+    :return:
+    """
+    if model.objects.exists():
+        return 0
+
+    model.objects.bulk_create([model(**row) for row in rows])
+    return len(rows)
+
+
+@transaction.atomic
+def seed_reference_data():
+    """
+    Seeds the diseases with their infection statuses, the risk assessment recommendations and the wellness
+    status outcomes
+
+    Returns the number of created rows by model name
+
+    :return:
+    """
+    seeded = {"Disease": _create_missing(Disease, ('name',), [{"name": disease["name"]} for disease in DISEASES])}
+
+    diseases = {disease.name.lower(): disease for disease in Disease.objects.all()}
+    seeded["DiseaseInfectionStatus"] = _create_missing(DiseaseInfectionStatus, ('disease_id', 'infection_status'), [
+        {"disease_id": diseases[disease["name"].lower()].id, "infection_status": infection_status["desc"]}
+        for disease in DISEASES for infection_status in disease["infection_status"]])
+
+    # recommendations and outcomes are edited by the admins, they are seeded only once
+    seeded["RiskAssessmentRecommendation"] = _create_if_empty(RiskAssessmentRecommendation, [
+        {"recommendation": recommendation["recommendation"],
+         "recommendation_detail": recommendation["recommendation_detail"],
+         "point_upper_limit": recommendation["upper_limit"],
+         "point_lower_limit": recommendation["lower_limit"]}
+        for recommendation in RISK_ASSESSMENT_RECOMMENDATIONS])
+
+    seeded["WellnessStatusOutcome"] = _create_if_empty(WellnessStatusOutcome, [
+        {"outcome": outcome["outcome"],
+         "point_upper_limit": outcome["upper_limit"],
+         "point_lower_limit": outcome["lower_limit"]}
+        for outcome in WELLNESS_STATUS_OUTCOMES])
+
+    return seeded
+
+
+def seed_super_admins():
+    """
+    Creates the super admins of `SUPER_ADMINS` setting which do not exist
+
+    Returns the emails of the created super admins
+
+    :return:
+    """
+    super_admins = settings.SUPER_ADMINS
+    if not isinstance(super_admins, list):
+        raise TypeError("SUPER_ADMINS configuration must be a list of super admin user dicts!")
+
+    created = []
+    for super_admin in super_admins:
+        if not isinstance(super_admin, dict):
+            raise TypeError("SUPER_ADMINS configuration must be a list of super admin user dicts!")
+
+        if not ('USERNAME' in super_admin and 'EMAIL' in super_admin and 'PASSWORD' in super_admin):
+            raise TypeError("SUPER_ADMINS configuration must be a list of super admin user dicts!")
+
+        if not User.objects.filter(Q(username=super_admin['USERNAME']) | Q(email=super_admin['EMAIL']) | Q(
+                username=super_admin['EMAIL'])).exists():
+            User.objects.create_superuser(username=super_admin['EMAIL'],
+                                          email=super_admin['EMAIL'],
+                                          password=super_admin['PASSWORD'])
+            created.append(super_admin['EMAIL'])
+
+    return created
@@ -0,0 +1,255 @@
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from haversine import haversine, Unit
+
+from core.models import PatientHistoricLocation, ChangeGeneration
+
+METRES_PER_DEGREE_LATITUDE = 111320.0
+
+PATIENT_HISTORIC_LOCATION_GENERATION = 'patient-historic-location'
+
+
+class SpatioTemporalIndex(object):
+    """
+    SpatioTemporalIndex
+
+    Grid hash index over (lat, long, timestamp) points, for finding the points within `x` metres and
+    `y` seconds of a location without scanning all the points.
+
+    Points are bucketed into cells of a (lat, long, time) grid, the spatial sides of a cell are at least the
+    proximity radius and the time side is the time window. Since a degree of longitude shrinks towards the poles,
+    each latitude row of the grid has its own cell width along the longitude axis.
+
+    A lookup first checks whether any point exists in the spatial neighbourhood of the location's cell, then
+    whether any of those is recorded during the time range (a few set lookups, which rejects most of the locations),
+    and only then visits the neighbouring cells.
+    """
+
+    def __init__(self, radius_in_metres, time_window_in_seconds):
+        self.radius_in_metres = float(radius_in_metres)
+        self.time_window_in_seconds = float(time_window_in_seconds)
+        self.cell_size = self.radius_in_metres / METRES_PER_DEGREE_LATITUDE
+        self.size = 0
+
+        self._cells = {}
+        self._cell_widths = {}
+        self._spatial_neighbourhood = set()
+        self._neighbourhood = set()
+        self._is_prepared = True
+
+    def _get_cell_width(self, lat_index):
+        """
+        Returns the cell width in degrees of longitude for a latitude row.
+
+        Width is calculated at one row beyond the pole ward edge of the row, so that it covers the proximity radius
+        for locations in the adjacent rows as well.
+
+        :param lat_index:
+        :return:
+        """
+        cell_width = self._cell_widths.get(lat_index)
+        if cell_width is None:
+            pole_ward_edge = max(abs(lat_index), abs(lat_index + 1)) * self.cell_size
+            cell_width = self.cell_size / math.cos(math.radians(min(pole_ward_edge + self.cell_size, 89.0)))
+            self._cell_widths[lat_index] = cell_width
+        return cell_width
+
+    def _get_time_bucket(self, timestamp):
+        return int(timestamp // self.time_window_in_seconds)
+
+    def add(self, lat, long, timestamp, payload=None):
+        """
+        Adds a point to the index
+
+        :param lat:
+        :param long:
+        :param timestamp: UTC timestamp in seconds
+        :param payload: Any value to be returned along with the point on lookups
+        :return:
+        """
+        lat_index = int(lat // self.cell_size)
+        long_index = int(long // self._get_cell_width(lat_index))
+
+        self._cells.setdefault((lat_index, long_index, self._get_time_bucket(timestamp)), []).append(
+            (timestamp, lat, long, payload))
+        self._is_prepared = False
+        self.size += 1
+
+    def _prepare(self):
+        if self._is_prepared:
+            return
+
+        self._spatial_neighbourhood = set()
+        self._neighbourhood = set()
+        for lat_index, long_index, time_bucket in self._cells.keys():
+
+            # longitudes from which a lookup visits this cell
+            cell_width = self._get_cell_width(lat_index)
+            west_edge = (long_index - 1) * cell_width
+            east_edge = (long_index + 2) * cell_width
+
+            # cells in the adjacent rows covering those longitudes
+            for i in range(lat_index - 1, lat_index + 2):
+                adjacent_cell_width = self._get_cell_width(i)
+                for j in range(int(west_edge // adjacent_cell_width), int(east_edge // adjacent_cell_width) + 1):
+                    self._spatial_neighbourhood.add((i, j))
+                    self._neighbourhood.add((i, j, time_bucket))
+
+        self._is_prepared = True
+
+    def is_empty(self):
+        return self.size == 0
+
+    def query(self, lat, long, start_timestamp, end_timestamp):
+        """
+        Yields (distance in metres, point) for all the points within proximity radius of the given location
+        that are recorded between start and end timestamp.
+
+        Point is a tuple of (timestamp, lat, long, payload)
+
+        :param lat:
+        :param long:
+        :param start_timestamp:
+        :param end_timestamp:
+        :return:
+        """
+        self._prepare()
+
+        lat_index = int(lat // self.cell_size)
+        long_index = int(long // self._get_cell_width(lat_index))
+
+        # rejecting locations without any point nearby, irrespective of time
+        if (lat_index, long_index) not in self._spatial_neighbourhood:
+            return
+
+        time_buckets = [time_bucket for time_bucket in range(self._get_time_bucket(start_timestamp),
+                                                             self._get_time_bucket(end_timestamp) + 1)
+                        if (lat_index, long_index, time_bucket) in self._neighbourhood]
+        if not time_buckets:
+            return
+
+        cells = self._cells
+        radius_in_metres = self.radius_in_metres
+        for i in range(lat_index - 1, lat_index + 2):
+            adjacent_long_index = int(long // self._get_cell_width(i))
+            for j in range(adjacent_long_index - 1, adjacent_long_index + 2):
+                for time_bucket in time_buckets:
+                    points = cells.get((i, j, time_bucket))
+                    if points is None:
+                        continue
+
+                    for point in points:
+                        if start_timestamp <= point[0] <= end_timestamp:
+                            distance = haversine((lat, long), (point[1], point[2]), unit=Unit.METERS)
+                            if distance <= radius_in_metres:
+                                yield distance, point
+
+    def has_match(self, lat, long, start_timestamp, end_timestamp):
+        """
+        Checks if there is at least one point within proximity radius and time range of the given location
+
+        :param lat:
+        :param long:
+        :param start_timestamp:
+        :param end_timestamp:
+        :return:
+        """
+        for _ in self.query(lat, long, start_timestamp, end_timestamp):
+            return True
+        return False
+
+
+def get_patient_historic_location_generation():
+    """
+    Returns the generation number of patient historic locations, it is incremented every time patient
+    historic locations are added, updated or deleted.
+
+    Generation is kept in the database so that all the worker processes can detect the changes, and it is never
+    evicted or reset like a cache entry.
+
+    :return:
+    """
+    generation = ChangeGeneration.objects.filter(name=PATIENT_HISTORIC_LOCATION_GENERATION).values_list(
+        'value', flat=True).first()
+    return generation or 0
+
+
+def bump_patient_historic_location_generation():
+    """
+    Marks the patient historic locations as changed, invalidating the cached patient location indexes
+    and risk assessment scores
+
+    Generation is incremented by the database, so concurrent bumps from different processes are never lost.
+
+    :return:
+    """
+    ChangeGeneration.objects.get_or_create(name=PATIENT_HISTORIC_LOCATION_GENERATION)
+    ChangeGeneration.objects.filter(name=PATIENT_HISTORIC_LOCATION_GENERATION).update(value=F('value') + 1)
+
+
+def build_patient_historic_location_index(radius_in_metres, time_window_in_seconds):
+    """
+    Builds spatio temporal index over all non expired patient historic locations
+
+    :param radius_in_metres:
+    :param time_window_in_seconds:
+    :return:
+    """
+    index = SpatioTemporalIndex(radius_in_metres, time_window_in_seconds)
+
+    patient_historic_locations = PatientHistoricLocation.objects.filter(
+        recorded_date_time__gte=timezone.now() - timedelta(
+            seconds=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS)).values_list('id', 'lat', 'long',
+                                                                               'recorded_date_time')
+
+    for historic_location_id, lat, long, recorded_date_time in patient_historic_locations.iterator():
+        index.add(lat, long, recorded_date_time.timestamp(), historic_location_id)
+
+    return index
+
+
+# Patient historic location indexes cached per worker process, by time window
+_patient_historic_location_indexes = {}
+_patient_historic_location_index_lock = threading.Lock()
+
+
+def get_patient_historic_location_index(time_window_in_seconds=None):
+    """
+    Returns the spatio temporal index over non expired patient historic locations using hotspot proximity
+    as radius. Time window defaults to the risk assessment time window.
+
+    Index is rebuilt when patient historic locations change or when it is older than
+    `PATIENT_HISTORIC_LOCATION_INDEX_TTL_IN_SECONDS`, so that expired locations are dropped.
+
+    :param time_window_in_seconds:
+    :return:
+    """
+    time_window_in_seconds = time_window_in_seconds or settings.RISK_ASSESSMENT_TIME_WINDOW_IN_SECONDS
+
+    generation = get_patient_historic_location_generation()
+    cached = _patient_historic_location_indexes.get(time_window_in_seconds)
+
+    if cached is not None and cached['generation'] == generation and \
+            time.monotonic() - cached['built_at'] < settings.PATIENT_HISTORIC_LOCATION_INDEX_TTL_IN_SECONDS:
+        return cached['index']
+
+    with _patient_historic_location_index_lock:
+        cached = _patient_historic_location_indexes.get(time_window_in_seconds)
+        if cached is not None and cached['generation'] == generation and \
+                time.monotonic() - cached['built_at'] < settings.PATIENT_HISTORIC_LOCATION_INDEX_TTL_IN_SECONDS:
+            return cached['index']
+
+        index = build_patient_historic_location_index(settings.HOTSPOT_PROXIMITY_IN_METRES, time_window_in_seconds)
+        _patient_historic_location_indexes[time_window_in_seconds] = {
+            "generation": generation,
+            "built_at": time.monotonic(),
+            "index": index
+        }
+
+        return index
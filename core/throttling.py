@@ -0,0 +1,313 @@
+"""
+Token bucket rate limiting of the views, by client IP, mobile number, email and user
+
+A bucket holds up to `n` tokens of a rate `n/period` and is refilled continuously at `n` tokens per period, a
+request takes a token and is throttled (429 with a `Retry-After` header) when the bucket is empty. Bursts of up to
+`n` requests are allowed, sustained at the rate of the policy.
+
+Policies are set by the `throttle_scope` of the view and the kind of the throttle in `RATE_LIMITS`, e.g.
+
+    class CitizenSendOTPAPIView(generics.GenericAPIView):
+        throttle_classes = (IPThrottle, MobileNumberThrottle)
+        throttle_scope = 'otp_send'
+
+Buckets are kept by `RATE_LIMIT_BACKEND`,
+    memory - in the memory of the process, for a single process (e.g. runserver, benchmarks)
+    shared_memory - in a table of slots memory mapped from `RATE_LIMIT_SHARED_MEMORY_LOCATION`, shared between the
+        worker processes of a host, updated under a file lock
+    cache - in the `RATE_LIMIT_CACHE` cache, shared between the hosts for a shared cache (e.g. memcached).
+        Reading and writing a bucket is not atomic, concurrent requests of a client may take the same token,
+        letting a few more requests through than the rate under bursts.
+"""
+import fcntl
+import functools
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+from core.metrics import RATE_LIMITED_REQUESTS
+
+RATE_PERIODS_IN_SECONDS = {
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400
+}
+
+RATE_PATTERN = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])[a-z]*\s*$')
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Parses a rate of `<requests>/<period>`, the period being a second, minute, hour or day optionally
+    with a multiplier, e.g. 5/h, 100/day, 10/15m
+
+    :param rate:
+    :return: (capacity, tokens refilled per second)
+    """
+    match = RATE_PATTERN.match(rate)
+    if match is None or int(match.group(1)) < 1:
+        raise ValueError("Invalid rate: {}".format(rate))
+
+    requests = int(match.group(1))
+    period = int(match.group(2) or 1) * RATE_PERIODS_IN_SECONDS[match.group(3)]
+    return requests, requests / period
+
+
+def take_token(bucket, capacity, refill_rate, now):
+    """
+    Refills the bucket up to the capacity for the time elapsed since it is updated, then takes a token
+
+    :param bucket: (tokens, updated time), None for a full bucket
+    :param capacity:
+    :param refill_rate: tokens per second
+    :param now:
+    :return: (allowed, bucket, seconds until a token is available)
+    """
+    if bucket is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+
+    if tokens >= 1:
+        return True, (tokens - 1, now), 0.0
+    return False, (tokens, now), (1 - tokens) / refill_rate
+
+
+class MemoryTokenBucketBackend(object):
+    """
+    MemoryTokenBucketBackend
+
+    Buckets in the memory of the process, least recently used buckets are dropped beyond `max_keys` (a dropped
+    bucket is full again).
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        with self._lock:
+            allowed, bucket, wait = take_token(self._buckets.get(key), capacity, refill_rate, time.time())
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+
+class SharedMemoryTokenBucketBackend(object):
+    """
+    SharedMemoryTokenBucketBackend
+
+    Buckets in a file of `slots` slots of (key hash, tokens, updated time), memory mapped by every process.
+    A key is kept in one of `PROBES` consecutive slots from its hash, a new key takes the least recently updated
+    of them (whose bucket is refilled the most), so buckets are dropped only when the slots are full of active
+    clients.
+
+    Slots are read and written under an exclusive lock of the file, between processes, and a thread lock, between
+    the threads of a process. The file is opened again in a forked process, since the lock of a file opened before
+    the fork is shared with the parent.
+    """
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 4
+
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.slots = slots
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.slots * self.SLOT.size
+        # a new file is filled with zeros, i.e. empty slots
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd, self._map, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+
+    def consume(self, key, capacity, refill_rate):
+        # hash 0 marks an empty slot
+        key_hash = int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'little') or 1
+        start = key_hash % self.slots
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                slot = bucket = None
+                oldest = None
+                for probe in range(self.PROBES):
+                    offset = (start + probe) % self.slots * self.SLOT.size
+                    slot_hash, tokens, updated = self.SLOT.unpack_from(self._map, offset)
+                    if slot_hash == key_hash:
+                        slot, bucket = offset, (tokens, updated)
+                        break
+                    if oldest is None or updated < oldest:
+                        slot, oldest = offset, updated
+
+                allowed, bucket, wait = take_token(bucket, capacity, refill_rate, now)
+                self.SLOT.pack_into(self._map, slot, key_hash, bucket[0], bucket[1])
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return allowed, wait
+
+
+class CacheTokenBucketBackend(object):
+    """
+    CacheTokenBucketBackend
+
+    Buckets in a Django cache, expiring once they would be full again.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, capacity, refill_rate):
+        cache = caches[self.alias]
+        allowed, bucket, wait = take_token(cache.get(key), capacity, refill_rate, time.time())
+        cache.set(key, bucket, timeout=max(1, int((capacity - bucket[0]) / refill_rate) + 1))
+        return allowed, wait
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_rate_limit_backend():
+    """
+    Returns the backend of `RATE_LIMIT_BACKEND`, created once per process
+
+    :return:
+    """
+    name = (settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_SHARED_MEMORY_LOCATION, settings.RATE_LIMIT_CACHE)
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                if settings.RATE_LIMIT_BACKEND == 'memory':
+                    backend = MemoryTokenBucketBackend()
+                elif settings.RATE_LIMIT_BACKEND == 'shared_memory':
+                    backend = SharedMemoryTokenBucketBackend(settings.RATE_LIMIT_SHARED_MEMORY_LOCATION)
+                elif settings.RATE_LIMIT_BACKEND == 'cache':
+                    backend = CacheTokenBucketBackend(settings.RATE_LIMIT_CACHE)
+                else:
+                    raise ValueError("Invalid rate limit backend: {}".format(settings.RATE_LIMIT_BACKEND))
+                _backends[name] = backend
+    return backend
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    TokenBucketThrottle
+
+    Base of the throttles, limits the requests of the identifier returned by `get_identifier` with the rate of
+    `RATE_LIMITS[<throttle scope of the view>][<kind>]`. Requests are not limited when the policy or the identifier
+    is missing.
+    """
+    kind = None
+
+    def get_identifier(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self._wait = None
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+
+        scope = getattr(view, 'throttle_scope', None)
+        rate = settings.RATE_LIMITS.get(scope, {}).get(self.kind)
+        if rate is None:
+            return True
+
+        identifier = self.get_identifier(request, view)
+        if not identifier:
+            return True
+
+        capacity, refill_rate = parse_rate(rate)
+        # identifiers are hashed, for keys of a fixed length without personal data
+        key = 'rate_limit:{}:{}:{}'.format(scope, self.kind, hashlib.sha1(identifier.encode('utf-8')).hexdigest())
+        allowed, self._wait = get_rate_limit_backend().consume(key, capacity, refill_rate)
+
+        if not allowed:
+            RATE_LIMITED_REQUESTS.labels(scope, self.kind).inc()
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class _RequestDataThrottle(TokenBucketThrottle):
+    field = None
+
+    def get_identifier(self, request, view):
+        # batch requests and bodies failing to parse are not limited by the field, the view rejects them
+        try:
+            data = request.data
+        except APIException:
+            return None
+
+        if not hasattr(data, 'get'):
+            return None
+        value = data.get(self.field)
+        return str(value).strip().lower() if value else None
+
+
+class IPThrottle(TokenBucketThrottle):
+    """
+    Limits the requests by the client IP, taken from X-Forwarded-For behind `RATE_LIMIT_NUM_PROXIES` proxies (see
+    REST_FRAMEWORK settings). Requests are not limited by IP unless the number of proxies is configured.
+    """
+    kind = 'ip'
+
+    def get_identifier(self, request, view):
+        if settings.RATE_LIMIT_NUM_PROXIES is None:
+            return None
+        return self.get_ident(request)
+
+
+class MobileNumberThrottle(_RequestDataThrottle):
+    """
+    Limits the requests by the `mobile_number` of the request, e.g. OTPs sent to a number
+    """
+    kind = 'mobile_number'
+    field = 'mobile_number'
+
+
+class EmailThrottle(_RequestDataThrottle):
+    """
+    Limits the requests by the `email` of the request, e.g. login attempts of an account
+    """
+    kind = 'email'
+    field = 'email'
+
+
+class UserThrottle(TokenBucketThrottle):
+    """
+    Limits the requests of the authenticated user
+    """
+    kind = 'user'
+
+    def get_identifier(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return str(request.user.pk)
+        return None
@@ -0,0 +1,210 @@
+import math
+from bisect import bisect_right
+
+from haversine import haversine, Unit
+
+from core.spatial import METRES_PER_DEGREE_LATITUDE
+
+
+class TrajectoryPoint(object):
+    """
+    TrajectoryPoint
+
+    A location of a trajectory observed from `enter_timestamp` to `exit_timestamp`. A single observation has
+    equal enter and exit timestamps, a stay-point spans the observations collapsed into it.
+
+    `payload` is kept along with the point, e.g. the id of an already stored location.
+    """
+
+    __slots__ = ('lat', 'long', 'enter_timestamp', 'exit_timestamp', 'is_stay', 'payload')
+
+    def __init__(self, lat, long, enter_timestamp, exit_timestamp=None, payload=None):
+        self.lat = lat
+        self.long = long
+        self.enter_timestamp = enter_timestamp
+        self.exit_timestamp = enter_timestamp if exit_timestamp is None else exit_timestamp
+        self.is_stay = self.exit_timestamp > self.enter_timestamp
+        self.payload = payload
+
+    def __repr__(self):
+        return "TrajectoryPoint({}, {}, {}, {})".format(self.lat, self.long, self.enter_timestamp,
+                                                        self.exit_timestamp)
+
+
+def detect_stay_points(points, stay_radius_in_metres, max_gap_in_seconds, max_stay_in_seconds):
+    """
+    Collapses consecutive points within `stay_radius_in_metres` of the first point of a stay into a single
+    stay-point spanning from the first to the last of them.
+
+    A point observed more than `max_gap_in_seconds` after the previous one starts a new point, so that a
+    stay-point never covers a period without observations. A stay-point spans at most `max_stay_in_seconds`,
+    longer stays are split into consecutive stay-points.
+
+    :param points: list of TrajectoryPoint sorted by enter timestamp
+    :param stay_radius_in_metres:
+    :param max_gap_in_seconds:
+    :param max_stay_in_seconds:
+    :return: list of TrajectoryPoint
+    """
+    collapsed = []
+    for point in points:
+        if collapsed:
+            last = collapsed[-1]
+            if point.enter_timestamp - last.exit_timestamp <= max_gap_in_seconds and \
+                    point.exit_timestamp - last.enter_timestamp <= max_stay_in_seconds and \
+                    haversine((last.lat, last.long), (point.lat, point.long),
+                              unit=Unit.METERS) <= stay_radius_in_metres:
+                last.exit_timestamp = max(last.exit_timestamp, point.exit_timestamp)
+                last.is_stay = True
+                continue
+
+        collapsed.append(point)
+
+    return collapsed
+
+
+def _get_perpendicular_distance(point, start, end):
+    """
+    Distance in metres from the point to the segment between start and end, on a local flat projection
+
+    :param point:
+    :param start:
+    :param end:
+    :return:
+    """
+    metres_per_degree_longitude = METRES_PER_DEGREE_LATITUDE * math.cos(math.radians(start.lat))
+
+    x = (point.long - start.long) * metres_per_degree_longitude
+    y = (point.lat - start.lat) * METRES_PER_DEGREE_LATITUDE
+    end_x = (end.long - start.long) * metres_per_degree_longitude
+    end_y = (end.lat - start.lat) * METRES_PER_DEGREE_LATITUDE
+
+    segment_length_squared = end_x * end_x + end_y * end_y
+    if segment_length_squared == 0:
+        return math.hypot(x, y)
+
+    # projection of the point onto the segment, clamped to the segment end points
+    t = max(0.0, min(1.0, (x * end_x + y * end_y) / segment_length_squared))
+    return math.hypot(x - t * end_x, y - t * end_y)
+
+
+def douglas_peucker(points, tolerance_in_metres, max_segment_length_in_metres=None):
+    """
+    Simplifies a polyline with Douglas-Peucker algorithm, keeping the end points and every point deviating
+    more than `tolerance_in_metres` from the simplified line.
+
+    If `max_segment_length_in_metres` is given, segments longer than it are not simplified, so that a dropped
+    point is never farther than it from the kept points.
+
+    :param points: list of TrajectoryPoint
+    :param tolerance_in_metres:
+    :param max_segment_length_in_metres:
+    :return: list of TrajectoryPoint
+    """
+    if len(points) < 3:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+
+    # iterative, to avoid hitting the recursion limit on long trails
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+
+        max_distance = -1.0
+        max_index = None
+        for i in range(start + 1, end):
+            distance = _get_perpendicular_distance(points[i], points[start], points[end])
+            if distance > max_distance:
+                max_distance = distance
+                max_index = i
+
+        if max_index is not None and (max_distance > tolerance_in_metres or (
+                max_segment_length_in_metres is not None and
+                haversine((points[start].lat, points[start].long), (points[end].lat, points[end].long),
+                          unit=Unit.METERS) > max_segment_length_in_metres)):
+            keep[max_index] = True
+            stack.append((start, max_index))
+            stack.append((max_index, end))
+
+    return [point for point, is_kept in zip(points, keep) if is_kept]
+
+
+def compress_trajectory(points, stay_radius_in_metres, max_gap_in_seconds, max_stay_in_seconds,
+                        tolerance_in_metres, max_segment_length_in_metres=None):
+    """
+    Compresses a trajectory by collapsing stay-points and simplifying the moving segments between them
+
+    Moving segments are the runs of points between stay-points, split further wherever the time between
+    two points exceeds `max_gap_in_seconds`. Stay-points and the end points of the segments are always kept.
+
+    :param points: list of TrajectoryPoint sorted by enter timestamp
+    :param stay_radius_in_metres:
+    :param max_gap_in_seconds:
+    :param max_stay_in_seconds:
+    :param tolerance_in_metres:
+    :param max_segment_length_in_metres:
+    :return: list of TrajectoryPoint
+    """
+    collapsed = detect_stay_points(points, stay_radius_in_metres, max_gap_in_seconds, max_stay_in_seconds)
+
+    compressed = []
+    moving_points = []
+    for point in collapsed:
+        if point.is_stay or (moving_points and
+                             point.enter_timestamp - moving_points[-1].exit_timestamp > max_gap_in_seconds):
+            compressed.extend(douglas_peucker(moving_points, tolerance_in_metres, max_segment_length_in_metres))
+            moving_points = []
+
+        if point.is_stay:
+            compressed.append(point)
+        else:
+            moving_points.append(point)
+
+    compressed.extend(douglas_peucker(moving_points, tolerance_in_metres, max_segment_length_in_metres))
+
+    return compressed
+
+
+def get_enter_timestamps(trajectory):
+    """
+    Returns the enter timestamps of a trajectory, for checking many points with `is_on_trajectory`
+
+    :param trajectory: list of TrajectoryPoint sorted by enter timestamp
+    :return:
+    """
+    return [trajectory_point.enter_timestamp for trajectory_point in trajectory]
+
+
+def is_on_trajectory(point, trajectory, stay_radius_in_metres, max_gap_in_seconds, tolerance_in_metres,
+                     enter_timestamps=None):
+    """
+    Checks whether the point is represented by a compressed trajectory, i.e. it is observed during a stay-point
+    within `stay_radius_in_metres` of it, or it is observed between two consecutive points of the trajectory
+    within `tolerance_in_metres` of the segment between them.
+
+    :param point: TrajectoryPoint
+    :param trajectory: list of TrajectoryPoint sorted by enter timestamp
+    :param stay_radius_in_metres:
+    :param max_gap_in_seconds:
+    :param tolerance_in_metres:
+    :param enter_timestamps: `get_enter_timestamps(trajectory)`, built once when checking many points
+    :return:
+    """
+    if enter_timestamps is None:
+        enter_timestamps = get_enter_timestamps(trajectory)
+
+    i = bisect_right(enter_timestamps, point.enter_timestamp) - 1
+    if i < 0:
+        return False
+
+    previous = trajectory[i]
+    if point.enter_timestamp <= previous.exit_timestamp:
+        return haversine((previous.lat, previous.long), (point.lat, point.long), unit=Unit.METERS) <= \
+            (stay_radius_in_metres if previous.is_stay else tolerance_in_metres)
+
+    if i + 1 < len(trajectory) and trajectory[i + 1].enter_timestamp - previous.exit_timestamp <= max_gap_in_seconds:
+        return _get_perpendicular_distance(point, previous, trajectory[i + 1]) <= tolerance_in_metres
+
+    return False
@@ -1,4 +1,11 @@
+import importlib
 import re
+import threading
+import time
+
+from django.db import connections
+
+from core.metrics import BACKGROUND_TASK_LATENCY, BACKGROUND_TASK_ERRORS
 
 
 def validate_hexadecimal_color_code(color_code):
@@ -9,3 +16,86 @@ def validate_hexadecimal_color_code(color_code):
     :return boolean:
     """
     return True if re.search(r'^#(?:[0-9a-fA-F]{3}){1,2}$', color_code) else False
+
+
+def run_in_background(target, *args, **kwargs):
+    """
+    Runs the function in a background thread, for non blocking experience
+
+    Database connections opened by the thread are closed when the function returns, since they are not
+    closed at the end of a request like the connections of request threads.
+
+    :param target:
+    :param args:
+    :param kwargs:
+    :return: the started thread
+    """
+
+    name = getattr(target, '__name__', 'task')
+
+    def run():
+        started = time.perf_counter()
+        try:
+            target(*args, **kwargs)
+        except Exception:
+            BACKGROUND_TASK_ERRORS.labels(name).inc()
+            raise
+        finally:
+            connections.close_all()
+            BACKGROUND_TASK_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+    thread = threading.Thread(target=run, name="background-{}".format(name))
+    thread.start()
+    return thread
+
+
+class LazyModule(object):
+    """
+    LazyModule
+
+    Stands in for a module which is imported on first attribute access, deferring heavy dependencies
+    (e.g. twilio, qrcode, jose) from the startup to the first request using them.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+
+    def load(self):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        return self.__module
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        return "<lazy module '{}'>".format(self.__name)
+
+
+# lazily imported modules, for importing them ahead of the first request (see core/warmup.py)
+_lazy_modules = []
+
+
+def lazy_import(name):
+    """
+    Returns the module, imported on first use
+
+    e.g. qrcode = lazy_import('qrcode')
+
+    :param name: absolute module name
+    :return:
+    """
+    module = LazyModule(name)
+    _lazy_modules.append(module)
+    return module
+
+
+def import_lazy_modules():
+    """
+    Imports every lazily imported module
+
+    :return:
+    """
+    for module in _lazy_modules:
+        module.load()
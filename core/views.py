@@ -1 +1,89 @@
-# Create your views here.
+from django.conf import settings
+from django.db import connection, DatabaseError
+from django.http import HttpResponse, Http404
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny, SAFE_METHODS
+from rest_framework.response import Response
+
+from authentication.permissions import HasMonitoringToken
+from core.db import get_connection_stats
+from core.metrics import get_metrics
+from core.routers import start_replica_reads, stop_replica_reads, is_pinned_to_primary, mark_replica_unavailable
+
+
+class HealthCheckAPIView(generics.GenericAPIView):
+    """
+    Health check for load balancers and container orchestration
+
+    Responds with 503 if the database is not reachable. Anonymous callers get only the status, the database
+    status and the connection stats of the worker process serving the request are included for the callers with
+    the monitoring token (`MONITORING_TOKEN`).
+    """
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+
+    def get(self, request):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            database_status = "ok"
+        except DatabaseError:
+            database_status = "unavailable"
+
+        health = {"status": "ok" if database_status == "ok" else "unavailable"}
+        if HasMonitoringToken().has_permission(request, self):
+            health["database"] = database_status
+            health["connections"] = get_connection_stats()
+
+        return Response(health, status=status.HTTP_200_OK if database_status == "ok" else
+                        status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class MetricsAPIView(generics.GenericAPIView):
+    """
+    Prometheus metrics in the text exposition format (see core/metrics.py), aggregated over every gunicorn
+    worker process
+
+    Served only to the monitoring system, with the monitoring token (`MONITORING_TOKEN`) as the bearer token of the
+    scrape configuration.
+    """
+    permission_classes = (HasMonitoringToken,)
+    authentication_classes = ()
+
+    def get(self, request):
+        if not settings.METRICS_ENABLED:
+            raise Http404
+
+        content, content_type = get_metrics()
+        return HttpResponse(content, content_type=content_type)
+
+
+class ReplicaReadMixin(object):
+    """
+    ReplicaReadMixin
+
+    Sends the reads of safe (GET, HEAD, OPTIONS) requests to the replica database (see core/routers.py), unless
+    the user has written recently. Authentication and permission checks still read from the primary.
+
+    If a read on the replica fails, the replica is marked unavailable and the request is served again from the
+    primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if request.method in SAFE_METHODS and not (
+                request.user.is_authenticated and is_pinned_to_primary(request.user.id)):
+            start_replica_reads()
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except DatabaseError:
+            if not stop_replica_reads():
+                raise
+
+            mark_replica_unavailable()
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            stop_replica_reads()
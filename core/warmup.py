@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+from django.urls import get_resolver
+
+
+def _warm_up_step(name, function):
+    started = time.perf_counter()
+    try:
+        function()
+    except Exception as e:
+        # a cold cache is filled by the first request instead, it should not stop the server from starting
+        settings.LOGGER_ERROR.error("Warm up of {} failed: {}".format(name, e))
+        return
+
+    settings.LOGGER_INFO.info("Warmed up {} in {:.0f} ms".format(name, (time.perf_counter() - started) * 1000))
+
+
+def _warm_up_url_conf():
+    # importing the URL conf imports every view, serializer and renderer
+    get_resolver().url_patterns
+
+
+def _warm_up_lazy_imports():
+    from core.utils import import_lazy_modules
+
+    import_lazy_modules()
+
+
+def _warm_up_rsa_public_keys():
+    from authentication.utils import get_rsa_public_keys
+
+    get_rsa_public_keys()
+
+
+def _warm_up_self_screening_bundle():
+    from super_admin.utils import get_self_screening_bundle
+
+    get_self_screening_bundle()
+
+
+def _warm_up_regions():
+    from dashboard.utils import get_nearest_region_id
+
+    get_nearest_region_id(0.0, 0.0)
+
+
+def _warm_up_patient_historic_location_index():
+    from core.spatial import get_patient_historic_location_index
+
+    get_patient_historic_location_index()
+
+
+def warm_up_caches():
+    """
+    Fills the process caches before serving traffic, URL conf, lazily imported modules, IAM RSA public keys,
+    self screening bundle, dashboard regions and patient historic location index
+
+    When the application is preloaded, this is run in the gunicorn master so that the forked workers share
+    the caches (copy on write). Database connections opened here are closed, they should not be shared by
+    the forked workers.
+
+    :return:
+    """
+    _warm_up_step("URL conf", _warm_up_url_conf)
+    _warm_up_step("lazy imports", _warm_up_lazy_imports)
+    _warm_up_step("RSA public keys", _warm_up_rsa_public_keys)
+    _warm_up_step("self screening bundle", _warm_up_self_screening_bundle)
+    _warm_up_step("dashboard regions", _warm_up_regions)
+    _warm_up_step("patient historic location index", _warm_up_patient_historic_location_index)
+
+    connections.close_all()
+
+
+def warm_up_connections():
+    """
+    Opens the database connections of the current thread, run in every worker after it is forked
+
+    :return:
+    """
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            settings.LOGGER_ERROR.error("Warm up of database connection '{}' failed: {}".format(alias, e))
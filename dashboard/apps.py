@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DashboardConfig(AppConfig):
     name = 'dashboard'
+
+    def ready(self):
+        # registering signal receivers maintaining the dashboard stat rollups
+        import dashboard.signals  # noqa: F401
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.utils import refresh_disease_stats
+
+
+class Command(BaseCommand):
+    """
+    Reconciles the dashboard disease stat rollups with the database, to be scheduled periodically (e.g. cron)
+
+    e.g. python manage.py refresh_dashboard_stats
+    """
+    help = "Recalculates the dashboard disease stat rollups from the database"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        no_of_rollups = refresh_disease_stats()
+
+        self.stdout.write("Refreshed {} dashboard stat rollups in {:.2f} s".format(
+            no_of_rollups, time.perf_counter() - started))
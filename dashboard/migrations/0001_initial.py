@@ -0,0 +1,46 @@
+# Generated by Django 3.0.7 on 2026-10-19 09:12
+
+import authentication.utils
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('authentication', '0006_auto_20200611_1217'),
+        ('core', '0014_auto_20200611_2259'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiseaseStatRollup',
+            fields=[
+                ('id', models.CharField(default=authentication.utils.hex_uuid, editable=False, max_length=36, primary_key=True, serialize=False, unique=True)),
+                ('day', models.DateField(blank=True, null=True)),
+                ('metric', models.CharField(choices=[('CITIZENS', 'Citizens associated with the disease'), ('WELLNESS', 'Citizens by wellness status'), ('PATIENT-HISTORIC-LOCATIONS', 'Patient historic locations by infection status')], max_length=50)),
+                ('key', models.CharField(blank=True, default='', max_length=250)),
+                ('count', models.BigIntegerField(default=0)),
+                ('disease', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.Disease')),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='authentication.Region')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='diseasestatrollup',
+            constraint=models.UniqueConstraint(fields=('disease', 'region', 'day', 'metric', 'key'), name='unique_disease_stat_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='diseasestatrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('day__isnull', False), ('region__isnull', True)), fields=('disease', 'day', 'metric', 'key'), name='unique_disease_stat_rollup_all_regions'),
+        ),
+        migrations.AddConstraint(
+            model_name='diseasestatrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('day__isnull', True), ('region__isnull', False)), fields=('disease', 'region', 'metric', 'key'), name='unique_disease_stat_rollup_total'),
+        ),
+        migrations.AddConstraint(
+            model_name='diseasestatrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('day__isnull', True), ('region__isnull', True)), fields=('disease', 'metric', 'key'), name='unique_disease_stat_rollup_all_regions_total'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+import authentication.utils
+import core.custom_fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # columns are converted to UUIDs by core 0018, along with the foreign keys to them of every app
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('core', '0018_native_uuid_primary_keys'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='diseasestatrollup',
+                    name='id',
+                    field=core.custom_fields.HexUUIDField(default=authentication.utils.hex_uuid, editable=False, primary_key=True, serialize=False, unique=True),
+                ),
+            ],
+        ),
+    ]
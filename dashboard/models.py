@@ -1 +1,61 @@
-# Create your models here.
+from django.db import models
+from django.db.models import Q
+
+from authentication.models import Region
+from authentication.utils import hex_uuid
+from core.custom_fields import HexUUIDField
+from core.models import Disease
+
+DISEASE_STAT_METRICS = (
+    ('CITIZENS', 'Citizens associated with the disease'),
+    ('WELLNESS', 'Citizens by wellness status'),
+    ('PATIENT-HISTORIC-LOCATIONS', 'Patient historic locations by infection status')
+)
+
+
+class DiseaseStatRollup(models.Model):
+    """
+    DiseaseStatRollup
+
+    For storing pre aggregated disease stats displayed in the data entry admin dashboard, so that the
+    dashboard does not count citizens and patient historic locations on every request.
+
+    Counters are maintained incrementally by signals (see dashboard/signals.py) and reconciled periodically
+    by `python manage.py refresh_dashboard_stats`.
+
+    Fields
+
+    1. Disease
+    2. Region - NULL for the counter across all regions
+    3. Day - NULL for the running total, otherwise the change in the counter on that day
+    4. Metric - one of `DISEASE_STAT_METRICS`
+    5. Key - wellness status for `WELLNESS`, infection status for `PATIENT-HISTORIC-LOCATIONS`, empty otherwise
+    6. Count
+    """
+    id = HexUUIDField(primary_key=True, default=hex_uuid, editable=False, unique=True)
+    disease = models.ForeignKey(Disease, on_delete=models.CASCADE)
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, null=True, blank=True)
+    day = models.DateField(null=True, blank=True)
+    metric = models.CharField(max_length=50, choices=DISEASE_STAT_METRICS)
+    key = models.CharField(max_length=250, blank=True, default="")
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        # NULLs are never equal in a unique index, hence a constraint for each combination of NULL region and day
+        constraints = [
+            models.UniqueConstraint(fields=['disease', 'region', 'day', 'metric', 'key'],
+                                    name='unique_disease_stat_rollup'),
+            models.UniqueConstraint(fields=['disease', 'day', 'metric', 'key'],
+                                    condition=Q(region__isnull=True, day__isnull=False),
+                                    name='unique_disease_stat_rollup_all_regions'),
+            models.UniqueConstraint(fields=['disease', 'region', 'metric', 'key'],
+                                    condition=Q(region__isnull=False, day__isnull=True),
+                                    name='unique_disease_stat_rollup_total'),
+            models.UniqueConstraint(fields=['disease', 'metric', 'key'],
+                                    condition=Q(region__isnull=True, day__isnull=True),
+                                    name='unique_disease_stat_rollup_all_regions_total'),
+        ]
+
+    def __str__(self):
+        return "{} - {}:{} region:{} day:{} = {}".format(self.disease_id, self.metric, self.key, self.region_id,
+                                                         self.day, self.count)
@@ -1,15 +1,53 @@
+from datetime import timedelta
+
 from rest_framework import serializers
 
+from authentication.models import Region
+from core.custom_fields import TimeStampField
+from core.models import Disease
 from patient.serializers import HistoricLocationDataSerializer
 
+# Maximum number of days in a stats time series
+MAX_STATS_SERIES_DAYS = 366
+
 
 class StatSerializer(serializers.Serializer):
     """
-    Serializes disease related stats for displaying in data entry admin dashboard
+    Serializes the query parameters for retrieving disease related stats displayed in data entry admin dashboard
+
+    `from` and `to` are UTC timestamps, when provided the daily time series of the range is included.
     """
-    immunized = serializers.FloatField()
-    naturally_immune = serializers.FloatField()
-    currently_infected = serializers.FloatField()
+    disease_id = serializers.CharField()
+    region_id = serializers.CharField(required=False)
+    from_timestamp = TimeStampField(required=False)
+    to_timestamp = TimeStampField(required=False)
+
+    def validate_disease_id(self, disease_id):
+        if not Disease.objects.filter(id=disease_id).exists():
+            raise serializers.ValidationError('Please provide a valid disease ID !')
+        return disease_id
+
+    def validate_region_id(self, region_id):
+        if not Region.objects.filter(id=region_id).exists():
+            raise serializers.ValidationError('Please provide a valid region ID !')
+        return region_id
+
+    def validate(self, data):
+        from_timestamp = data.get('from_timestamp')
+        to_timestamp = data.get('to_timestamp')
+
+        if (from_timestamp is None) != (to_timestamp is None):
+            raise serializers.ValidationError('Please provide both from and to timestamps !')
+
+        if from_timestamp is not None:
+            if from_timestamp > to_timestamp:
+                raise serializers.ValidationError('From timestamp should be before to timestamp !')
+
+            if to_timestamp - from_timestamp > timedelta(days=MAX_STATS_SERIES_DAYS):
+                raise serializers.ValidationError(
+                    'Time range should be at most {} days !'.format(MAX_STATS_SERIES_DAYS))
+
+        return data
 
 
 class MapDataSerializer(serializers.Serializer):
@@ -0,0 +1,155 @@
+from collections import Counter
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from authentication.models import Citizen
+from core.models import CitizenDiseaseRelation, PatientHistoricLocation, DiseaseInfectionStatus
+from dashboard.utils import add_disease_stat_delta, add_patient_historic_location_stat_delta, update_disease_stats, \
+    get_nearest_region_id
+
+
+# Field values as loaded from the database are remembered on the instance, for finding which counters
+# to decrement when the instance is updated. Deferred fields are not loaded, to avoid extra queries.
+
+def _get_loaded_values(instance, field_names):
+    if any(field_name not in instance.__dict__ for field_name in field_names):
+        return None
+    return tuple(instance.__dict__[field_name] for field_name in field_names)
+
+
+CITIZEN_DISEASE_RELATION_FIELDS = ('disease_id', 'wellness')
+PATIENT_HISTORIC_LOCATION_FIELDS = ('disease_infection_status_id', 'lat', 'long', 'recorded_date_time')
+CITIZEN_FIELDS = ('home_latitude', 'home_longitude')
+
+
+def _get_citizen_region_id(citizen_id):
+    home_location = Citizen.objects.filter(id=citizen_id).values_list('home_latitude', 'home_longitude').first()
+    if home_location is None:
+        return None
+    return get_nearest_region_id(*home_location)
+
+
+def _add_citizen_disease_stat_delta(deltas, disease_id, wellness, region_id, delta, include_all_regions=True):
+    today = timezone.now().date()
+    add_disease_stat_delta(deltas, disease_id, region_id, today, 'CITIZENS', '', delta, include_all_regions)
+    add_disease_stat_delta(deltas, disease_id, region_id, today, 'WELLNESS', wellness, delta, include_all_regions)
+
+
+def _add_patient_historic_location_stat_delta(deltas, infection_status_id, lat, long, recorded_date_time, delta):
+    disease_id = DiseaseInfectionStatus.objects.values_list('disease_id', flat=True).get(id=infection_status_id)
+    add_patient_historic_location_stat_delta(deltas, disease_id, infection_status_id, lat, long, recorded_date_time,
+                                             delta)
+
+
+@receiver(post_init, sender=CitizenDiseaseRelation)
+def remember_citizen_disease_relation(sender, instance, **kwargs):
+    instance._disease_stat_values = _get_loaded_values(instance, CITIZEN_DISEASE_RELATION_FIELDS)
+
+
+@receiver(post_save, sender=CitizenDiseaseRelation)
+def update_citizen_disease_relation_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    values = _get_loaded_values(instance, CITIZEN_DISEASE_RELATION_FIELDS)
+    previous_values = None if created else getattr(instance, '_disease_stat_values', None)
+
+    # values of deferred fields are unknown, counters are reconciled by the periodic refresh
+    if values is None or (not created and previous_values is None):
+        instance._disease_stat_values = values
+        return
+
+    if values != previous_values:
+        deltas = Counter()
+        region_id = _get_citizen_region_id(instance.citizen_id)
+        if previous_values is not None:
+            _add_citizen_disease_stat_delta(deltas, *previous_values, region_id, -1)
+        _add_citizen_disease_stat_delta(deltas, *values, region_id, 1)
+        update_disease_stats(deltas)
+
+    instance._disease_stat_values = values
+
+
+@receiver(post_delete, sender=CitizenDiseaseRelation)
+def delete_citizen_disease_relation_stats(sender, instance, **kwargs):
+    values = getattr(instance, '_disease_stat_values', None) or _get_loaded_values(
+        instance, CITIZEN_DISEASE_RELATION_FIELDS)
+    if values is not None:
+        deltas = Counter()
+        _add_citizen_disease_stat_delta(deltas, *values, _get_citizen_region_id(instance.citizen_id), -1)
+        update_disease_stats(deltas)
+
+
+@receiver(post_init, sender=Citizen)
+def remember_citizen(sender, instance, **kwargs):
+    instance._disease_stat_values = _get_loaded_values(instance, CITIZEN_FIELDS)
+
+
+@receiver(post_save, sender=Citizen)
+def update_citizen_stats(sender, instance, created, raw=False, **kwargs):
+    """
+    Moves the citizen counters to the new region when the citizen home location is changed
+    """
+    if raw:
+        return
+
+    values = _get_loaded_values(instance, CITIZEN_FIELDS)
+    previous_values = None if created else getattr(instance, '_disease_stat_values', None)
+    instance._disease_stat_values = values
+
+    if previous_values is None or values is None or values == previous_values:
+        return
+
+    previous_region_id = get_nearest_region_id(*previous_values)
+    region_id = get_nearest_region_id(*values)
+    if previous_region_id == region_id:
+        return
+
+    deltas = Counter()
+    for disease_id, wellness in CitizenDiseaseRelation.objects.filter(citizen__id=instance.id).values_list(
+            'disease_id', 'wellness'):
+        # counters across all regions are unchanged
+        _add_citizen_disease_stat_delta(deltas, disease_id, wellness, previous_region_id, -1,
+                                        include_all_regions=False)
+        _add_citizen_disease_stat_delta(deltas, disease_id, wellness, region_id, 1, include_all_regions=False)
+    update_disease_stats(deltas)
+
+
+@receiver(post_init, sender=PatientHistoricLocation)
+def remember_patient_historic_location(sender, instance, **kwargs):
+    instance._disease_stat_values = _get_loaded_values(instance, PATIENT_HISTORIC_LOCATION_FIELDS)
+
+
+@receiver(post_save, sender=PatientHistoricLocation)
+def update_patient_historic_location_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    values = _get_loaded_values(instance, PATIENT_HISTORIC_LOCATION_FIELDS)
+    previous_values = None if created else getattr(instance, '_disease_stat_values', None)
+
+    # values of deferred fields are unknown, counters are reconciled by the periodic refresh
+    if values is None or (not created and previous_values is None):
+        instance._disease_stat_values = values
+        return
+
+    if values != previous_values:
+        deltas = Counter()
+        if previous_values is not None:
+            _add_patient_historic_location_stat_delta(deltas, *previous_values, -1)
+        _add_patient_historic_location_stat_delta(deltas, *values, 1)
+        update_disease_stats(deltas)
+
+    instance._disease_stat_values = values
+
+
+@receiver(post_delete, sender=PatientHistoricLocation)
+def delete_patient_historic_location_stats(sender, instance, **kwargs):
+    values = getattr(instance, '_disease_stat_values', None) or _get_loaded_values(
+        instance, PATIENT_HISTORIC_LOCATION_FIELDS)
+    if values is not None:
+        deltas = Counter()
+        _add_patient_historic_location_stat_delta(deltas, *values, -1)
+        update_disease_stats(deltas)
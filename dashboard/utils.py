@@ -0,0 +1,330 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, connection
+from django.db.models import Sum
+from django.utils import timezone
+from haversine import haversine, Unit
+
+from authentication.models import Region
+from authentication.utils import hex_uuid
+from core.models import CitizenDiseaseRelation, PatientHistoricLocation
+from dashboard.models import DiseaseStatRollup
+
+# Regions cached per worker process, regions are rarely changed
+_regions = {}
+_regions_lock = threading.Lock()
+
+
+def _get_regions():
+    cached = _regions.get('regions')
+    if cached is not None and \
+            time.monotonic() - cached['loaded_at'] < settings.DASHBOARD_REGIONS_CACHE_TIMEOUT_IN_SECONDS:
+        return cached['regions']
+
+    with _regions_lock:
+        regions = list(Region.objects.values_list('id', 'lat', 'long'))
+        _regions['regions'] = {"loaded_at": time.monotonic(), "regions": regions}
+
+    return regions
+
+
+def get_nearest_region_id(lat, long):
+    """
+    Returns the id of the region nearest to the location, if it is within `DASHBOARD_REGION_RADIUS_IN_METRES`,
+    otherwise None
+
+    :param lat:
+    :param long:
+    :return:
+    """
+    if lat is None or long is None:
+        return None
+
+    nearest_region_id = None
+    nearest_distance = settings.DASHBOARD_REGION_RADIUS_IN_METRES
+    for region_id, region_lat, region_long in _get_regions():
+        distance = haversine((lat, long), (region_lat, region_long), unit=Unit.METERS)
+        if distance <= nearest_distance:
+            nearest_region_id = region_id
+            nearest_distance = distance
+
+    return nearest_region_id
+
+
+def get_utc_date(date_time):
+    """
+    Returns the UTC date of a datetime, naive datetime is considered to be in UTC as it is stored in the database
+
+    :param date_time:
+    :return:
+    """
+    if timezone.is_naive(date_time):
+        return date_time.date()
+    return date_time.astimezone(timezone.utc).date()
+
+
+# conflict targets of the unique constraints of DiseaseStatRollup, by whether the region and the day are NULL
+ROLLUP_CONFLICT_TARGETS = {
+    (False, False): '(disease_id, region_id, day, metric, key)',
+    (True, False): '(disease_id, day, metric, key) WHERE day IS NOT NULL AND region_id IS NULL',
+    (False, True): '(disease_id, region_id, metric, key) WHERE day IS NULL AND region_id IS NOT NULL',
+    (True, True): '(disease_id, metric, key) WHERE day IS NULL AND region_id IS NULL',
+}
+
+
+def add_disease_stat_delta(deltas, disease_id, region_id, day, metric, key, delta, include_all_regions=True):
+    """
+    Adds delta to the counters of a disease stat in `deltas`, to be written by `update_disease_stats`
+
+    Both the running total and the counter of the day are updated, for the region and across all regions.
+
+    :param deltas: Counter of {(disease_id, region_id, day, metric, key): delta}
+    :param disease_id:
+    :param region_id: None if the stat is not within any region
+    :param day:
+    :param metric:
+    :param key:
+    :param delta:
+    :param include_all_regions: False to update only the region counters, e.g. when moving between regions
+    :return:
+    """
+    region_ids = []
+    if region_id is not None:
+        region_ids.append(region_id)
+    if include_all_regions:
+        region_ids.append(None)
+
+    for rollup_region_id in region_ids:
+        deltas[(disease_id, rollup_region_id, day, metric, key)] += delta
+        deltas[(disease_id, rollup_region_id, None, metric, key)] += delta
+
+
+def update_disease_stats(deltas):
+    """
+    Adds the deltas to the disease stat rollups
+
+    Rollups are upserted with a statement for each unique constraint of `DiseaseStatRollup` (a region or all
+    regions, a day or the running total), in a fixed order so that concurrent updates do not deadlock.
+
+    :param deltas: {(disease_id, region_id, day, metric, key): delta}
+    :return:
+    """
+    rows_by_conflict_target = defaultdict(list)
+    for (disease_id, region_id, day, metric, key), delta in sorted(deltas.items(), key=lambda item: str(item[0])):
+        if delta != 0:
+            rows_by_conflict_target[(region_id is None, day is None)].append(
+                (hex_uuid(), disease_id, region_id, day, metric, key, delta))
+
+    table = DiseaseStatRollup._meta.db_table
+    with connection.cursor() as cursor:
+        for conflict_target in sorted(rows_by_conflict_target):
+            rows = rows_by_conflict_target[conflict_target]
+            cursor.execute("""
+                INSERT INTO {table} (id, disease_id, region_id, day, metric, key, count) VALUES {values}
+                ON CONFLICT {conflict_target} DO UPDATE SET count = {table}.count + EXCLUDED.count
+            """.format(table=table, values=', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(rows)),
+                       conflict_target=ROLLUP_CONFLICT_TARGETS[conflict_target]),
+                [value for row in rows for value in row])
+
+
+def add_patient_historic_location_stat_delta(deltas, disease_id, infection_status_id, lat, long, recorded_date_time,
+                                             delta):
+    add_disease_stat_delta(deltas, disease_id, get_nearest_region_id(lat, long), get_utc_date(recorded_date_time),
+                           'PATIENT-HISTORIC-LOCATIONS', infection_status_id, delta)
+
+
+def update_patient_historic_location_stats(historic_locations, disease_id):
+    """
+    Counts patient historic locations created in bulk, which sends no signals, with a single upsert for each kind
+    of counter
+
+    :param historic_locations: PatientHistoricLocation objects of the disease
+    :param disease_id:
+    :return:
+    """
+    deltas = Counter()
+    for historic_location in historic_locations:
+        add_patient_historic_location_stat_delta(deltas, disease_id, historic_location.disease_infection_status_id,
+                                                 historic_location.lat, historic_location.long,
+                                                 historic_location.recorded_date_time, 1)
+    update_disease_stats(deltas)
+
+
+def _get_rollup_key(rollup):
+    return rollup['metric'], rollup['key']
+
+
+def _to_stats(counts):
+    """
+    Converts {(metric, key): count} into the stats response structure
+
+    :param counts:
+    :return:
+    """
+    stats = {
+        "citizens": 0,
+        "wellness": {},
+        "patient_historic_locations": {}
+    }
+    for (metric, key), count in counts.items():
+        if metric == 'CITIZENS':
+            stats['citizens'] = count
+        elif metric == 'WELLNESS':
+            stats['wellness'][key] = count
+        elif metric == 'PATIENT-HISTORIC-LOCATIONS':
+            stats['patient_historic_locations'][key] = count
+
+    return stats
+
+
+def get_disease_stats(disease_id, region_id=None):
+    """
+    Returns the current disease stats from the running totals
+
+    :param disease_id:
+    :param region_id: None for stats across all regions
+    :return:
+    """
+    rollups = DiseaseStatRollup.objects.filter(disease__id=disease_id, region__id=region_id,
+                                               day__isnull=True).values('metric', 'key', 'count')
+
+    return _to_stats({_get_rollup_key(rollup): rollup['count'] for rollup in rollups})
+
+
+def get_disease_stats_series(disease_id, region_id, from_day, to_day):
+    """
+    Returns the disease stats of each day from `from_day` to `to_day`, for plotting charts
+
+    Citizen and wellness counts are the values at the end of the day, patient historic location
+    counts are the locations recorded on that day.
+
+    :param disease_id:
+    :param region_id: None for stats across all regions
+    :param from_day:
+    :param to_day:
+    :return:
+    """
+    rollups = DiseaseStatRollup.objects.filter(disease__id=disease_id, region__id=region_id)
+
+    totals = {_get_rollup_key(rollup): rollup['count'] for rollup in
+              rollups.filter(day__isnull=True).values('metric', 'key', 'count')}
+
+    # changes after the range, for calculating the values at the end of the range
+    changes_after = {_get_rollup_key(rollup): rollup['count'] for rollup in
+                     rollups.filter(day__gt=to_day).values('metric', 'key').annotate(count=Sum('count'))}
+
+    changes_by_day = defaultdict(dict)
+    for rollup in rollups.filter(day__gte=from_day, day__lte=to_day).values('day', 'metric', 'key', 'count'):
+        changes_by_day[rollup['day']][_get_rollup_key(rollup)] = rollup['count']
+
+    values = {rollup_key: count - changes_after.get(rollup_key, 0) for rollup_key, count in totals.items()}
+
+    # walking backwards from the end of the range
+    series = []
+    day = to_day
+    while day >= from_day:
+        changes = changes_by_day.get(day, {})
+
+        day_counts = {}
+        for rollup_key, count in values.items():
+            day_counts[rollup_key] = changes.get(rollup_key, 0) if rollup_key[0] == 'PATIENT-HISTORIC-LOCATIONS' \
+                else count
+
+        series.append({"day": day.isoformat(), **_to_stats(day_counts)})
+
+        for rollup_key, change in changes.items():
+            values[rollup_key] = values.get(rollup_key, 0) - change
+        day -= timedelta(days=1)
+
+    series.reverse()
+
+    return series
+
+
+def refresh_disease_stats():
+    """
+    Reconciles the disease stat rollups with the database
+
+    Counters can drift from the database when rows are changed without signals, e.g. queryset updates,
+    raw SQL or citizens moving between regions. Running totals are recalculated from the database, the
+    difference from the previous totals is recorded as a change on the current day for citizen counts.
+    Patient historic location counters are rebuilt entirely, since they are counted by the recorded day.
+
+    Rows are counted before the rollup table is locked, so that the counting does not block the writes of the
+    incremental updates. Changes committed while counting are reconciled by the next refresh.
+
+    Returns number of rollup rows written
+
+    :return:
+    """
+    today = timezone.now().date()
+
+    # counting under the latest regions
+    _regions.pop('regions', None)
+
+    # counting without blocking the incremental updates, which wait only while the rollups are swapped
+    citizen_totals = Counter()
+    citizen_disease_relations = CitizenDiseaseRelation.objects.values_list(
+        'disease_id', 'wellness', 'citizen__home_latitude', 'citizen__home_longitude')
+    for disease_id, wellness, home_latitude, home_longitude in citizen_disease_relations.iterator():
+        region_id = get_nearest_region_id(home_latitude, home_longitude)
+        for rollup_region_id in {region_id, None}:
+            citizen_totals[(disease_id, rollup_region_id, 'CITIZENS', '')] += 1
+            citizen_totals[(disease_id, rollup_region_id, 'WELLNESS', wellness)] += 1
+
+    patient_historic_location_counts = Counter()
+    patient_historic_locations = PatientHistoricLocation.objects.values_list(
+        'disease_infection_status__disease_id', 'disease_infection_status_id', 'lat', 'long',
+        'recorded_date_time')
+    for disease_id, infection_status_id, lat, long, recorded_date_time in patient_historic_locations.iterator():
+        region_id = get_nearest_region_id(lat, long)
+        for rollup_region_id in {region_id, None}:
+            for day in (get_utc_date(recorded_date_time), None):
+                patient_historic_location_counts[
+                    (disease_id, rollup_region_id, day, 'PATIENT-HISTORIC-LOCATIONS', infection_status_id)] += 1
+
+    with transaction.atomic():
+        # blocking the incremental updates while the rollups are swapped
+        with connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE {} IN EXCLUSIVE MODE'.format(DiseaseStatRollup._meta.db_table))
+
+        # recording the drift of citizen counts as a change on the current day
+        previous_citizen_totals = {
+            (rollup.disease_id, rollup.region_id, rollup.metric, rollup.key): rollup.count for rollup in
+            DiseaseStatRollup.objects.filter(day__isnull=True, metric__in=('CITIZENS', 'WELLNESS'))}
+
+        citizen_changes = Counter()
+        for rollup_key in set(citizen_totals) | set(previous_citizen_totals):
+            drift = citizen_totals.get(rollup_key, 0) - previous_citizen_totals.get(rollup_key, 0)
+            if drift != 0:
+                citizen_changes[rollup_key] = drift
+
+        today_citizen_counts = {
+            (rollup.disease_id, rollup.region_id, rollup.metric, rollup.key): rollup.count for rollup in
+            DiseaseStatRollup.objects.filter(day=today, metric__in=('CITIZENS', 'WELLNESS'))}
+        for rollup_key, drift in citizen_changes.items():
+            today_citizen_counts[rollup_key] = today_citizen_counts.get(rollup_key, 0) + drift
+
+        DiseaseStatRollup.objects.filter(metric='PATIENT-HISTORIC-LOCATIONS').delete()
+        DiseaseStatRollup.objects.filter(metric__in=('CITIZENS', 'WELLNESS')).filter(day__isnull=True).delete()
+        DiseaseStatRollup.objects.filter(metric__in=('CITIZENS', 'WELLNESS'), day=today).delete()
+
+        rollups = []
+        for (disease_id, region_id, metric, key), count in citizen_totals.items():
+            rollups.append(DiseaseStatRollup(disease_id=disease_id, region_id=region_id, day=None, metric=metric,
+                                             key=key, count=count))
+        for (disease_id, region_id, metric, key), count in today_citizen_counts.items():
+            if count != 0:
+                rollups.append(DiseaseStatRollup(disease_id=disease_id, region_id=region_id, day=today,
+                                                 metric=metric, key=key, count=count))
+        for (disease_id, region_id, day, metric, key), count in patient_historic_location_counts.items():
+            rollups.append(DiseaseStatRollup(disease_id=disease_id, region_id=region_id, day=day, metric=metric,
+                                             key=key, count=count))
+
+        DiseaseStatRollup.objects.bulk_create(rollups, batch_size=1000)
+
+    return len(rollups)
@@ -9,26 +9,53 @@ from rest_framework.response import Response
 from authentication.permissions import IsDataEntryAdmin
 from core.models import PatientHistoricLocation
 from dashboard.serializers import StatSerializer
+from dashboard.utils import get_disease_stats, get_disease_stats_series, get_utc_date
 from patient.serializers import PatientHistoricLocationSerializer
 
 
 class StatsAPIView(generics.GenericAPIView):
     """
     API to retrieve data entry admin dashboard disease stats
+
+    Stats are read from the pre aggregated rollups (see dashboard.models.DiseaseStatRollup)
+
+    Query parameters
+
+    1. disease_id
+    2. region_id - optional, stats across all regions by default
+    3. from, to - optional UTC timestamps, for including the daily time series of the range
+
+    Response - {"disease_id", "region_id", "citizens", "wellness": {status: count},
+    "patient_historic_locations": {infection status id: count}, "series": [...]}
+
+    Breaking change - this API used to return placeholder numbers ("immunized", "naturally_immune" and
+    "currently_infected") to anyone, it now returns the above to data entry admins only.
     """
     serializer_class = StatSerializer
+    permission_classes = (IsAuthenticated, IsDataEntryAdmin,)
 
     def get(self, request):
-        data = {
-            "immunized": 10,
-            "naturally_immune": 45,
-            "currently_infected": 80
+        query_params = {
+            "disease_id": request.query_params.get('disease_id'),
+            "region_id": request.query_params.get('region_id'),
+            "from_timestamp": request.query_params.get('from'),
+            "to_timestamp": request.query_params.get('to')
         }
-
-        serializer = self.serializer_class(data=data)
+        serializer = self.serializer_class(data={key: value for key, value in query_params.items()
+                                                 if value is not None})
         serializer.is_valid(raise_exception=True)
 
-        return Response(serializer.data)
+        disease_id = serializer.validated_data['disease_id']
+        region_id = serializer.validated_data.get('region_id')
+
+        stats = get_disease_stats(disease_id, region_id)
+
+        if serializer.validated_data.get('from_timestamp') is not None:
+            stats['series'] = get_disease_stats_series(disease_id, region_id,
+                                                       get_utc_date(serializer.validated_data['from_timestamp']),
+                                                       get_utc_date(serializer.validated_data['to_timestamp']))
+
+        return Response({"disease_id": disease_id, "region_id": region_id, **stats})
 
 
 class MapDataAPIView(generics.GenericAPIView):
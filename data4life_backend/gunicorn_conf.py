@@ -0,0 +1,116 @@
+"""
+Gunicorn configuration for serving data4life_backend in production
+
+    gunicorn --config python:data4life_backend.gunicorn_conf
+
+Configured with environment variables,
+
+    GUNICORN_WORKER_CLASS - sync, gthread (default) or uvicorn (ASGI)
+    GUNICORN_WORKERS - worker processes, defaults to 2 * CPU cores + 1
+    GUNICORN_THREADS - threads per gthread worker, defaults to 4
+    GUNICORN_BIND - defaults to 0.0.0.0:8000
+    GUNICORN_PRELOAD - True (default) loads and warms up the application in the master before forking the
+                       workers, so that the workers share its memory
+    GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT, GUNICORN_MAX_REQUESTS
+    PROMETHEUS_MULTIPROC_DIR - directory of the metric files shared by the workers (see core/metrics.py),
+                               defaults to /tmp/prometheus_multiproc, emptied when the server starts
+
+Graceful reload: `kill -HUP <master pid>` starts new workers and stops the old ones once they finish their
+requests. The preloaded application is not reloaded by HUP, new code is picked up by restarting the master
+(a new container), or by USR2 followed by TERM to the old master.
+"""
+import multiprocessing
+import os
+import shutil
+import threading
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker'
+}
+
+_worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if _worker_class not in WORKER_CLASSES:
+    raise ValueError("GUNICORN_WORKER_CLASS should be one of {}".format(', '.join(WORKER_CLASSES)))
+
+worker_class = WORKER_CLASSES[_worker_class]
+wsgi_app = 'data4life_backend.asgi:application' if _worker_class == 'uvicorn' else 'data4life_backend.wsgi:application'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) if _worker_class == 'gthread' else 1
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# workers are restarted after serving below requests (with jitter, so that they are not restarted together),
+# limiting the memory growth of the per process caches
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+# metrics are recorded in multiprocess mode, which is chosen when prometheus_client is imported by the application
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def _enable_gunicorn_loggers(log):
+    # loading the application configures the django LOGGING, which disables the existing gunicorn loggers
+    log.error_log.disabled = False
+    log.access_log.disabled = False
+
+
+def on_starting(server):
+    # metrics of the previous run of the server are dropped
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def when_ready(server):
+    _enable_gunicorn_loggers(server.log)
+
+    # the application is loaded in the master only when it is preloaded
+    if preload_app:
+        from core.warmup import warm_up_caches
+
+        warm_up_caches()
+
+
+def post_worker_init(worker):
+    # called after the worker has loaded the application, before it accepts requests
+    from core.db import reset_connection_stats
+    from core.warmup import warm_up_caches, warm_up_connections
+
+    _enable_gunicorn_loggers(worker.log)
+    reset_connection_stats()
+
+    if not preload_app:
+        warm_up_caches()
+
+    # database connections are per thread, requests of gthread workers are served by the threads of its pool,
+    # synchronous views of uvicorn workers by asgiref threads which open their connections on the first request
+    if _worker_class == 'gthread':
+        barrier = threading.Barrier(worker.cfg.threads, timeout=10)
+
+        def warm_up_pool_thread():
+            # every thread of the pool waits for the others, so that a task is run by each of them
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            warm_up_connections()
+
+        for future in [worker.tpool.submit(warm_up_pool_thread) for _ in range(worker.cfg.threads)]:
+            future.result()
+    elif _worker_class == 'sync':
+        warm_up_connections()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
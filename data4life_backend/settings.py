@@ -27,7 +27,8 @@ def get_env_var(setting, configs=configs):
 
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # admin modules are discovered in data4life_backend/urls.py
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -46,13 +47,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'data4life_backend.urls'
@@ -115,16 +120,114 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATIC_TMP = os.path.join(BASE_DIR, "static")
 UPLOADS_TMP = os.path.join(BASE_DIR, 'static/uploads/')
 
-os.makedirs(STATIC_TMP, exist_ok=True)
-os.makedirs(UPLOADS_TMP, exist_ok=True)
-
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static")
 ]
 
+# Maximum size of a request body read by the parsers (see core/parsers.py), of a gzip compressed one both
+# before and after decompression
+MAX_DECOMPRESSED_REQUEST_BODY_SIZE = 10 * 1024 * 1024
+
+# response compression (see core/middleware.py)
+
+# Responses smaller than below bytes are not compressed, since the savings do not cover the overhead
+COMPRESSION_MIN_SIZE = 1024
+
+# Content types of the responses to be compressed
+COMPRESSION_CONTENT_TYPES = (
+    'application/json',
+    'application/vnd.polyline+json',
+    'application/msgpack',
+    'image/svg+xml',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'application/javascript',
+)
+
+# Responses of the views of below URL names carry tokens or one time passwords, they are never compressed since
+# a compressed secret reflected along with request input can be recovered from the compressed size (BREACH)
+COMPRESSION_EXCLUDED_URL_NAMES = (
+    'refresh-token',
+    'super_admin_login_api',
+    'data_entry_admin_login_api',
+    'citizen-register',
+    'citizen-login-using-email',
+    'citizen_send_otp_api',
+    'citizen_verify_otp_api',
+)
+
+COMPRESSION_GZIP_LEVEL = 6
+
+# Brotli quality (0-11), higher qualities are several times slower for a few percent smaller responses
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Compressed responses are cached in each process by the digest of the content, up to below bytes
+COMPRESSION_CACHE_MAX_SIZE = 32 * 1024 * 1024
+
 # Default file storage settings
 UPLOADS_LOCATION = os.path.join(BASE_DIR, 'static/uploads/')
 
+# Rendered citizen QR codes are cached on disk under below directory (see citizen/qr.py), and in the memory of
+# every worker process up to below bytes (~1 KB per code)
+QR_CODE_CACHE_LOCATION = os.path.join(UPLOADS_LOCATION, 'qr/')
+QR_CODE_CACHE_MAX_SIZE = 8 * 1024 * 1024
+
+# Location for storing precompiled responses (e.g. self screening bundle) that survives restarts
+# and is shared between worker processes
+CACHE_LOCATION = os.path.join(BASE_DIR, 'cache/')
+
+# Read-your-writes pins of the replica reads (see core/routers.py) are kept in a cache of their own, so that the
+# other entries never evict them. Every write request of a user sets a pin, hence the file based cache, which lists
+# its directory on every write, is not suitable. Pins expire in seconds and expired pins are removed when read, the
+# cache holds about the users who wrote recently. The cache is configured with the optional PIN_CACHE of
+# DATABASE.REPLICA of the configuration,
+#   BACKEND - in the memory of the worker process (default), or e.g.
+#       django.core.cache.backends.memcached.MemcachedCache
+#   LOCATION - name of the memory cache, or the address of the cache server
+#   MAX_ENTRIES - pins kept before culling, 50000 by default
+# Pins in the memory of a process are not seen by the other worker processes, a cache server shared between the
+# worker processes (and the hosts) is to be configured for read-your-writes across the requests of a user.
+_pin_cache_configuration = (get_env_var("DATABASE").get("REPLICA") or {}).get("PIN_CACHE") or {}
+
+# Caches of the worker processes, the default one shared between them and the one of the replica pins
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_LOCATION, 'django'),
+    },
+    'replica_pins': {
+        'BACKEND': _pin_cache_configuration.get("BACKEND") or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': _pin_cache_configuration.get("LOCATION") or 'replica_pins',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(_pin_cache_configuration.get("MAX_ENTRIES") or 50000),
+        },
+    },
+}
+
+# Log files are written by a background thread per file (core/log.py), rotated by size (default) or time,
+# configured with the optional LOGGING section of the configuration,
+#   FORMAT - text (default) or json
+#   ROTATION - size (default), time or none
+#   MAX_BYTES - size of a file to rotate at, 50 MB by default
+#   WHEN - interval to rotate at for time rotation, midnight by default
+#   BACKUP_COUNT - rotated files kept, 5 by default
+_logging_configuration = configs.get("LOGGING") or {}
+
+LOG_FILE_HANDLER_OPTIONS = {
+    'class': 'core.log.QueuedFileHandler',
+    'formatter': 'json' if _logging_configuration.get("FORMAT") == 'json' else 'verbose',
+    'rotation': _logging_configuration.get("ROTATION", 'size'),
+    'max_bytes': int(_logging_configuration.get("MAX_BYTES", 50 * 1024 * 1024)),
+    'when': _logging_configuration.get("WHEN", 'midnight'),
+    'backup_count': int(_logging_configuration.get("BACKUP_COUNT", 5))
+}
+
+# Fraction of the info and debug records logged by logger name, for high volume logs
+LOG_SAMPLE_RATES = {
+    'info.location_upload': 0.01
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': True,
@@ -133,27 +236,21 @@ LOGGING = {
             'format': "[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] %(message)s",
             'datefmt': "%d/%b/%Y %H:%M:%S"
         },
-    },
-    'handlers': {
-        'access': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'access.log',
-            'formatter': 'verbose'
+        'json': {
+            '()': 'core.log.JSONFormatter'
         },
-        'error': {
-            'level': 'ERROR',
-            'class': 'logging.FileHandler',
-            'filename': 'error.log',
-            'formatter': 'verbose'
-        },
-        'debug': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': 'debug.log',
-            'formatter': 'verbose'
+    },
+    'filters': {
+        'sampling': {
+            '()': 'core.log.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES
         },
     },
+    'handlers': {
+        'access': dict(LOG_FILE_HANDLER_OPTIONS, level='INFO', filename='access.log', filters=['sampling']),
+        'error': dict(LOG_FILE_HANDLER_OPTIONS, level='ERROR', filename='error.log'),
+        'debug': dict(LOG_FILE_HANDLER_OPTIONS, level='DEBUG', filename='debug.log', filters=['sampling']),
+    },
     'loggers': {
         'info': {
             'handlers': ['access'],
@@ -170,9 +267,53 @@ LOGGING = {
     }
 }
 
+# Rate limiting of the OTP, login, registration and location upload views (core/throttling.py), configured with the
+# optional RATE_LIMIT section of the configuration,
+#   ENABLED - true (default) or false
+#   NUM_PROXIES - trusted proxies in front of the application, the client IP is the address appended to
+#       X-Forwarded-For by the outermost of them. 0 when the clients connect to the application directly, the address
+#       of the peer (REMOTE_ADDR) is then the client IP, X-Forwarded-For being set by the clients themselves. The
+#       number of proxies (e.g. 1 for a load balancer, 2 for a CDN in front of it) when each of them appends the
+#       address of its peer to X-Forwarded-For, otherwise the clients choose their own IP. Requests are not limited
+#       by IP when it is not set, since behind a proxy every client would share the bucket of the proxy.
+_rate_limit_configuration = configs.get("RATE_LIMIT") or {}
+
+RATE_LIMIT_ENABLED = _rate_limit_configuration.get("ENABLED", True)
+RATE_LIMIT_NUM_PROXIES = _rate_limit_configuration.get("NUM_PROXIES")
+
+# Token buckets are kept in the `memory` of the process, in `shared_memory` mapped from below file by the worker
+# processes of a host, or in a `cache` of the CACHES shared between hosts (e.g. memcached)
+RATE_LIMIT_BACKEND = 'shared_memory'
+RATE_LIMIT_SHARED_MEMORY_LOCATION = os.path.join(CACHE_LOCATION, 'rate_limit', 'buckets')
+RATE_LIMIT_CACHE = 'default'
+
+# Rates of `<requests>/<period>` by throttle scope of the view and kind of the throttle, `n` requests are allowed
+# at once and refilled over the period
+RATE_LIMITS = {
+    'otp_send': {
+        'ip': '20/h',
+        'mobile_number': '5/h',
+    },
+    'otp_verify': {
+        'ip': '60/h',
+        'mobile_number': '10/h',
+    },
+    'login': {
+        'ip': '60/h',
+        'email': '10/h',
+    },
+    'registration': {
+        'ip': '20/h',
+    },
+    'location_upload': {
+        'user': '120/m',
+    },
+}
+
 REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'core.exceptions.core_exception_handler',
     'NON_FIELD_ERRORS_KEY': 'error',
+    'NUM_PROXIES': int(RATE_LIMIT_NUM_PROXIES or 0),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly'
     ],
@@ -181,7 +322,16 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'core.renderers.PolylineJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'core.parsers.MessagePackParser',
+        'core.parsers.PolylineJSONParser',
     ]
 }
 
@@ -191,6 +341,13 @@ DEBUG = get_env_var('DEBUG')
 
 ALLOWED_HOSTS = ["*"]
 
+# When connecting through pgbouncer in transaction pooling mode, consecutive transactions of a connection may
+# run on different server connections, hence server side cursors (used by `QuerySet.iterator()`) are disabled.
+# Querysets are then fetched entirely by `iterator()`. No other session state (SET, LISTEN, advisory locks,
+# prepared statements) is used by the application.
+DATABASE_PGBOUNCER_TRANSACTION_POOLING = get_env_var("DATABASE").get("PGBOUNCER_TRANSACTION_POOLING", False) in (
+    True, 'True')
+
 # Databases configuration
 DATABASES = {
     'default': {
@@ -199,10 +356,67 @@ DATABASES = {
         'USER': get_env_var("DATABASE")["USER"],
         'PASSWORD': get_env_var("DATABASE")["PASSWORD"],
         'HOST': get_env_var("DATABASE")["HOST"],
-        'PORT': get_env_var("DATABASE")["PORT"]
+        'PORT': get_env_var("DATABASE")["PORT"],
+        # connections are reused by the requests of a worker thread for below seconds, 0 closes the connection at
+        # the end of every request
+        'CONN_MAX_AGE': int(get_env_var("DATABASE").get("CONN_MAX_AGE", 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': DATABASE_PGBOUNCER_TRANSACTION_POOLING
     },
 }
 
+# Read replica, configured with the NAME / HOST of the replica in DATABASE.REPLICA of the configuration, rest of
+# the connection settings default to the ones of the primary. Reads of the views with `ReplicaReadMixin` are sent
+# to the replica by the router.
+_replica_configuration = {key: value for key, value in (get_env_var("DATABASE").get("REPLICA") or {}).items()
+                          if value not in ('', None)}
+if _replica_configuration.get("NAME") or _replica_configuration.get("HOST"):
+    DATABASES['replica'] = dict(DATABASES['default'], **{
+        'NAME': _replica_configuration.get("NAME", DATABASES['default']['NAME']),
+        'USER': _replica_configuration.get("USER", DATABASES['default']['USER']),
+        'PASSWORD': _replica_configuration.get("PASSWORD", DATABASES['default']['PASSWORD']),
+        'HOST': _replica_configuration.get("HOST", DATABASES['default']['HOST']),
+        'PORT': _replica_configuration.get("PORT", DATABASES['default']['PORT']),
+        # failing over to the primary should not wait for the default TCP connect timeout
+        'OPTIONS': {'connect_timeout': 2},
+        # tests run against the primary only
+        'TEST': {'MIRROR': 'default'}
+    })
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Replica reads of a user are sent to the primary for below seconds after the user writes (read-your-writes),
+# should be longer than the replication lag
+DATABASE_REPLICA_PIN_IN_SECONDS = 10
+
+# Replica is not used for below seconds after it fails, reads go to the primary
+DATABASE_REPLICA_RETRY_IN_SECONDS = 30
+
+# Per request instrumentation (core/middleware.py), time spent in database queries, IAM requests, push
+# notifications, SMS and rendering
+INSTRUMENTATION_ENABLED = True
+
+# Request timings are sent in the Server-Timing response header in development only, since they reveal to any
+# client how long the queries and the calls to other services take
+INSTRUMENTATION_SERVER_TIMING_HEADER = DEBUG
+
+# Fraction of the requests whose timings are logged, requests slower than below seconds are always logged
+INSTRUMENTATION_LOG_SAMPLE_RATE = 0.01
+INSTRUMENTATION_SLOW_REQUEST_IN_SECONDS = 1.0
+
+# Prometheus metrics (core/metrics.py), request latencies and errors by view, recorded by core.middleware and
+# exposed at /metrics for scraping with the monitoring token (see MONITORING_TOKEN below)
+METRICS_ENABLED = True
+
+# Monitoring endpoints, configured with the optional MONITORING section of the configuration,
+#   TOKEN - bearer token (`Authorization: Bearer <token>`) of the monitoring system, required for the metrics and
+#       for the details of the health check, which are not shown to anonymous callers. Metrics are not served to
+#       anyone without a token.
+_monitoring_configuration = configs.get("MONITORING") or {}
+MONITORING_TOKEN = _monitoring_configuration.get("TOKEN") or None
+
+# Persistent connections are checked (SELECT 1) at the start of every request and reconnected if they are broken
+DATABASE_CONNECTION_HEALTH_CHECKS = True
+
 SECRET_KEY = get_env_var("SECRET_KEY")
 
 # JWT token authentication configuration for rest_framework_simplejwt package
@@ -248,11 +462,21 @@ LOGGER_DEBUG = logging.getLogger('debug')
 LOGGER_INFO = logging.getLogger('info')
 LOGGER_ERROR = logging.getLogger('error')
 
+# location uploads, logged to the access log for a sample of the uploads (LOG_SAMPLE_RATES)
+LOGGER_LOCATION_UPLOAD = logging.getLogger('info.location_upload')
+
 # data4life configuration
 
 # patient historic location expiry duration
 HISTORIC_LOCATION_EXPIRY_IN_SECONDS = int(get_env_var("HISTORIC_LOCATION_EXPIRY_IN_SECONDS"))
 
+# Historic location tables are range partitioned by recorded date time, in partitions of a `day` or a `week`.
+# Expired partitions are dropped by `python manage.py manage_historic_location_partitions`
+HISTORIC_LOCATION_PARTITION_INTERVAL = 'day'
+
+# Number of partitions created ahead of the current one
+HISTORIC_LOCATION_PARTITION_PREMAKE = 7
+
 # QR code URL for patients to scan and sync their historic location after obtaining explicit consent
 HISTORIC_LOCATION_SYNC_CONSENT_QR_CODE_URL = get_env_var('HISTORIC_LOCATION_SYNC_CONSENT_QR_CODE_URL')
 
@@ -267,6 +491,56 @@ HOTSPOT_PROXIMITY_IN_METRES = int(get_env_var("HOTSPOT_PROXIMITY_NOTIFICATIONS")
 DELAY_BETWEEN_NOTIFICATIONS_IN_SECONDS = int(
     get_env_var("HOTSPOT_PROXIMITY_NOTIFICATIONS")["DELAY_BETWEEN_NOTIFICATIONS_IN_SECONDS"])
 
+# Decimal places of the coordinates in polyline encoded responses (`Accept: application/vnd.polyline+json`),
+# 5 decimal places is ~1 metre
+POLYLINE_PRECISION = 5
+
+# Maximum number of locations accepted in a citizen historic location batch upload
+CITIZEN_HISTORIC_LOCATION_BATCH_MAX_SIZE = 5000
+
+# citizen trajectory compression
+
+# Consecutive citizen locations within below metres of the first of them are recorded as a single stay-point
+TRAJECTORY_STAY_RADIUS_IN_METRES = 50
+
+# Locations recorded more than below seconds apart are never merged, nor simplified across
+TRAJECTORY_MAX_GAP_IN_SECONDS = 3600
+
+# Stay-points are split after below seconds, so that a stay-point does not outlive the partition of its
+# recorded date time by more than a partition interval
+TRAJECTORY_MAX_STAY_IN_SECONDS = 24 * 3600
+
+# Locations of a moving segment deviating less than below metres from the simplified segment are dropped
+TRAJECTORY_SIMPLIFICATION_TOLERANCE_IN_METRES = 25
+
+# Moving segments longer than below metres are not simplified, since locations dropped from them could be missed
+# by contact tracing and risk assessment, which match locations within `HOTSPOT_PROXIMITY_IN_METRES`
+TRAJECTORY_SIMPLIFICATION_MAX_SEGMENT_LENGTH_IN_METRES = HOTSPOT_PROXIMITY_IN_METRES
+
+# Patient historic location spatial index is rebuilt after below seconds, even if there are no changes,
+# for dropping the expired patient historic locations
+PATIENT_HISTORIC_LOCATION_INDEX_TTL_IN_SECONDS = 300
+
+# risk assessment
+
+# Citizen historic location is considered as an exposure if it is in proximity (`HOTSPOT_PROXIMITY_IN_METRES`) of
+# a patient historic location recorded within `x` seconds before or after
+RISK_ASSESSMENT_TIME_WINDOW_IN_SECONDS = int(get_env_var("RISK_ASSESSMENT")["TIME_WINDOW_IN_SECONDS"])
+
+# Exposure value at which the score reaches ~63% of the maximum recommendation point
+RISK_ASSESSMENT_EXPOSURE_SCALE = 5.0
+
+# Risk assessment exposure of a citizen is stored until new locations are recorded, upto the below seconds
+RISK_ASSESSMENT_SCORE_CACHE_TIMEOUT_IN_SECONDS = int(get_env_var("RISK_ASSESSMENT")["SCORE_CACHE_TIMEOUT_IN_SECONDS"])
+
+# dashboard stats
+
+# Citizens and patient historic locations are counted under the nearest region within below metres
+DASHBOARD_REGION_RADIUS_IN_METRES = 10000
+
+# Regions are reloaded from the database after below seconds, for counting under newly added regions
+DASHBOARD_REGIONS_CACHE_TIMEOUT_IN_SECONDS = 300
+
 # data4life IAM configuration
 # Access token decoding using RSA public key
 RSA_KEYS = get_env_var('IAM')['RSA_KEYS']
@@ -1,12 +1,16 @@
+from importlib import import_module
+
+from django.apps import apps
 from django.conf.urls import url
 from django.contrib import admin
 from django.urls import path, include
-from push_notifications.models import APNSDevice, GCMDevice, WNSDevice, WebPushDevice
+from django.utils.module_loading import module_has_submodule
 from rest_framework import routers
 from rest_framework_nested import routers as drf_nested_routers
 
 from authentication.views import *
 from citizen.views import *
+from core.views import HealthCheckAPIView, MetricsAPIView
 from dashboard.views import StatsAPIView, MapDataAPIView, PatientHistoricLocationSyncConsentQRCodeView
 from disease.views import DiseaseCRUDViewSet, DiseaseInfectionStatusCRUDViewSet
 from patient.views import PatientHistoricLocationViewSet
@@ -72,6 +76,12 @@ urlpatterns = [
     path('v1/', include(disease_nested_router.urls)),
     path('v1/', include(region_nested_router.urls)),
 
+    # health check
+    path('v1/health/', HealthCheckAPIView.as_view(), name='health-check'),
+
+    # prometheus metrics
+    path('metrics', MetricsAPIView.as_view(), name='metrics'),
+
     # refresh access tokens
     path('v1/auth/token/refresh/',
          RefreshTokenAPIView.as_view(),
@@ -90,6 +100,9 @@ urlpatterns = [
          SuperAdminLoginAPIView.as_view(),
          name='super_admin_login_api'),
 
+    # self screening questions, wellness status outcomes and risk assessment recommendations as a single bundle
+    path('v1/self-screening-bundle/', SelfScreeningBundleAPIView.as_view(), name='self-screening-bundle'),
+
     # citizens listing
     path('v1/citizen/', CitizenListingAPIView.as_view(), name="citizen-listing"),
 
@@ -99,6 +112,9 @@ urlpatterns = [
     path('v1/super-admin/send-push-notifications/', SendPushNotificationToAllCitizenAPIView.as_view(),
          name='send-push-notifications'),
 
+    # QR codes of every citizen for print campaigns
+    path('v1/super-admin/citizen-qr-codes/', CitizenQRCodeExportAPIView.as_view(), name='citizen-qr-codes-export'),
+
     # data entry admin region assign, remove
     path('v1/data-entry-admin/<str:pk>/region/<str:region_id>/assign',
          DataEntryAdminRegionViewSet.as_view({'post': 'create'}), name='data_entry_admin_region_assign'),
@@ -147,9 +163,8 @@ urlpatterns = [
     path('v1/citizen/perform-risk-assessment/', PerformRiskAssessmentAPI.as_view(), name='perform-risk-assessment')
 ]
 
-# Hiding third party models associated with push notifications in django admin panel
-admin.autodiscover()
-admin.site.unregister(APNSDevice)
-admin.site.unregister(GCMDevice)
-admin.site.unregister(WNSDevice)
-admin.site.unregister(WebPushDevice)
+# Hiding third party models associated with push notifications in django admin panel, admin modules are
+# discovered for every app but push notifications, whose admin module imports all the push notification backends
+for app_config in apps.get_app_configs():
+    if app_config.name != 'push_notifications' and module_has_submodule(app_config.module, 'admin'):
+        import_module('{}.admin'.format(app_config.name))
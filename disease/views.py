@@ -5,11 +5,12 @@ from rest_framework.response import Response
 
 from authentication.permissions import IsDataEntryAdmin, IsSuperUser
 from core.models import Disease, DiseaseInfectionStatus
+from core.views import ReplicaReadMixin
 from disease.serializers import DiseaseSerializer, DiseaseInfectionStatusDetailSerializer, \
     DiseaseInfectionStatusListSerializer
 
 
-class DiseaseCRUDViewSet(viewsets.ViewSet):
+class DiseaseCRUDViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """
     Defines API for performing CRUD operation on disease
     """
@@ -99,7 +100,7 @@ class DiseaseCRUDViewSet(viewsets.ViewSet):
         return Response({}, status=status.HTTP_204_NO_CONTENT)
 
 
-class DiseaseInfectionStatusCRUDViewSet(viewsets.ViewSet):
+class DiseaseInfectionStatusCRUDViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """
     Defines API for performing CRUD operations on infection status associated with a disease
     """
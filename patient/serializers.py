@@ -1,7 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
 
 from core.custom_fields import TimeStampField
 from core.models import PatientHistoricLocation, DiseaseInfectionStatus
+from dashboard.utils import update_patient_historic_location_stats
 
 
 class HistoricLocationDataSerializer(serializers.Serializer):
@@ -31,6 +33,36 @@ class PatientHistoricLocationBulkSerializer(serializers.Serializer):
         return infection_status_id
 
 
+class PatientHistoricLocationListSerializer(serializers.ListSerializer):
+    """
+    PatientHistoricLocationListSerializer
+
+    Creates the patient historic locations of an infection status in bulk, with their dashboard stats counted
+    once for the batch instead of a signal for each location
+    """
+
+    def create(self, validated_data):
+        if not validated_data:
+            return []
+
+        infection_status = validated_data[0].get('infection_status', None)
+
+        if not isinstance(infection_status, DiseaseInfectionStatus):
+            raise serializers.ValidationError('Please provide a valid infection status object!')
+
+        historic_locations = [PatientHistoricLocation(lat=historic_location.get('lat'),
+                                                      long=historic_location.get('long'),
+                                                      recorded_date_time=historic_location.get('timestamp'),
+                                                      disease_infection_status=infection_status)
+                              for historic_location in validated_data]
+
+        with transaction.atomic():
+            PatientHistoricLocation.objects.bulk_create(historic_locations, batch_size=1000)
+            update_patient_historic_location_stats(historic_locations, infection_status.disease_id)
+
+        return historic_locations
+
+
 class PatientHistoricLocationSerializer(serializers.ModelSerializer):
     """
     PatientHistoricLocationSerializer
@@ -45,6 +77,7 @@ class PatientHistoricLocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = PatientHistoricLocation
         fields = ('lat', 'long', 'timestamp', 'id')
+        list_serializer_class = PatientHistoricLocationListSerializer
 
     def create(self, validated_data):
         infection_status = validated_data.get('infection_status', None)
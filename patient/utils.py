@@ -0,0 +1,180 @@
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from authentication.models import FCMPushNotificationRegistrationToken
+from citizen.utils import get_citizen_historic_location_observed_after_filter
+from core.models import CitizenHistoricLocationDiseaseRelation, CitizenPushNotifications
+from core.spatial import SpatioTemporalIndex, METRES_PER_DEGREE_LATITUDE
+
+CONTACT_TRACING_NOTIFICATION_TITLE = "Contact tracing alert !"
+CONTACT_TRACING_NOTIFICATION_BODY = "You have been in proximity of a confirmed patient recently, " \
+                                    "please perform self screening and follow the recommendations !"
+
+# Number of citizens per push notification / database batch
+CONTACT_TRACING_BATCH_SIZE = 1000
+
+
+def find_contact_traced_citizens(patient_points, citizen_historic_locations, radius_in_metres,
+                                 time_window_in_seconds):
+    """
+    Spatio temporal join between patient historic locations and citizen historic locations
+
+    Patient points are loaded into a grid hash index and citizen historic locations are streamed through it,
+    so that each citizen location is compared only against patient points in the neighbouring cells.
+    A citizen is matched once, further locations of an already matched citizen are skipped.
+    Stay-points are matched against patient points over the whole stay.
+
+    Returns the set of citizen ids having at least one location within `radius_in_metres` and
+    `time_window_in_seconds` of a patient point
+
+    :param patient_points: iterable of (lat, long, timestamp)
+    :param citizen_historic_locations: iterable of (citizen id, lat, long, start timestamp, end timestamp)
+    :param radius_in_metres:
+    :param time_window_in_seconds:
+    :return:
+    """
+    index = SpatioTemporalIndex(radius_in_metres, time_window_in_seconds)
+    for lat, long, timestamp in patient_points:
+        index.add(lat, long, timestamp)
+
+    matched_citizen_ids = set()
+    if index.is_empty():
+        return matched_citizen_ids
+
+    for citizen_id, lat, long, start_timestamp, end_timestamp in citizen_historic_locations:
+        if citizen_id in matched_citizen_ids:
+            continue
+
+        if index.has_match(lat, long, start_timestamp - time_window_in_seconds, end_timestamp + time_window_in_seconds):
+            matched_citizen_ids.add(citizen_id)
+
+    return matched_citizen_ids
+
+
+def get_contact_tracing_bounds(patient_points, radius_in_metres, time_window_in_seconds):
+    """
+    Returns the bounding box and time range around the patient points, expanded by the radius and time window,
+    for pre filtering the citizen historic locations in the database
+
+    Returns a dict of min/max lat, long and recorded date time
+
+    :param patient_points: list of (lat, long, timestamp)
+    :param radius_in_metres:
+    :param time_window_in_seconds:
+    :return:
+    """
+    lats = [lat for lat, _, _ in patient_points]
+    longs = [long for _, long, _ in patient_points]
+    timestamps = [timestamp for _, _, timestamp in patient_points]
+
+    lat_margin = radius_in_metres / METRES_PER_DEGREE_LATITUDE
+    max_abs_lat = min(max(abs(min(lats)), abs(max(lats))) + lat_margin, 89.0)
+    long_margin = lat_margin / math.cos(math.radians(max_abs_lat))
+
+    return {
+        "min_lat": min(lats) - lat_margin,
+        "max_lat": max(lats) + lat_margin,
+        "min_long": min(longs) - long_margin,
+        "max_long": max(longs) + long_margin,
+        "min_recorded_date_time": datetime.fromtimestamp(min(timestamps) - time_window_in_seconds, tz=timezone.utc),
+        "max_recorded_date_time": datetime.fromtimestamp(max(timestamps) + time_window_in_seconds, tz=timezone.utc)
+    }
+
+
+def send_contact_tracing_notifications(citizen_ids):
+    """
+    Records CONTACT-TRACING notifications for the citizens and sends push notifications to their devices,
+    in batches of `CONTACT_TRACING_BATCH_SIZE` citizens
+
+    :param citizen_ids:
+    :return:
+    """
+    citizen_ids = sorted(citizen_ids)
+
+    for i in range(0, len(citizen_ids), CONTACT_TRACING_BATCH_SIZE):
+        citizen_ids_batch = citizen_ids[i:i + CONTACT_TRACING_BATCH_SIZE]
+
+        # Recording the push notifications to db
+        CitizenPushNotifications.objects.bulk_create([
+            CitizenPushNotifications(type='CONTACT-TRACING',
+                                     title=CONTACT_TRACING_NOTIFICATION_TITLE,
+                                     body=CONTACT_TRACING_NOTIFICATION_BODY,
+                                     citizen_id=citizen_id) for citizen_id in citizen_ids_batch
+        ])
+
+        try:
+            citizen_device_query_set = FCMPushNotificationRegistrationToken.objects.filter(
+                user__citizen__id__in=citizen_ids_batch)
+            citizen_device_query_set.send_message(None, extra={
+                "notification": {
+                    "title": CONTACT_TRACING_NOTIFICATION_TITLE,
+                    "body": CONTACT_TRACING_NOTIFICATION_BODY
+                },
+                "data": {
+                    "type": "CONTACT-TRACING"
+                }
+            })
+        except Exception as e:
+            settings.LOGGER_ERROR.error(
+                "Failed to send contact tracing push notifications, error:{}".format(str(e)))
+
+
+def perform_contact_tracing(patient_points, disease_id):
+    """
+    Finds the citizens who were in proximity of the uploaded patient historic locations and notifies them
+
+    Citizens who already received a contact tracing notification within
+    `DELAY_BETWEEN_NOTIFICATIONS_IN_SECONDS` are not notified again.
+
+    This function is to be executed in a background thread after patient historic locations are uploaded.
+
+    :param patient_points: list of (lat, long, timestamp)
+    :param disease_id:
+    :return:
+    """
+    try:
+        if not patient_points:
+            return None
+
+        radius_in_metres = settings.HOTSPOT_PROXIMITY_IN_METRES
+        time_window_in_seconds = settings.RISK_ASSESSMENT_TIME_WINDOW_IN_SECONDS
+
+        bounds = get_contact_tracing_bounds(patient_points, radius_in_metres, time_window_in_seconds)
+
+        # streaming only the citizen historic locations around the patient points
+        citizen_historic_locations = CitizenHistoricLocationDiseaseRelation.objects.filter(
+            get_citizen_historic_location_observed_after_filter(max(
+                bounds['min_recorded_date_time'],
+                timezone.now() - timedelta(seconds=settings.HISTORIC_LOCATION_EXPIRY_IN_SECONDS))),
+            disease__id=disease_id,
+            lat__gte=bounds['min_lat'], lat__lte=bounds['max_lat'],
+            long__gte=bounds['min_long'], long__lte=bounds['max_long'],
+            recorded_date_time__lte=bounds['max_recorded_date_time']).values_list(
+            'citizen_id', 'lat', 'long', 'recorded_date_time', 'exit_date_time')
+
+        matched_citizen_ids = find_contact_traced_citizens(
+            patient_points,
+            ((citizen_id, lat, long, recorded_date_time.timestamp(),
+              (exit_date_time or recorded_date_time).timestamp())
+             for citizen_id, lat, long, recorded_date_time, exit_date_time in
+             citizen_historic_locations.iterator(chunk_size=5000)),
+            radius_in_metres, time_window_in_seconds)
+
+        # skipping the citizens who are notified recently
+        recently_notified_citizen_ids = set(CitizenPushNotifications.objects.filter(
+            type='CONTACT-TRACING', citizen__id__in=matched_citizen_ids,
+            added_on__gte=timezone.now() - timedelta(
+                seconds=settings.DELAY_BETWEEN_NOTIFICATIONS_IN_SECONDS)).values_list('citizen_id', flat=True))
+
+        citizen_ids = matched_citizen_ids - recently_notified_citizen_ids
+        send_contact_tracing_notifications(citizen_ids)
+
+        settings.LOGGER_INFO.info(
+            "Contact tracing matched {} citizens, notified {} citizens".format(len(matched_citizen_ids),
+                                                                             len(citizen_ids)))
+
+    except Exception as e:
+        settings.LOGGER_ERROR.error("Something went wrong while performing contact tracing, error:{}".format(str(e)))
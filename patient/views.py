@@ -4,8 +4,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from authentication.permissions import IsDataEntryAdmin
+from citizen.utils import rescore_all_citizens
 from core.models import DiseaseInfectionStatus, PatientHistoricLocation
+from core.spatial import bump_patient_historic_location_generation
+from core.utils import run_in_background
 from patient.serializers import PatientHistoricLocationBulkSerializer, PatientHistoricLocationSerializer
+from patient.utils import perform_contact_tracing
 
 
 class PatientHistoricLocationViewSet(viewsets.ViewSet):
@@ -74,6 +78,16 @@ class PatientHistoricLocationViewSet(viewsets.ViewSet):
         create_serializer.is_valid(raise_exception=True)
         create_serializer.save(infection_status=infection_status)
 
+        # invalidating patient historic location indexes and recalculating risk assessment scores of citizens
+        bump_patient_historic_location_generation()
+        run_in_background(rescore_all_citizens)
+
+        # notifying the citizens who were in proximity of the patient
+        patient_points = [(historic_location.lat, historic_location.long,
+                           historic_location.recorded_date_time.timestamp())
+                          for historic_location in create_serializer.instance]
+        run_in_background(perform_contact_tracing, patient_points, infection_status.disease_id)
+
         return Response(validation_serializer.data, status=status.HTTP_201_CREATED)
 
     def destroy(self, request, pk=None):
@@ -88,6 +102,8 @@ class PatientHistoricLocationViewSet(viewsets.ViewSet):
         historic_location = get_object_or_404(queryset, pk=pk)
         historic_location.delete()
 
+        bump_patient_historic_location_generation()
+
         return Response({}, status=status.HTTP_204_NO_CONTENT)
 
     def update(self, request, pk=None):
@@ -104,4 +120,7 @@ class PatientHistoricLocationViewSet(viewsets.ViewSet):
         serializer = self.get_serializer_class()(historic_location, data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+
+        bump_patient_historic_location_generation()
+
         return Response(serializer.data)
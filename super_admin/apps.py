@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SuperAdminConfig(AppConfig):
     name = 'super_admin'
+
+    def ready(self):
+        # registering signal handlers
+        import super_admin.signals  # noqa: F401
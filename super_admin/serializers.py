@@ -400,17 +400,3 @@ class MobileNumberWhitelistSerializer(serializers.ModelSerializer):
     class Meta:
         model = MobileNumberWhitelist
         fields = ('id', 'mobile_number')
-
-
-class CitizenListingSerializer(serializers.Serializer):
-    """
-    Serializes citizen queryset for listing
-    """
-    id = serializers.CharField(read_only=True)
-    iam_user_id = serializers.CharField(read_only=True)
-    mobile_number = serializers.CharField(read_only=True)
-    fullname = serializers.CharField(read_only=True)
-    dob = serializers.CharField(read_only=True)
-    home_latitude = serializers.FloatField(read_only=True)
-    home_longitude = serializers.FloatField(read_only=True)
-    is_location_sync_enabled = serializers.BooleanField(read_only=True)
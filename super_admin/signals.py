@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import SelfScreeningQuestion, WellnessStatusOutcome, RiskAssessmentRecommendation
+from super_admin.utils import invalidate_self_screening_bundle
+
+
+@receiver(post_save, sender=SelfScreeningQuestion)
+@receiver(post_save, sender=WellnessStatusOutcome)
+@receiver(post_save, sender=RiskAssessmentRecommendation)
+@receiver(post_delete, sender=SelfScreeningQuestion)
+@receiver(post_delete, sender=WellnessStatusOutcome)
+@receiver(post_delete, sender=RiskAssessmentRecommendation)
+def self_screening_bundle_invalidation_handler(sender, **kwargs):
+    """
+    Invalidates the precompiled self screening bundle whenever one of the models in the bundle is edited
+    either through the APIs or the django admin panel
+    """
+    transaction.on_commit(invalidate_self_screening_bundle)
@@ -0,0 +1,227 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+import orjson
+from django.conf import settings
+from django.db.models import F
+
+from core.models import SelfScreeningQuestion, WellnessStatusOutcome, RiskAssessmentRecommendation
+from super_admin.serializers import SelfScreeningQuestionSerializer, WellnessStatusOutcomeSerializer, \
+    RiskAssessmentRecommendationSerializer
+
+# bundle of a generation is stored in `self_screening_bundle.<generation>.json.gz`, the current generation in the
+# generation file
+SELF_SCREENING_BUNDLE_FILENAME = 'self_screening_bundle.{}.json.gz'
+SELF_SCREENING_BUNDLE_GENERATION_FILENAME = 'self_screening_bundle.generation'
+
+# fields of the citizens in the citizen listing, besides the registration date time of the user (`registered_at`)
+CITIZEN_LISTING_FIELDS = ('id', 'iam_user_id', 'mobile_number', 'fullname', 'dob', 'home_latitude', 'home_longitude',
+                          'is_location_sync_enabled')
+
+# citizens per page of the citizen listing, by default and at most
+CITIZEN_LISTING_PAGE_SIZE = 50
+CITIZEN_LISTING_MAX_PAGE_SIZE = 500
+
+# citizen listing is yielded in chunks of below citizens
+CITIZEN_LISTING_CHUNK_SIZE = 100
+
+# searches shorter than below characters cannot be looked up in the trigram indexes
+CITIZEN_SEARCH_MIN_LENGTH = 3
+
+# In memory copy of the self screening bundle, shared by all the threads of a worker process
+_self_screening_bundle = {}
+_self_screening_bundle_lock = threading.Lock()
+
+
+def _get_self_screening_bundle_path(generation):
+    return os.path.join(settings.CACHE_LOCATION, SELF_SCREENING_BUNDLE_FILENAME.format(generation))
+
+
+def _get_self_screening_bundle_generation_path():
+    return os.path.join(settings.CACHE_LOCATION, SELF_SCREENING_BUNDLE_GENERATION_FILENAME)
+
+
+def _get_self_screening_bundle_generation():
+    try:
+        with open(_get_self_screening_bundle_generation_path()) as f:
+            return f.read().strip() or '0'
+    except FileNotFoundError:
+        return '0'
+
+
+def build_self_screening_bundle():
+    """
+    Serializes self screening questions, wellness status outcomes and risk assessment recommendations
+    into a single JSON document.
+
+    Sha256 hash of the serialized content is used as the bundle version.
+
+    Returns a tuple of bundle version and JSON bytes
+
+    :return:
+    """
+    content = {
+        "self_screening_questions": SelfScreeningQuestionSerializer(
+            SelfScreeningQuestion.objects.order_by('id'), many=True).data,
+        "wellness_status_outcomes": WellnessStatusOutcomeSerializer(
+            WellnessStatusOutcome.objects.order_by('point_lower_limit', 'id'), many=True).data,
+        "risk_assessment_recommendations": RiskAssessmentRecommendationSerializer(
+            RiskAssessmentRecommendation.objects.order_by('point_lower_limit', 'id'), many=True).data
+    }
+    content_json = json.dumps(content, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    version = hashlib.sha256(content_json).hexdigest()
+
+    payload = json.dumps({"version": version, **content}, separators=(',', ':')).encode('utf-8')
+
+    return version, payload
+
+
+def _write_file_atomically(path, content):
+    """
+    Atomically replaces the file, so that other worker processes never read a partially written file
+
+    :param path:
+    :param content: bytes
+    :return:
+    """
+    os.makedirs(settings.CACHE_LOCATION, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=settings.CACHE_LOCATION, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_self_screening_bundle():
+    """
+    Returns the precompiled self screening bundle as a dict containing version, JSON bytes and
+    gzip compressed JSON bytes.
+
+    The bundle of the current generation is looked up in memory first, then on disk. It is built from the
+    database only if it is not present on disk, i.e. on the first request after a super admin edits one of the
+    models.
+
+    A bundle is written under the generation read before building it. A build which has read the models before
+    an edit is committed writes the bundle of a generation replaced by the invalidation, which is never served.
+
+    :return:
+    """
+    generation = _get_self_screening_bundle_generation()
+    bundle = _self_screening_bundle.get('bundle')
+
+    if bundle is not None and bundle['generation'] == generation:
+        return bundle
+
+    with _self_screening_bundle_lock:
+        # another thread might have refreshed the bundle while waiting for the lock
+        generation = _get_self_screening_bundle_generation()
+        bundle = _self_screening_bundle.get('bundle')
+        if bundle is not None and bundle['generation'] == generation:
+            return bundle
+
+        path = _get_self_screening_bundle_path(generation)
+        try:
+            with open(path, 'rb') as f:
+                payload_gzip = f.read()
+            payload = gzip.decompress(payload_gzip)
+            version = json.loads(payload.decode('utf-8'))['version']
+        except FileNotFoundError:
+            version, payload = build_self_screening_bundle()
+            payload_gzip = gzip.compress(payload, compresslevel=9)
+            _write_file_atomically(path, payload_gzip)
+
+        bundle = {
+            "generation": generation,
+            "version": version,
+            "payload": payload,
+            "payload_gzip": payload_gzip
+        }
+        _self_screening_bundle['bundle'] = bundle
+
+        return bundle
+
+
+def invalidate_self_screening_bundle():
+    """
+    Starts a new generation of the self screening bundle and removes the bundles of the former generations, the
+    bundle is rebuilt on next request.
+
+    Called once the edit is committed. Other worker processes notice the new generation and rebuild their in
+    memory copy as well.
+
+    :return:
+    """
+    generation = uuid.uuid4().hex
+    with _self_screening_bundle_lock:
+        _self_screening_bundle.pop('bundle', None)
+        _write_file_atomically(_get_self_screening_bundle_generation_path(), generation.encode('utf-8'))
+
+    for path in glob.glob(_get_self_screening_bundle_path('*')):
+        if path != _get_self_screening_bundle_path(generation):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def search_citizens(queryset, search):
+    """
+    Filters the citizens by mobile number or name
+
+    A search starting with `+` matches the mobile numbers starting with it, a search of digits matches the mobile
+    numbers containing it and any other search matches the names containing it, case insensitively. Matches are
+    looked up in the trigram indexes of the mobile number and the upper cased name (see authentication migration
+    0007), which need a search of at least 3 characters.
+
+    :param queryset:
+    :param search:
+    :return:
+    """
+    if search.startswith('+'):
+        return queryset.filter(mobile_number__startswith=search)
+    if search.isdigit():
+        return queryset.filter(mobile_number__contains=search)
+    return queryset.filter(fullname__icontains=search)
+
+
+def get_citizen_listing_page(queryset, page_size):
+    """
+    Reads a page of the citizen listing, with a citizen more than the page size which tells whether there is a next
+    page
+
+    :param queryset: citizens in the order of the pages
+    :param page_size:
+    :return: list of the citizens as dicts of `CITIZEN_LISTING_FIELDS` and `registered_at`
+    """
+    return list(queryset.values(*CITIZEN_LISTING_FIELDS, registered_at=F('user__created_at'))[:page_size + 1])
+
+
+def stream_citizen_listing(citizens, page_size, get_next_url):
+    """
+    Yields the chunks of a page of the citizen listing as JSON, `{"results": [...], "next": <URL or null>}`,
+    encoding the citizens a chunk at a time
+
+    :param citizens: page read by `get_citizen_listing_page`
+    :param page_size:
+    :param get_next_url: function returning the URL of the page after a citizen
+    :return:
+    """
+    yield b'{"results":['
+
+    page = citizens[:page_size]
+    for start in range(0, len(page), CITIZEN_LISTING_CHUNK_SIZE):
+        chunk = page[start:start + CITIZEN_LISTING_CHUNK_SIZE]
+        yield (b',' if start else b'') + b','.join(orjson.dumps(citizen) for citizen in chunk)
+
+    next_url = get_next_url(page[-1]) if len(citizens) > page_size else None
+    yield b'],"next":' + orjson.dumps(next_url) + b'}'
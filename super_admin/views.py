@@ -1,20 +1,34 @@
-from django.db.models import Q
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q, Exists, OuterRef
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status, generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from authentication.models import Region, DataEntryAdmin, DataEntryAdminRegion, Citizen
 from authentication.permissions import IsCitizen, IsDataEntryAdmin, IsSuperUser
+from citizen.qr_export import QR_CODE_ARCHIVE_CONTENT_TYPES, get_citizens_for_qr_codes, stream_citizen_qr_codes
+from core.compression import accepts_encoding
 from core.models import AreaSeverityLevel, RiskAssessmentRecommendation, SelfScreeningQuestion, WellnessStatusOutcome, \
-    MobileNumberWhitelist
+    MobileNumberWhitelist, CitizenDiseaseRelation
+from core.views import ReplicaReadMixin
 from super_admin.serializers import AreaSeverityLevelSerializer, DataEntryAdminSerializerWithPassword, \
     DataEntryAdminSerializerWithoutPassword, RegionSerializer, RiskAssessmentRecommendationSerializer, \
     SelfScreeningQuestionSerializer, WellnessStatusOutcomeSerializer, MobileNumberWhitelistSerializer, \
-    SendPushNotificationToCitizenSerializer, SendPushNotificationToAllCitizenSerializer, CitizenListingSerializer
+    SendPushNotificationToCitizenSerializer, SendPushNotificationToAllCitizenSerializer
+from super_admin.utils import get_self_screening_bundle, search_citizens, get_citizen_listing_page, \
+    stream_citizen_listing, CITIZEN_LISTING_PAGE_SIZE, CITIZEN_LISTING_MAX_PAGE_SIZE, CITIZEN_SEARCH_MIN_LENGTH
 
 
-class RegionCRUDViewSet(viewsets.ModelViewSet):
+class RegionCRUDViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     Defines API for performing CRUD operation on regions
 
@@ -175,7 +189,7 @@ class DataEntryAdminRegionViewSet(viewsets.ViewSet):
             return Response({"msg": response_msg}, status=response_status)
 
 
-class AreaSeverityLevelCRUDViewSet(viewsets.ViewSet):
+class AreaSeverityLevelCRUDViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """
     AreaSeverityLevelCRUDViewSet
 
@@ -294,7 +308,7 @@ class AreaSeverityLevelCRUDViewSet(viewsets.ViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RiskAssessmentRecommendationCRUDViewSet(viewsets.ModelViewSet):
+class RiskAssessmentRecommendationCRUDViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     RiskAssessmentRecommendationCRUDViewSet
 
@@ -322,7 +336,7 @@ class RiskAssessmentRecommendationCRUDViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class SelfScreeningQuestionCRUDViewSet(viewsets.ModelViewSet):
+class SelfScreeningQuestionCRUDViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     SelfScreeningQuestionCRUDViewSet
 
@@ -350,7 +364,7 @@ class SelfScreeningQuestionCRUDViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class WellnessStatusOutcomeCRUDViewSet(viewsets.ModelViewSet):
+class WellnessStatusOutcomeCRUDViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     WellnessStatusOutcomeCRUDViewSet
 
@@ -378,6 +392,41 @@ class WellnessStatusOutcomeCRUDViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
+class SelfScreeningBundleAPIView(generics.GenericAPIView):
+    """
+    SelfScreeningBundleAPIView
+
+    Returns self screening questions, wellness status outcomes and risk assessment recommendations
+    as a single precompiled bundle.
+
+    Bundle version is sent as `ETag`, clients can revalidate their copy by sending it back in
+    `If-None-Match` header and a 304 response is returned if the bundle hasn't changed.
+    """
+    permission_classes = (IsAuthenticated, IsSuperUser | IsCitizen,)
+
+    def get(self, request):
+        bundle = get_self_screening_bundle()
+        etag = '"{}"'.format(bundle['version'])
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        # serving the compressed bundle as is, if the client supports gzip encoding
+        if accepts_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), 'gzip'):
+            response = HttpResponse(bundle['payload_gzip'], content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(bundle['payload'], content_type='application/json')
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        return response
+
+
 class MobileNumberWhitelistCRUDViewSet(viewsets.ModelViewSet):
     """
     Defines API to perform CRUD operations on whitelist for citizen mobile number
@@ -419,15 +468,149 @@ class SendPushNotificationToAllCitizenAPIView(generics.GenericAPIView):
         return Response(serializer.data)
 
 
-class CitizenListingAPIView(generics.GenericAPIView):
+class CitizenListingAPIView(ReplicaReadMixin, generics.GenericAPIView):
     """
-    Listing all citizens
+    CitizenListingAPIView
+
+    Lists the citizens a page at a time, newest registrations first, ordered by the registration date time of the
+    user and the id of the citizen for the citizens registered at the same time. Pages are keyset paginated, the
+    `next` URL of a page asks for the citizens after the last citizen of the page (`?after_registered_at=<date
+    time>&after=<id>`), so that every page is read in order from the registration date time index instead of skipping
+    the citizens of the previous pages.
+
+    Query parameters,
+        page_size - citizens per page, up to `CITIZEN_LISTING_MAX_PAGE_SIZE`
+        search - mobile number or name, see super_admin.utils.search_citizens
+        is_location_sync_enabled - true or false
+        wellness - wellness status of the citizen for any disease
+        registered_from, registered_to - dates or date times of the registration, both inclusive
+        after_registered_at, after - registration date time and id of the last citizen of the previous page
+
+    Page is read from the database before the response starts and streamed as it is encoded, as JSON
+    `{"results": [...], "next": <URL or null>}`.
     """
-    serializer_class = CitizenListingSerializer
     permission_classes = (IsAuthenticated, IsSuperUser)
 
-    def get(self, request):
+    def _get_page_size(self, request):
+        page_size = request.query_params.get('page_size')
+        if page_size is None:
+            return CITIZEN_LISTING_PAGE_SIZE
+
+        if not page_size.isdigit() or not 1 <= int(page_size) <= CITIZEN_LISTING_MAX_PAGE_SIZE:
+            raise ValidationError(
+                {"page_size": ["Page size must be between 1 and {}".format(CITIZEN_LISTING_MAX_PAGE_SIZE)]})
+        return int(page_size)
+
+    def _get_registration_date_time(self, request, name, end_of_day=False):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+
+        try:
+            date_time = parse_datetime(value)
+            if date_time is None:
+                date = parse_date(value)
+                if date is None:
+                    raise ValueError
+                date_time = datetime.combine(date, time.max if end_of_day else time.min)
+        except ValueError:
+            raise ValidationError({name: ["Must be a date (YYYY-MM-DD) or an ISO 8601 date time"]})
+
+        if timezone.is_naive(date_time):
+            date_time = timezone.make_aware(date_time)
+        return date_time
+
+    def get_queryset(self):
+        request = self.request
         queryset = Citizen.objects.all()
-        serializer = self.serializer_class(queryset)
 
-        return Response(serializer.data)
+        search = request.query_params.get('search', '').strip()
+        if search:
+            if len(search) < CITIZEN_SEARCH_MIN_LENGTH:
+                raise ValidationError(
+                    {"search": ["Search must be at least {} characters".format(CITIZEN_SEARCH_MIN_LENGTH)]})
+            queryset = search_citizens(queryset, search)
+
+        is_location_sync_enabled = request.query_params.get('is_location_sync_enabled')
+        if is_location_sync_enabled is not None:
+            if is_location_sync_enabled.lower() not in ('true', 'false'):
+                raise ValidationError({"is_location_sync_enabled": ["Must be true or false"]})
+            queryset = queryset.filter(is_location_sync_enabled=is_location_sync_enabled.lower() == 'true')
+
+        wellness = request.query_params.get('wellness')
+        if wellness:
+            queryset = queryset.filter(Exists(CitizenDiseaseRelation.objects.filter(
+                citizen_id=OuterRef('pk'), wellness__iexact=wellness)))
+
+        registered_from = self._get_registration_date_time(request, 'registered_from')
+        if registered_from is not None:
+            queryset = queryset.filter(user__created_at__gte=registered_from)
+
+        registered_to = self._get_registration_date_time(request, 'registered_to', end_of_day=True)
+        if registered_to is not None:
+            queryset = queryset.filter(user__created_at__lte=registered_to)
+
+        after_registered_at = request.query_params.get('after_registered_at')
+        after = request.query_params.get('after')
+        if after_registered_at or after:
+            try:
+                after_registered_at = parse_datetime(after_registered_at or '')
+                if after_registered_at is None:
+                    raise ValueError
+            except ValueError:
+                raise ValidationError({"after_registered_at": ["Must be the registration date time of a citizen"]})
+            if timezone.is_naive(after_registered_at):
+                after_registered_at = timezone.make_aware(after_registered_at)
+
+            # ids are UUIDs, any other value would compare to no citizen
+            try:
+                after = Citizen._meta.pk.to_python(after)
+            except DjangoValidationError:
+                after = None
+            if after is None:
+                raise ValidationError({"after": ["Must be the id of a citizen"]})
+
+            queryset = queryset.filter(Q(user__created_at__lt=after_registered_at) | Q(
+                user__created_at=after_registered_at, id__lt=after))
+
+        return queryset.order_by('-user__created_at', '-id')
+
+    def _get_next_url(self, last_citizen):
+        query_params = self.request.query_params.copy()
+        query_params['after_registered_at'] = last_citizen['registered_at'].isoformat()
+        query_params['after'] = last_citizen['id']
+        return self.request.build_absolute_uri('?' + query_params.urlencode())
+
+    def get(self, request):
+        page_size = self._get_page_size(request)
+        # page is read before the response streams, while a failure of the replica still falls back to the primary
+        # (see core.views.ReplicaReadMixin), only the encoding is left to the stream
+        citizens = get_citizen_listing_page(self.get_queryset(), page_size)
+
+        return StreamingHttpResponse(stream_citizen_listing(citizens, page_size, self._get_next_url),
+                                     content_type='application/json')
+
+
+class CitizenQRCodeExportAPIView(generics.GenericAPIView):
+    """
+    CitizenQRCodeExportAPIView
+
+    Streams the QR codes of every citizen for print campaigns, as a ZIP of PNGs or with `?output=pdf` as a PDF of
+    codes tiled on A4 pages (see citizen/qr_export.py). Citizens are read with a server side cursor while the
+    archive is streamed.
+
+    Codes missing from the QR code cache are rendered by the request, run the generate_citizen_qr_codes command
+    beforehand to render them across processes.
+    """
+    permission_classes = (IsAuthenticated, IsSuperUser)
+
+    def get(self, request):
+        archive_format = request.query_params.get('output', 'zip')
+        if archive_format not in QR_CODE_ARCHIVE_CONTENT_TYPES:
+            raise ValidationError(
+                {"output": ["Output must be one of {}".format(", ".join(QR_CODE_ARCHIVE_CONTENT_TYPES))]})
+
+        response = StreamingHttpResponse(stream_citizen_qr_codes(get_citizens_for_qr_codes(), archive_format),
+                                         content_type=QR_CODE_ARCHIVE_CONTENT_TYPES[archive_format])
+        response['Content-Disposition'] = 'attachment; filename="citizen-qr-codes.{}"'.format(archive_format)
+        return response